@@ -1,90 +1,95 @@
 import uuid
 import os
+import threading
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from dotenv import load_dotenv
+from db import ConnectionPool
+from migrations import migrate
+from feedback_query import parse_fields, parse_filters, encode_cursor, decode_cursor
+from feedback_stats import GRANULARITIES, UNSCORED, parse_stats_range, summarize_rollups
+from feedback_search import (SORTS, build_search, normalize_query, trigram_available, encode_search_cursor,
+                             decode_search_cursor)
+from scoring import ScoringWorker, SCORE_COLUMNS, reusable_scores
+from partitions import PartitionMaintainer, ensure_month_partition, is_missing_partition
+from text_hash import text_hash
+from ml_client import MLClient, CircuitBreaker, CircuitOpen
+from importer import FeedbackImporter, parse_ndjson, parse_csv
+from exporter import EXPORT_FORMATS, iter_chunks, parquet_available
+from rescoring import (RescoringJob, JobBusy, RESUMABLE, MODES, MAX_CHUNK_SIZE, create_job, get_job, list_jobs,
+                       find_resumable_job, is_running, pause_job)
+from metrics import render, PREDICTIONS_REUSED
 
 load_dotenv()
 
 app = Flask(__name__)
 
+# Connections are shared by all requests through a pool. Idle connections are
+# checked with SELECT 1 before reuse once they have been idle for
+# DB_POOL_CHECK_IDLE_SECONDS. DB_POOL_MAX_SIZE=0 opens a connection per request.
+db_pool = ConnectionPool(
+    min_size=int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+    max_size=int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    check_idle_after=float(os.getenv('DB_POOL_CHECK_IDLE_SECONDS', '30')),
+    host=os.getenv('DB_HOST'),
+    database=os.getenv('DB_NAME'),
+    user=os.getenv('DB_USER'),
+    password=os.getenv('DB_PASSWORD'),
+    port=os.getenv('DB_PORT')
+)
+
 def get_db_connection():
-    conn = psycopg2.connect(
-        host=os.getenv('DB_HOST'),
-        database=os.getenv('DB_NAME'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        port=os.getenv('DB_PORT')
-    )
-    return conn
+    """
+    Context manager yielding a pooled connection:
+
+        with get_db_connection() as conn:
+            ...
+            conn.commit()
+
+    Anything not committed is rolled back when the block ends.
+    """
+    return db_pool.connection()
 
 def init_db():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    # Create Users Table
-    cur.execute('''CREATE TABLE IF NOT EXISTS users
-                 (id TEXT PRIMARY KEY, username TEXT, password TEXT, role TEXT)''')
-    # Create Feedbacks Table
-    # Dropping table to apply new schema for development
-    cur.execute('''CREATE TABLE IF NOT EXISTS feedbacks
-                 (id TEXT PRIMARY KEY, feedback TEXT, user_id TEXT,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  sentiment TEXT,
-                  cleaned_text TEXT,
-                  processed_text TEXT,
-                  confidence FLOAT,
-                  has_negation BOOLEAN,
-                  FOREIGN KEY(user_id) REFERENCES users(id))''')
-    conn.commit()
-    cur.close()
-    conn.close()
+    # Schema changes live in migrations/; see migrations.py
+    with get_db_connection() as conn:
+        migrate(conn)
 
 @app.route('/api/users/register', methods=['POST'])
 def register():
     data = request.get_json()
     role = data.get('role')
     user_id = str(uuid.uuid4())
-    
+
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if role == 'anonymous':
+                cur.execute("INSERT INTO users (id, role) VALUES (%s, %s)", (user_id, 'anonymous'))
+                conn.commit()
+                return jsonify({"user_id": user_id, "role": "anonymous"}), 201
 
-        if role == 'anonymous':
-            cur.execute("INSERT INTO users (id, role) VALUES (%s, %s)", (user_id, 'anonymous'))
-            conn.commit()
-            cur.close()
-            conn.close()
-            return jsonify({"user_id": user_id, "role": "anonymous"}), 201
-        
-        elif role == 'admin':
-            username = data.get('username')
-            password = data.get('password')
-            
-            if not username or not password:
-                cur.close()
-                conn.close()
-                return jsonify({"error": "Username and password required for admin"}), 400
-                
-            # Check if admin exists
-            cur.execute("SELECT * FROM users WHERE username = %s", (username,))
-            user = cur.fetchone()
-            if user:
-                cur.close()
-                conn.close()
-                return jsonify({"error": "Admin already exists"}), 400
-                
-            cur.execute("INSERT INTO users (id, username, password, role) VALUES (%s, %s, %s, %s)",
-                      (user_id, username, password, 'admin'))
-            conn.commit()
-            cur.close()
-            conn.close()
-            return jsonify({"message": "Admin created successfully", "username": username}), 201
-        
-        else:
-            cur.close()
-            conn.close()
-            return jsonify({"error": "Invalid role. Must be 'admin' or 'anonymous'"}), 400
+            elif role == 'admin':
+                username = data.get('username')
+                password = data.get('password')
+
+                if not username or not password:
+                    return jsonify({"error": "Username and password required for admin"}), 400
+
+                # Check if admin exists
+                cur.execute("SELECT * FROM users WHERE username = %s", (username,))
+                user = cur.fetchone()
+                if user:
+                    return jsonify({"error": "Admin already exists"}), 400
+
+                cur.execute("INSERT INTO users (id, username, password, role) VALUES (%s, %s, %s, %s)",
+                          (user_id, username, password, 'admin'))
+                conn.commit()
+                return jsonify({"message": "Admin created successfully", "username": username}), 201
+
+            else:
+                return jsonify({"error": "Invalid role. Must be 'admin' or 'anonymous'"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -93,109 +98,528 @@ def login():
     data = request.get_json()
     username = data.get('username')
     password = data.get('password')
-    
+
     if not username or not password:
         return jsonify({"error": "Username and password required"}), 400
-        
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT * FROM users WHERE username = %s AND password = %s", (username, password))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-        
+
+    try:
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM users WHERE username = %s AND password = %s", (username, password))
+            user = cur.fetchone()
+
         if user:
             return jsonify({"message": "Login successful"}), 200
-        
+
         return jsonify({"error": "Invalid credentials"}), 401
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-import requests
 import datetime
 
 ML_API_URL = os.getenv('ML_API_URL', 'http://localhost:5001/predict')
+ML_BATCH_API_URL = os.getenv('ML_BATCH_API_URL', ML_API_URL.rstrip('/') + '/batch')
+ML_HEALTH_URL = os.getenv('ML_HEALTH_URL', ML_API_URL.rsplit('/predict', 1)[0] + '/health')
+
+# All calls to the ML service share one keep-alive session. After
+# ML_BREAKER_FAILURES consecutive failures the circuit opens and calls fail at
+# once (feedbacks are saved unscored for the scoring worker) until a trial call
+# ML_BREAKER_RESET_SECONDS later succeeds.
+ml_client = MLClient(
+    ML_API_URL, ML_BATCH_API_URL, ML_HEALTH_URL,
+    connect_timeout=float(os.getenv('ML_CONNECT_TIMEOUT', '1')),
+    read_timeout=float(os.getenv('ML_READ_TIMEOUT', '5')),
+    batch_read_timeout=float(os.getenv('ML_BATCH_READ_TIMEOUT', '30')),
+    pool_size=int(os.getenv('ML_POOL_SIZE', '10')),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv('ML_BREAKER_FAILURES', '5')),
+        reset_timeout=float(os.getenv('ML_BREAKER_RESET_SECONDS', '30'))
+    )
+)
+
+# 'sync': POST /api/feedbacks calls the ML service and returns the scored row (201).
+# 'async': the raw feedback is written right away and 202 is returned with its id;
+# the background scoring worker fills in sentiment/confidence/has_negation.
+FEEDBACK_INGEST_MODE = os.getenv('FEEDBACK_INGEST_MODE', 'sync')
+
+# Background scoring of unscored feedbacks (async mode, or failed ML calls in sync mode)
+SCORING_WORKER_ENABLED = os.getenv('SCORING_WORKER_ENABLED', 'true').lower() == 'true'
+SCORING_BATCH_SIZE = int(os.getenv('SCORING_BATCH_SIZE', '64'))
+SCORING_INTERVAL = float(os.getenv('SCORING_INTERVAL', '2'))
+# How long a worker's claim on a batch lasts; longer than ML_BATCH_READ_TIMEOUT
+SCORING_CLAIM_SECONDS = float(os.getenv('SCORING_CLAIM_SECONDS', '120'))
+
+scoring_worker = ScoringWorker(get_db_connection, ml_client,
+                               batch_size=SCORING_BATCH_SIZE, interval=SCORING_INTERVAL,
+                               claim_seconds=SCORING_CLAIM_SECONDS)
+
+# Monthly partitions of feedbacks (partitions.py): PARTITION_MONTHS_AHEAD months are
+# created ahead of time, and with FEEDBACK_RETENTION_MONTHS set, months older than
+# that are archived to gzipped CSV files in FEEDBACK_ARCHIVE_DIR and dropped
+# (0 keeps everything). Checked every PARTITION_MAINTENANCE_INTERVAL seconds.
+PARTITION_MAINTENANCE_ENABLED = os.getenv('PARTITION_MAINTENANCE_ENABLED', 'true').lower() == 'true'
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+FEEDBACK_RETENTION_MONTHS = int(os.getenv('FEEDBACK_RETENTION_MONTHS', '0'))
+FEEDBACK_ARCHIVE_DIR = os.getenv('FEEDBACK_ARCHIVE_DIR',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive'))
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv('PARTITION_MAINTENANCE_INTERVAL', '3600'))
+
+partition_maintainer = PartitionMaintainer(get_db_connection, months_ahead=PARTITION_MONTHS_AHEAD,
+                                           retention_months=FEEDBACK_RETENTION_MONTHS,
+                                           archive_dir=FEEDBACK_ARCHIVE_DIR,
+                                           interval=PARTITION_MAINTENANCE_INTERVAL)
+
+# How long the model version and negation keyword set the ML service serves
+# are trusted before /health is asked again. Predictions are only reused from
+# rows scored with both.
+MODEL_VERSION_MAX_AGE = float(os.getenv('MODEL_VERSION_MAX_AGE', '60'))
+
+def find_reusable_scores(hashes):
+    """
+    Stored predictions of the current model version and negation keyword set
+    for the given text hashes, as {text_hash: SCORE_COLUMNS dict}. Empty
+    while either is unknown.
+    """
+    model_version, negation_keywords = ml_client.current_scorer(MODEL_VERSION_MAX_AGE)
+    if model_version is None or negation_keywords is None:
+        return {}
+    with get_db_connection() as conn, conn.cursor() as cur:
+        found = reusable_scores(cur, hashes, model_version, negation_keywords)
+        conn.commit()
+    return found
+
+def reuse_scores(feedback_hash, path):
+    """
+    The stored prediction of an identical text, or None. Lookup errors are
+    only logged; the text is then scored as usual.
+    """
+    if feedback_hash is None:
+        return None
+    try:
+        scores = find_reusable_scores([feedback_hash]).get(feedback_hash)
+    except Exception as e:
+        print(f"Prediction reuse lookup failed: {e}")
+        return None
+    if scores:
+        PREDICTIONS_REUSED.labels(path).inc()
+    return scores
+
+def score_feedback(text):
+    """
+    Scores one text through the ML service. Returns the SCORE_COLUMNS values
+    as a dict, or None if the call fails (the row is then saved unscored and
+    the scoring worker picks it up).
+    """
+    try:
+        result = ml_client.predict(text)
+        return {c: result.get(c) for c in SCORE_COLUMNS}
+    except CircuitOpen:
+        pass
+    except Exception as e:
+        print(f"ML Service Exception: {str(e)}")
+    return None
+
+def insert_feedback(conn, cur, sql, params, created_at):
+    """
+    Runs the INSERT of a new feedback. If its month has no partition yet
+    (partition maintenance disabled or behind), the partition is created and
+    the INSERT retried once.
+    """
+    try:
+        cur.execute(sql, params)
+    except psycopg2.Error as e:
+        if not is_missing_partition(e):
+            raise
+        conn.rollback()
+        print(f"No feedbacks partition for {created_at:%Y-%m}, creating it")
+        ensure_month_partition(conn, created_at)
+        cur.execute(sql, params)
 
 @app.route('/api/feedbacks', methods=['POST'])
 def create_feedback():
     data = request.get_json()
     feedback_text = data.get('feedback')
     user_id = data.get('user_id')
-    
+
     if not feedback_text or not user_id:
         return jsonify({"error": "Missing feedback or user_id"}), 400
-    
+
     feedback_id = str(uuid.uuid4())
     created_at = datetime.datetime.now()
-    
-    # Call ML API
-    sentiment = None
-    cleaned_text = None
-    processed_text = None
-    confidence = None
-    has_negation = None
-
-    try:
-        # Assuming ML API runs on port 5001 or specified in ENV
-        # And accepts 'text' for prediction
-        ml_response = requests.post(ML_API_URL, json={"text": feedback_text}, timeout=5)
-        if ml_response.status_code == 200:
-            result = ml_response.json()
-            # Expected response: { "sentiment": ..., "cleaned_text": ..., "processed_text": ..., "confidence": ..., "has_negation": ... }
-            sentiment = result.get('sentiment')
-            cleaned_text = result.get('cleaned_text')
-            processed_text = result.get('processed_text')
-            confidence = result.get('confidence')
-            has_negation = result.get('has_negation')
-        else:
-            print(f"ML API Error: {ml_response.status_code}")
-    except Exception as e:
-        print(f"ML Service Exception: {str(e)}")
+    feedback_hash = text_hash(feedback_text)
+    # An identical text already scored by the current model needs no ML call
+    scores = reuse_scores(feedback_hash, 'create')
+
+    if scores is None and FEEDBACK_INGEST_MODE == 'async':
+        try:
+            with get_db_connection() as conn, conn.cursor() as cur:
+                insert_feedback(conn, cur, "INSERT INTO feedbacks (id, feedback, user_id, created_at, text_hash) "
+                                           "VALUES (%s, %s, %s, %s, %s)",
+                                (feedback_id, feedback_text, user_id, created_at, feedback_hash), created_at)
+                conn.commit()
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        scoring_worker.notify()
+        return jsonify({"id": feedback_id, "status": "pending"}), 202
+
+    if scores is None:
+        scores = score_feedback(feedback_text) or dict.fromkeys(SCORE_COLUMNS)
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("""
-            INSERT INTO feedbacks 
-            (id, feedback, user_id, created_at, sentiment, cleaned_text, processed_text, confidence, has_negation) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (feedback_id, feedback_text, user_id, created_at, sentiment, cleaned_text, processed_text, confidence, has_negation))
-        conn.commit()
-        
-        # Verify and return created obj
-        cur.execute("SELECT * FROM feedbacks WHERE id = %s", (feedback_id,))
-        created = cur.fetchone()
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            insert_feedback(conn, cur, """
+                INSERT INTO feedbacks
+                (id, feedback, user_id, created_at, sentiment, cleaned_text, processed_text, confidence, has_negation,
+                 model_version, negation_keywords, text_hash)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING *
+                """,
+                (feedback_id, feedback_text, user_id, created_at, *(scores[c] for c in SCORE_COLUMNS),
+                 feedback_hash), created_at)
+            created = cur.fetchone()
+            conn.commit()
+        if scores['sentiment'] is None:
+            scoring_worker.notify()
         return jsonify(created), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# GET /api/feedbacks page size: default and the most a caller may ask for
+FEEDBACKS_PAGE_SIZE = int(os.getenv('FEEDBACKS_PAGE_SIZE', '50'))
+FEEDBACKS_MAX_PAGE_SIZE = int(os.getenv('FEEDBACKS_MAX_PAGE_SIZE', '500'))
+
+# POST /api/feedbacks/import: rows per COPY/transaction, texts per ML call when
+# scoring (at most the ML service's PREDICT_BATCH_MAX_ITEMS) and errors listed
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '5000'))
+IMPORT_SCORE_BATCH_SIZE = int(os.getenv('IMPORT_SCORE_BATCH_SIZE', '500'))
+IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', '1000'))
+
+IMPORT_PARSERS = {
+    'ndjson': parse_ndjson,
+    'application/x-ndjson': parse_ndjson,
+    'application/ndjson': parse_ndjson,
+    'application/jsonl': parse_ndjson,
+    'csv': parse_csv,
+    'text/csv': parse_csv,
+}
+
+@app.route('/api/feedbacks/import', methods=['POST'])
+def import_feedbacks():
+    """
+    Bulk import of NDJSON or CSV (format from ?format= or the Content-Type),
+    one feedback per line/row with 'feedback' and optional 'id', 'user_id'
+    and 'created_at'. The body is streamed, never held in memory at once.
+    Rows whose text was already scored by the current model get that
+    prediction. With ?score=true the others are scored through the ML service
+    while importing; otherwise they are left to the scoring worker.
+    """
+    parser = IMPORT_PARSERS.get(request.args.get('format') or request.mimetype)
+    if parser is None:
+        return jsonify({"error": "Send NDJSON (application/x-ndjson) or CSV (text/csv)"}), 415
+
+    score = None
+    if request.args.get('score', 'false').lower() == 'true':
+        score = ml_client.predict_batch
+
+    importer = FeedbackImporter(get_db_connection, chunk_size=IMPORT_CHUNK_SIZE, score=score,
+                                reuse=find_reusable_scores,
+                                score_batch_size=IMPORT_SCORE_BATCH_SIZE, max_errors=IMPORT_MAX_ERRORS)
+    try:
+        summary = importer.run(parser(request.stream))
+    except UnicodeDecodeError as e:
+        summary = dict(importer.summary, error=f"Body is not valid UTF-8: {e}")
+        return jsonify(summary), 400
+
+    if summary['inserted'] > summary['scored']:
+        scoring_worker.notify()
+    return jsonify(summary), 200
+
+# GET /api/feedbacks/export: rows fetched from the server-side cursor at a time,
+# and rows per Parquet row group (what a Parquet export holds in memory)
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+EXPORT_PARQUET_ROW_GROUP_SIZE = int(os.getenv('EXPORT_PARQUET_ROW_GROUP_SIZE', '50000'))
+
+@app.route('/api/feedbacks/export', methods=['GET'])
+def export_feedbacks():
+    """
+    All matching feedbacks, newest first, streamed as ?format=csv (default),
+    ndjson or parquet. Takes the fields and filters of GET /api/feedbacks.
+    Rows are read through a server-side cursor and written out chunk by
+    chunk, so memory use does not grow with the table.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"'format' must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    if export_format == 'parquet' and not parquet_available():
+        return jsonify({"error": "Parquet export needs pyarrow installed on the backend"}), 501
+
+    try:
+        columns = parse_fields(request.args.get('fields'))
+        where, params = parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    chunks = iter_chunks(get_db_connection, columns, where, params, chunk_size=EXPORT_CHUNK_SIZE)
+    try:
+        # Run the query before answering, so that database errors still get a 500
+        first = next(chunks, [])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    def all_chunks():
+        try:
+            if first:
+                yield first
+                yield from chunks
+        finally:
+            # Returns the connection to the pool if the client goes away early
+            chunks.close()
+
+    writer, content_type, extension = EXPORT_FORMATS[export_format]
+    options = {'row_group_size': EXPORT_PARQUET_ROW_GROUP_SIZE} if export_format == 'parquet' else {}
+    filename = f"feedbacks_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    return Response(writer(all_chunks(), columns, **options), content_type=content_type,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 @app.route('/api/feedbacks', methods=['GET'])
 def get_feedbacks():
+    """
+    One page of feedbacks, newest first. Query parameters:
+    limit, cursor (next_cursor of the previous page), fields (comma separated
+    columns) and the filters of feedback_query.parse_filters.
+    """
+    try:
+        limit = int(request.args.get('limit', FEEDBACKS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    if not 1 <= limit <= FEEDBACKS_MAX_PAGE_SIZE:
+        return jsonify({"error": f"'limit' must be between 1 and {FEEDBACKS_MAX_PAGE_SIZE}"}), 400
+
+    try:
+        columns = parse_fields(request.args.get('fields'))
+        where, params = parse_filters(request.args)
+        if request.args.get('cursor'):
+            where += " AND (created_at, id) < (%s, %s)"
+            params.extend(decode_cursor(request.args['cursor']))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # One extra row tells whether there is a next page
+            cur.execute(f"""
+                SELECT {", ".join(columns)} FROM feedbacks
+                WHERE TRUE{where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+                """, (*params, limit + 1))
+            feedbacks = cur.fetchall()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    next_cursor = encode_cursor(feedbacks[limit - 1]) if len(feedbacks) > limit else None
+    return jsonify({"feedbacks": feedbacks[:limit], "next_cursor": next_cursor}), 200
+
+@app.route('/api/feedbacks/stats', methods=['GET'])
+def feedback_stats():
+    """
+    Feedback counts by sentiment, negation flag and confidence bucket, in
+    total and per day or hour. Read from the rollup tables kept up to date by
+    migrations/0003_feedback_rollups.sql, so the cost depends on the range,
+    not on the number of feedbacks. See feedback_stats.parse_stats_range for
+    the parameters.
+    """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT * FROM feedbacks")
-        feedbacks = cur.fetchall()
-        cur.close()
-        conn.close()
-        return jsonify(feedbacks), 200
+        granularity, start, end = parse_stats_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    table = GRANULARITIES[granularity][0]
+    try:
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                SELECT bucket, sentiment, has_negation, confidence_bucket, feedbacks, confidence_sum
+                FROM {table}
+                WHERE bucket >= %s AND bucket < %s AND feedbacks <> 0
+                """, (start, end))
+            rows = cur.fetchall()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    return jsonify(summarize_rollups(rows, granularity, start, end)), 200
+
+# GET /api/feedbacks/terms: days counted by default, and terms listed by default and at most
+TERMS_DEFAULT_DAYS = int(os.getenv('TERMS_DEFAULT_DAYS', '7'))
+TERMS_PAGE_SIZE = int(os.getenv('TERMS_PAGE_SIZE', '20'))
+TERMS_MAX_PAGE_SIZE = int(os.getenv('TERMS_MAX_PAGE_SIZE', '200'))
+TERM_KINDS = ("word", "negation")
+
+@app.route('/api/feedbacks/terms', methods=['GET'])
+def feedback_terms():
+    """
+    The terms found in the most feedbacks over a range of days, with their
+    counts per sentiment, read from the per-day counts kept up to date by
+    migrations/0008_feedback_terms.sql. Query parameters: kind (word, the
+    default, or negation for the negation keywords matched), limit,
+    sentiment and term (one or more of each, repeated or comma separated;
+    terms are normalized like cleaned_text) and days (default
+    TERMS_DEFAULT_DAYS) or from / to, as for /api/feedbacks/stats.
+    """
+    kind = request.args.get('kind', 'word')
+    if kind not in TERM_KINDS:
+        return jsonify({"error": f"'kind' must be one of {', '.join(TERM_KINDS)}"}), 400
+    try:
+        limit = int(request.args.get('limit', TERMS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    if not 1 <= limit <= TERMS_MAX_PAGE_SIZE:
+        return jsonify({"error": f"'limit' must be between 1 and {TERMS_MAX_PAGE_SIZE}"}), 400
+
+    args = request.args.copy()
+    args.pop('granularity', None)
+    args.setdefault('days', str(TERMS_DEFAULT_DAYS))
+    try:
+        _, start, end = parse_stats_range(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    where = ""
+    params = [kind, start, end]
+    sentiments = [s.strip() for value in args.getlist('sentiment') for s in value.split(",") if s.strip()]
+    if sentiments:
+        where += " AND sentiment = ANY(%s)"
+        params.append(sentiments)
+    terms = [" ".join(normalize_query(t).split()) for value in args.getlist('term') for t in value.split(",")]
+    if any(terms):
+        where += " AND term = ANY(%s)"
+        params.append([t for t in terms if t])
+
+    try:
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                SELECT term, sum(feedbacks)::bigint AS feedbacks,
+                       json_object_agg(coalesce(sentiment, %s), feedbacks) AS by_sentiment
+                FROM (
+                    SELECT term, sentiment, sum(feedbacks)::bigint AS feedbacks FROM feedback_terms_daily
+                    WHERE kind = %s AND day >= %s AND day < %s{where}
+                    GROUP BY term, sentiment
+                    HAVING sum(feedbacks) > 0
+                ) AS t
+                GROUP BY term
+                ORDER BY 2 DESC, term
+                LIMIT %s
+                """, (UNSCORED, *params, limit))
+            terms = cur.fetchall()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({"kind": kind, "from": start.isoformat(), "to": end.isoformat(), "terms": terms}), 200
+
+# GET /api/feedbacks/duplicates: clusters listed by default and at most
+DUPLICATES_PAGE_SIZE = int(os.getenv('DUPLICATES_PAGE_SIZE', '20'))
+DUPLICATES_MAX_PAGE_SIZE = int(os.getenv('DUPLICATES_MAX_PAGE_SIZE', '200'))
+
+@app.route('/api/feedbacks/duplicates', methods=['GET'])
+def feedback_duplicates():
+    """
+    Groups of feedbacks whose texts are equal after clean_text, largest
+    first. Query parameters: limit (clusters listed) and min_size (smallest
+    cluster counted, default 2). The cluster sizes are counted from
+    feedbacks_text_hash_idx alone (an index-only scan); only the listed
+    clusters read a sample row from the table.
+    """
+    try:
+        limit = int(request.args.get('limit', DUPLICATES_PAGE_SIZE))
+        min_size = int(request.args.get('min_size', 2))
+    except ValueError:
+        return jsonify({"error": "'limit' and 'min_size' must be integers"}), 400
+    if not 1 <= limit <= DUPLICATES_MAX_PAGE_SIZE:
+        return jsonify({"error": f"'limit' must be between 1 and {DUPLICATES_MAX_PAGE_SIZE}"}), 400
+    if min_size < 2:
+        return jsonify({"error": "'min_size' must be at least 2"}), 400
+
+    try:
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                WITH clusters AS MATERIALIZED (
+                    SELECT text_hash, count(*) AS size FROM feedbacks
+                    WHERE text_hash IS NOT NULL
+                    GROUP BY text_hash
+                    HAVING count(*) >= %s
+                )
+                SELECT count(*) AS clusters_total, coalesce(sum(size - 1), 0) AS duplicate_rows,
+                       (SELECT coalesce(json_agg(t ORDER BY t.size DESC, t.text_hash), '[]')
+                        FROM (SELECT c.text_hash, c.size, s.id AS sample_id, s.feedback AS sample_feedback,
+                                     s.sentiment AS sample_sentiment
+                              FROM (SELECT * FROM clusters ORDER BY size DESC, text_hash LIMIT %s) AS c
+                              CROSS JOIN LATERAL (
+                                  SELECT id, feedback, sentiment FROM feedbacks f
+                                  WHERE f.text_hash = c.text_hash
+                                  LIMIT 1
+                              ) AS s) AS t) AS clusters
+                FROM clusters
+                """, (min_size, limit))
+            report = cur.fetchone()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    report['duplicate_rows'] = int(report['duplicate_rows'])
+    return jsonify(report), 200
+
+# GET /api/feedbacks/search page size: default and the most a caller may ask for
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', '100'))
+
+@app.route('/api/feedbacks/search', methods=['GET'])
+def search_feedbacks():
+    """
+    One page of the feedbacks whose cleaned text matches q (see
+    feedback_search.py). Query parameters: q, sort (rank, the default, for
+    best match first, or newest), fuzzy (true to also match close spellings;
+    needs pg_trgm), limit, cursor (next_cursor of the previous page), fields
+    and the filters of feedback_query.parse_filters.
+    Each feedback comes with its rank; substring_matches tells whether
+    substring matching was on.
+    """
+    query = normalize_query(request.args.get('q', ''))
+    if not query:
+        return jsonify({"error": "'q' is required"}), 400
+    try:
+        limit = int(request.args.get('limit', SEARCH_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer"}), 400
+    if not 1 <= limit <= SEARCH_MAX_PAGE_SIZE:
+        return jsonify({"error": f"'limit' must be between 1 and {SEARCH_MAX_PAGE_SIZE}"}), 400
+    sort = request.args.get('sort', 'rank')
+    if sort not in SORTS:
+        return jsonify({"error": f"'sort' must be one of {', '.join(SORTS)}"}), 400
+
+    try:
+        columns = parse_fields(request.args.get('fields'))
+        where, params = parse_filters(request.args)
+        cursor = decode_search_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    fuzzy = request.args.get('fuzzy', 'false').lower() == 'true'
+
+    try:
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            trigram = trigram_available(cur)
+            # One extra row tells whether there is a next page
+            sql, sql_params = build_search(query, columns, where, params, cursor, limit + 1, trigram, fuzzy, sort)
+            cur.execute(sql, sql_params)
+            feedbacks = cur.fetchall()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    next_cursor = encode_search_cursor(feedbacks[limit - 1]) if len(feedbacks) > limit else None
+    return jsonify({"feedbacks": feedbacks[:limit], "next_cursor": next_cursor, "substring_matches": trigram}), 200
+
 @app.route('/api/feedbacks/<feedback_id>', methods=['GET'])
 def get_feedback(feedback_id):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT * FROM feedbacks WHERE id = %s", (feedback_id,))
-        feedback = cur.fetchone()
-        cur.close()
-        conn.close()
-        
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM feedbacks WHERE id = %s", (feedback_id,))
+            feedback = cur.fetchone()
+
         if not feedback:
             return jsonify({"error": "Feedback not found"}), 404
         return jsonify(feedback), 200
@@ -204,67 +628,216 @@ def get_feedback(feedback_id):
 
 @app.route('/api/feedbacks/<feedback_id>', methods=['PUT'])
 def update_feedback(feedback_id):
-    data = request.get_json()
+    """
+    Updates the feedback text. The old scores no longer describe the new
+    text, so it is re-scored: from an identical text's stored prediction if
+    there is one, else right away in sync mode; otherwise (or if the ML call
+    fails) the scores are cleared for the scoring worker.
+    """
+    data = request.get_json(silent=True)
+    if data is None and not request.get_data():
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    if 'feedback' in data and (not isinstance(data['feedback'], str) or not data['feedback'].strip()):
+        return jsonify({"error": "feedback must be a non-empty string"}), 400
+
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("SELECT * FROM feedbacks WHERE id = %s", (feedback_id,))
-        feedback = cur.fetchone()
+        scores = feedback_hash = None
+        if 'feedback' in data:
+            feedback_hash = text_hash(data['feedback'])
+            scores = reuse_scores(feedback_hash, 'update')
+            if scores is None and FEEDBACK_INGEST_MODE != 'async':
+                # No ML call for a feedback that does not exist
+                with get_db_connection() as conn, conn.cursor() as cur:
+                    cur.execute("SELECT 1 FROM feedbacks WHERE id = %s", (feedback_id,))
+                    exists = cur.fetchone() is not None
+                if not exists:
+                    return jsonify({"error": "Feedback not found"}), 404
+                scores = score_feedback(data['feedback'])
+            scores = scores or dict.fromkeys(SCORE_COLUMNS)
+
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if scores is None:
+                cur.execute("SELECT * FROM feedbacks WHERE id = %s", (feedback_id,))
+                feedback = cur.fetchone()
+            else:
+                assignments = ", ".join(f"{c} = %s" for c in SCORE_COLUMNS)
+                cur.execute(f"UPDATE feedbacks SET feedback = %s, text_hash = %s, {assignments} "
+                            "WHERE id = %s RETURNING *",
+                            (data['feedback'], feedback_hash, *(scores[c] for c in SCORE_COLUMNS), feedback_id))
+                feedback = cur.fetchone()
+                conn.commit()
+                if feedback and scores['sentiment'] is None:
+                    scoring_worker.notify()
+
         if not feedback:
-            cur.close()
-            conn.close()
             return jsonify({"error": "Feedback not found"}), 404
-        
-        # Update fields if provided
-        query = "UPDATE feedbacks SET "
-        params = []
-        updates = []
-        
-        if 'feedback' in data:
-            updates.append("feedback = %s")
-            params.append(data['feedback'])
-            
-        if not updates:
-            cur.close()
-            conn.close()
-            return jsonify(feedback), 200
-            
-        query += ", ".join(updates) + " WHERE id = %s"
-        params.append(feedback_id)
-        
-        cur.execute(query, tuple(params))
-        conn.commit()
-        
-        cur.execute("SELECT * FROM feedbacks WHERE id = %s", (feedback_id,))
-        updated_feedback = cur.fetchone()
-        cur.close()
-        conn.close()
-        return jsonify(updated_feedback), 200
+        return jsonify(feedback), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/feedbacks/<feedback_id>', methods=['DELETE'])
 def delete_feedback(feedback_id):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM feedbacks WHERE id = %s", (feedback_id,))
-        conn.commit()
-        deleted_count = cur.rowcount
-        cur.close()
-        conn.close()
-        
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM feedbacks WHERE id = %s", (feedback_id,))
+            conn.commit()
+            deleted_count = cur.rowcount
+
         if deleted_count == 0:
             return jsonify({"error": "Feedback not found"}), 404
-            
+
         return jsonify({"message": "Feedback deleted"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Rescoring backfills (rescoring.py): rows per /predict/batch call and UPDATE
+# (at most the ML service's PREDICT_BATCH_MAX_ITEMS), and the default rate limit
+RESCORE_CHUNK_SIZE = int(os.getenv('RESCORE_CHUNK_SIZE', '256'))
+RESCORE_MAX_ROWS_PER_SECOND = float(os.getenv('RESCORE_MAX_ROWS_PER_SECOND', '100'))
+
+def run_rescoring_job(job_id):
+    try:
+        RescoringJob(get_db_connection, ml_client, job_id).run()
+    except JobBusy as e:
+        print(e)
+    except Exception as e:
+        print(f"Rescoring job {job_id} stopped: {e}")
+
+@app.route('/api/rescoring-jobs', methods=['POST'])
+def start_rescoring_job():
+    """
+    Starts a rescoring backfill in the background and returns it (202).
+    JSON body, all optional: mode ('stale' (default): unscored rows and rows
+    scored by another model version or negation keyword set than the ones now
+    served; 'unscored'; 'all'), chunk_size, max_rows_per_second (0 for no limit), or job_id to
+    resume a given job. An unfinished job for the same mode, model version
+    and negation keyword set is resumed rather than started again.
+    """
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', 'stale')
+    if mode not in MODES:
+        return jsonify({"error": f"'mode' must be one of {', '.join(MODES)}"}), 400
+    try:
+        chunk_size = int(data.get('chunk_size', RESCORE_CHUNK_SIZE))
+        max_rows_per_second = float(data.get('max_rows_per_second', RESCORE_MAX_ROWS_PER_SECOND))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'chunk_size' and 'max_rows_per_second' must be numbers"}), 400
+    if not 1 <= chunk_size <= MAX_CHUNK_SIZE or max_rows_per_second < 0:
+        return jsonify({"error": f"'chunk_size' must be between 1 and {MAX_CHUNK_SIZE}, "
+                                 "'max_rows_per_second' at least 0"}), 400
+
+    try:
+        with get_db_connection() as conn:
+            if data.get('job_id') is not None:
+                job = get_job(conn, data['job_id'])
+                if job is None:
+                    return jsonify({"error": "Rescoring job not found"}), 404
+                if job['status'] not in RESUMABLE:
+                    return jsonify(dict(job, error="Rescoring job already finished")), 409
+            else:
+                try:
+                    model_version, negation_keywords = ml_client.scorer()
+                except Exception as e:
+                    return jsonify({"error": f"ML service unavailable: {e}"}), 503
+                job = (find_resumable_job(conn, mode, model_version, negation_keywords)
+                       or create_job(conn, mode, model_version, negation_keywords, chunk_size,
+                                     max_rows_per_second))
+            if is_running(conn, job['id']):
+                return jsonify(dict(job, error="Rescoring job is already running")), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    threading.Thread(target=run_rescoring_job, args=(job['id'],), name=f"rescoring-{job['id']}",
+                     daemon=True).start()
+    return jsonify(job), 202
+
+@app.route('/api/rescoring-jobs', methods=['GET'])
+def get_rescoring_jobs():
+    try:
+        with get_db_connection() as conn:
+            return jsonify({"jobs": list_jobs(conn)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/rescoring-jobs/<int:job_id>', methods=['GET'])
+def get_rescoring_job(job_id):
+    try:
+        with get_db_connection() as conn:
+            job = get_job(conn, job_id)
+            if job:
+                job['running'] = is_running(conn, job_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if not job:
+        return jsonify({"error": "Rescoring job not found"}), 404
+    return jsonify(job), 200
+
+@app.route('/api/rescoring-jobs/<int:job_id>/pause', methods=['POST'])
+def pause_rescoring_job(job_id):
+    """
+    Stops the job after its current chunk; POST /api/rescoring-jobs with its
+    job_id resumes it.
+    """
+    try:
+        with get_db_connection() as conn:
+            job = pause_job(conn, job_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if not job:
+        return jsonify({"error": "Rescoring job not found"}), 404
+    return jsonify(job), 200
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """
+    Liveness of the backend and its dependencies. 'ok' needs the database;
+    an open ML circuit only makes it 'degraded', since feedbacks are still
+    accepted and scored later.
+    """
+    database = "ok"
+    try:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1")
+    except Exception as e:
+        database = f"error: {e}"
+
+    ml_service = ml_client.breaker.snapshot()
+    if database != "ok":
+        status, code = "error", 503
+    elif ml_service['state'] != CircuitBreaker.CLOSED:
+        status, code = "degraded", 200
+    else:
+        status, code = "ok", 200
+    return jsonify({"status": status, "database": database, "ml_service": ml_service,
+                    "ingest_mode": FEEDBACK_INGEST_MODE}), code
+
+@app.route('/api/db/pool', methods=['GET'])
+def pool_stats():
+    return jsonify(db_pool.stats()), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = render()
+    return Response(body, content_type=content_type)
+
 if __name__ == '__main__':
     try:
         init_db()
     except Exception as e:
         print(f"Database init failed: {e}")
+    # With debug=True the reloader runs this block in a watcher process too;
+    # only the process that serves requests scores and keeps a pool.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        try:
+            db_pool.open()
+        except Exception as e:
+            print(f"Database pool warm-up failed: {e}")
+        if SCORING_WORKER_ENABLED:
+            scoring_worker.start()
+        if PARTITION_MAINTENANCE_ENABLED:
+            partition_maintainer.start()
+    else:
+        db_pool.close()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,152 @@
+"""
+EXPLAIN plans and latencies of the backend's feedback queries on a seeded
+table, before and after the index migration.
+
+Creates (or recreates) a separate database, applies the migrations up to
+--before, seeds --rows feedbacks spread over the last year, runs the
+queries, then applies the remaining migrations and runs them again.
+Connection settings come from DB_HOST, DB_USER, DB_PASSWORD and DB_PORT.
+
+    python bench_indexes.py --rows 1000000
+"""
+import argparse
+import os
+import statistics
+import time
+
+import psycopg2
+
+from migrations import migrate
+
+# (name, sql). Each mirrors a query the backend runs.
+QUERIES = [
+    ("latest page", """
+        SELECT id, feedback, created_at, sentiment, confidence, has_negation FROM feedbacks
+        ORDER BY created_at DESC, id DESC LIMIT 51"""),
+    ("page after cursor", """
+        SELECT id, feedback, created_at, sentiment, confidence, has_negation FROM feedbacks
+        WHERE (created_at, id) < (now() - interval '90 days', '')
+        ORDER BY created_at DESC, id DESC LIMIT 51"""),
+    ("sentiment page", """
+        SELECT id, feedback, created_at, sentiment, confidence, has_negation FROM feedbacks
+        WHERE sentiment = 'Negative'
+        ORDER BY created_at DESC, id DESC LIMIT 51"""),
+    ("one day", """
+        SELECT id, feedback, created_at, sentiment, confidence, has_negation FROM feedbacks
+        WHERE created_at >= date_trunc('day', now()) - interval '30 days'
+          AND created_at < date_trunc('day', now()) - interval '29 days'
+        ORDER BY created_at DESC, id DESC LIMIT 51"""),
+    ("user's feedbacks", """
+        SELECT id, feedback, created_at, sentiment FROM feedbacks
+        WHERE user_id = 'user-42'
+        ORDER BY created_at DESC LIMIT 51"""),
+    ("scoring batch", """
+        SELECT id, feedback, created_at FROM feedbacks
+        WHERE sentiment IS NULL
+        ORDER BY created_at LIMIT 64
+        FOR UPDATE SKIP LOCKED"""),
+    ("scoring queue depth", """
+        SELECT count(*), min(created_at) FROM feedbacks WHERE sentiment IS NULL"""),
+]
+
+SEED_SQL = """
+INSERT INTO users (id, role)
+SELECT 'user-' || u, 'anonymous' FROM generate_series(1, %(users)s) AS u;
+
+INSERT INTO feedbacks (id, feedback, user_id, created_at, sentiment, cleaned_text, processed_text,
+                       confidence, has_negation)
+SELECT 'fb-' || n,
+       'feedback number ' || n,
+       'user-' || (1 + (hashint4(n) & 2147483647) %% %(users)s),
+       now() - random() * interval '365 days',
+       s.sentiment,
+       CASE WHEN s.sentiment IS NOT NULL THEN 'feedback number ' || n END,
+       CASE WHEN s.sentiment IS NOT NULL THEN 'feedback number ' || n END,
+       CASE WHEN s.sentiment IS NOT NULL THEN 0.5 + random() / 2 END,
+       CASE WHEN s.sentiment IS NOT NULL THEN random() < 0.2 END
+FROM generate_series(1, %(rows)s) AS n
+CROSS JOIN LATERAL (
+    SELECT CASE WHEN r < 0.45 THEN 'Positive' WHEN r < 0.9 THEN 'Negative'
+                WHEN r < 0.99 THEN 'Unknown' END AS sentiment
+    FROM (SELECT random() + n * 0 AS r) AS x
+) AS s;
+"""
+
+
+def connect(database):
+    return psycopg2.connect(host=os.getenv("DB_HOST"), database=database, user=os.getenv("DB_USER"),
+                            password=os.getenv("DB_PASSWORD"), port=os.getenv("DB_PORT"))
+
+
+def recreate_database(name):
+    conn = connect(os.getenv("DB_NAME", "postgres"))
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f'DROP DATABASE IF EXISTS "{name}"')
+        cur.execute(f'CREATE DATABASE "{name}"')
+    conn.close()
+
+
+def run_queries(conn, repeat):
+    results = {}
+    for name, sql in QUERIES:
+        with conn.cursor() as cur:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, COSTS OFF, TIMING OFF, SUMMARY OFF) " + sql)
+            plan = "\n".join(f"    {row[0]}" for row in cur.fetchall())
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cur.execute(sql)
+                cur.fetchall()
+                timings.append(1000 * (time.perf_counter() - started))
+        conn.rollback()
+        results[name] = statistics.median(timings)
+        print(f"  {name}: {results[name]:.2f} ms (median of {repeat})\n{plan}\n")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--database", default="feedbacks_bench", help="database to (re)create for the run")
+    parser.add_argument("--before", type=int, default=1, help="last migration applied before seeding")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per query")
+    args = parser.parse_args()
+
+    recreate_database(args.database)
+    conn = connect(args.database)
+    migrate(conn, target=args.before)
+
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(SEED_SQL, {"rows": args.rows, "users": args.users})
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE feedbacks")
+    conn.autocommit = False
+    print(f"Seeded {args.rows} feedbacks in {time.perf_counter() - started:.1f}s\n")
+
+    print(f"Before (migrations up to {args.before:04d}):")
+    before = run_queries(conn, args.repeat)
+
+    started = time.perf_counter()
+    migrate(conn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE feedbacks")
+    conn.autocommit = False
+    print(f"\nMigrated in {time.perf_counter() - started:.1f}s\n")
+
+    print("After:")
+    after = run_queries(conn, args.repeat)
+    conn.close()
+
+    print(f"{'query':<22} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, _ in QUERIES:
+        print(f"{name:<22} {before[name]:>10.2f} {after[name]:>10.2f} {before[name] / after[name]:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Requests/sec of the backend with the connection pool versus opening a new
+connection per request (the behaviour before pooling, DB_POOL_MAX_SIZE=0).
+
+Runs the Flask app in-process against the database configured in the
+environment (DB_HOST, DB_NAME, ...), so only the request handling and the
+database round trips are measured:
+
+    python bench_pool.py --threads 16 --seconds 10
+"""
+import argparse
+import threading
+import time
+
+import app as backend
+from db import ConnectionPool
+
+
+def run(client_count, seconds, path):
+    counts = [0] * client_count
+    errors = [0] * client_count
+    stop = time.perf_counter() + seconds
+
+    def worker(i):
+        client = backend.app.test_client()
+        while time.perf_counter() < stop:
+            if client.get(path).status_code == 200:
+                counts[i] += 1
+            else:
+                errors[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(client_count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each run")
+    parser.add_argument("--pool-size", type=int, default=10, help="max size of the pool")
+    args = parser.parse_args()
+
+    backend.init_db()
+    client = backend.app.test_client()
+    user_id = client.post("/api/users/register", json={"role": "anonymous"}).get_json()["user_id"]
+    feedback_id = client.post("/api/feedbacks", json={"feedback": "bench", "user_id": user_id}).get_json()["id"]
+    path = f"/api/feedbacks/{feedback_id}"
+
+    connect_kwargs = backend.db_pool.connect_kwargs
+    print(f"GET {path}, {args.threads} threads, {args.seconds:.0f}s per run")
+    print(f"{'mode':<22} {'req/s':>9} {'errors':>7}")
+    for name, max_size in (("connect per request", 0), (f"pool (max {args.pool_size})", args.pool_size)):
+        backend.db_pool.close()
+        backend.db_pool = ConnectionPool(min_size=min(2, max_size), max_size=max_size, **connect_kwargs).open()
+        run(args.threads, 1.0, path)  # warm up
+        rate, errors = run(args.threads, args.seconds, path)
+        print(f"{name:<22} {rate:>9.0f} {errors:>7}")
+
+    client.delete(path)
+
+
+if __name__ == "__main__":
+    main()
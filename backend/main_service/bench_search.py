@@ -0,0 +1,164 @@
+"""
+Latency of GET /api/feedbacks/search's query against an ILIKE scan, on a
+seeded table of Arabic feedbacks.
+
+Creates (or recreates) a separate database, applies the migrations up to
+0006, seeds --rows feedbacks spread over the last year whose texts are drawn
+from a vocabulary with a few very common words and many rare ones, and times
+"cleaned_text ILIKE '%word%'" for words of different frequencies. It then
+applies migration 0007 (the search indexes) and times the search query of
+feedback_search.py for the same words, in both of its orders. Connection settings come
+from DB_HOST, DB_USER, DB_PASSWORD and DB_PORT.
+
+    python bench_search.py --rows 1000000
+"""
+import argparse
+import statistics
+import time
+
+from bench_indexes import connect, recreate_database
+from feedback_query import FEEDBACK_COLUMNS
+from feedback_search import SORTS, build_search, trigram_available
+from migrations import migrate
+
+# Common words of government service feedback, already normalized as by
+# clean_text; they come first in the vocabulary, so they are drawn most often
+COMMON_WORDS = [
+    "الخدمه", "الموظف", "الانتظار", "طويل", "ممتازه", "سيءه", "سريع", "بطيء", "المستشفي", "الجواز",
+    "التجديد", "الموقع", "التطبيق", "شكرا", "جدا", "لا", "لم", "يتم", "الرد", "المعامله",
+    "الموعد", "المكتب", "الرسوم", "الطلب", "التسجيل", "الدفع", "البطاقه", "الاستقبال", "النظام", "تعطل",
+]
+
+SEED_SQL = """
+SELECT feedback_partitions_ensure(LOCALTIMESTAMP - interval '1 year', LOCALTIMESTAMP + interval '1 month');
+
+CREATE TEMP TABLE vocabulary (id INTEGER PRIMARY KEY, word TEXT);
+INSERT INTO vocabulary SELECT n, word FROM unnest(%(common)s::text[]) WITH ORDINALITY AS c (word, n);
+INSERT INTO vocabulary
+SELECT cardinality(%(common)s::text[]) + n,
+       string_agg(substr('ابتثجحخدذرزسشصضطظعغفقكلمنهوي', 1 + (random() * 27)::int, 1), '')
+FROM generate_series(1, %(vocabulary)s) AS n
+CROSS JOIN LATERAL generate_series(1, 3 + n %% 5) AS c
+GROUP BY n;
+ANALYZE vocabulary;
+
+INSERT INTO feedbacks (id, feedback, created_at, sentiment, cleaned_text, processed_text, confidence,
+                       has_negation)
+SELECT 'fb-' || n, t.text, LOCALTIMESTAMP - random() * interval '360 days',
+       (ARRAY['Positive', 'Negative', 'Unknown'])[1 + (random() * 2)::int],
+       t.text, t.text, 0.5 + random() / 2, random() < 0.2
+FROM generate_series(1, %(rows)s) AS n
+CROSS JOIN LATERAL (
+    -- power() skews the draws towards the start of the vocabulary
+    SELECT string_agg(v.word, ' ') AS text
+    FROM (SELECT 1 + floor((cardinality(%(common)s::text[]) + %(vocabulary)s) * power(random(), 3))::int AS id
+          FROM generate_series(1, 4 + n %% 7)) AS d
+    JOIN vocabulary AS v USING (id)
+) AS t;
+"""
+
+
+def pick_words(conn):
+    """
+    (name, query) pairs of words of decreasing frequency in the seeded texts,
+    plus a two word query and one that matches nothing.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT word FROM vocabulary ORDER BY id")
+        words = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    return [
+        ("most common word", words[0]),
+        ("common word", words[20]),
+        ("uncommon word", words[400]),
+        ("rare word", words[4000]),
+        ("two words", f"{words[2]} {words[5]}"),
+        ("no match", "غغغغغغغغ"),
+    ]
+
+
+def time_query(conn, sql, params, repeat):
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, COSTS OFF, TIMING OFF, SUMMARY OFF) " + sql, params)
+        plan = "\n".join(f"    {row[0]}" for row in cur.fetchall())
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            timings.append(1000 * (time.perf_counter() - started))
+    conn.rollback()
+    return statistics.median(timings), len(rows), plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=20_000, help="distinct words besides the common ones")
+    parser.add_argument("--database", default="feedbacks_search_bench", help="database to (re)create for the run")
+    parser.add_argument("--limit", type=int, default=20, help="page size")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per query")
+    args = parser.parse_args()
+
+    recreate_database(args.database)
+    conn = connect(args.database)
+    migrate(conn, target=6)
+
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(SEED_SQL, {"rows": args.rows, "vocabulary": args.vocabulary, "common": COMMON_WORDS})
+    conn.commit()
+    words = pick_words(conn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE feedbacks")
+    conn.autocommit = False
+    print(f"Seeded {args.rows} feedbacks in {time.perf_counter() - started:.1f}s\n")
+
+    columns = list(FEEDBACK_COLUMNS)
+    print("ILIKE scan, newest matches first:")
+    ilike = {}
+    for name, query in words:
+        clauses = " AND ".join("cleaned_text ILIKE %s" for _ in query.split())
+        sql = f"""
+            SELECT {", ".join(columns)} FROM feedbacks WHERE {clauses}
+            ORDER BY created_at DESC, id DESC LIMIT %s"""
+        ilike[name] = time_query(conn, sql, [*(f"%{w}%" for w in query.split()), args.limit + 1], args.repeat)
+        print(f"  {name} ({query}): {ilike[name][0]:.2f} ms (median of {args.repeat})\n{ilike[name][2]}\n")
+
+    started = time.perf_counter()
+    migrate(conn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE feedbacks")
+    conn.autocommit = False
+    print(f"Migrated in {time.perf_counter() - started:.1f}s\n")
+
+    with conn.cursor() as cur:
+        trigram = trigram_available(cur)
+    conn.rollback()
+    matches = {}
+    with conn.cursor() as cur:
+        for name, query in words:
+            cur.execute("SELECT count(*) FROM feedbacks WHERE to_tsvector('simple', coalesce(cleaned_text, '')) "
+                        "@@ feedback_search_query(%s)", (query,))
+            matches[name] = cur.fetchone()[0]
+    conn.rollback()
+    search = {}
+    for sort in SORTS:
+        print(f"Search query ({'with' if trigram else 'without'} pg_trgm), sort={sort}:")
+        for name, query in words:
+            sql, params = build_search(query, columns, limit=args.limit + 1, trigram=trigram, sort=sort)
+            search[sort, name] = time_query(conn, sql, params, args.repeat)
+            print(f"  {name} ({query}, {matches[name]} matches): {search[sort, name][0]:.2f} ms "
+                  f"(median of {args.repeat})\n{search[sort, name][2]}\n")
+    conn.close()
+
+    print(f"{'query':<18} {'matches':>8} {'ILIKE ms':>10}" + "".join(f" {sort + ' ms':>10}" for sort in SORTS))
+    for name, _ in words:
+        print(f"{name:<18} {matches[name]:>8} {ilike[name][0]:>10.2f}"
+              + "".join(f" {search[sort, name][0]:>10.2f}" for sort in SORTS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Top terms of the last days from feedback_terms_daily (GET /api/feedbacks/terms)
+against counting them from feedbacks' cleaned_text in Python, and the cost of
+the term triggers on inserts.
+
+Runs against an existing database with migration 0008 applied, such as one
+seeded by bench_search.py: nothing is changed, the inserts are rolled back.
+The Python side tokenizes like the migration and matches negation keywords
+with the ML service's NegationMatcher, so ml_service has to be checked out
+next to main_service. Connection settings come from DB_HOST, DB_USER,
+DB_PASSWORD and DB_PORT.
+
+    python bench_terms.py --database feedbacks_search_bench
+"""
+import argparse
+import collections
+import statistics
+import time
+
+from bench_indexes import connect
+from ml_service_support import ml_service_utils
+
+# The endpoint's query, for kind = %s over [%s, %s)
+TERMS_SQL = """
+    SELECT term, sum(feedbacks)::bigint AS feedbacks, json_object_agg(coalesce(sentiment, 'Unscored'), feedbacks)
+    FROM (
+        SELECT term, sentiment, sum(feedbacks)::bigint AS feedbacks FROM feedback_terms_daily
+        WHERE kind = %s AND day >= %s AND day < %s
+        GROUP BY term, sentiment
+        HAVING sum(feedbacks) > 0
+    ) AS t
+    GROUP BY term
+    ORDER BY 2 DESC, term
+    LIMIT %s"""
+
+# Copies of existing feedbacks under new ids, as the API or the importer would insert them
+INSERT_SQL = """
+    INSERT INTO feedbacks (id, feedback, created_at, sentiment, cleaned_text, processed_text, confidence,
+                           has_negation)
+    SELECT 'bench-' || id, feedback, LOCALTIMESTAMP, sentiment, cleaned_text, processed_text, confidence,
+           has_negation
+    FROM feedbacks WHERE cleaned_text IS NOT NULL
+    LIMIT %s"""
+
+
+def load_matcher():
+    utils = ml_service_utils()
+    if utils is None:
+        raise SystemExit("ml_service has to be checked out next to main_service")
+    return utils.NegationMatcher(utils.ARABIC_NEGATIVE_KEYWORDS)
+
+
+def python_top_terms(conn, matcher, days, limit):
+    """
+    The top words and negation keywords of the last `days` days, counted from
+    the rows themselves.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT word FROM feedback_term_stopwords")
+        stopwords = {row[0] for row in cur.fetchall()}
+        cur.execute("""
+            SELECT cleaned_text FROM feedbacks
+            WHERE created_at >= CURRENT_DATE - %s AND cleaned_text IS NOT NULL""", (days - 1,))
+        words = collections.Counter()
+        negations = collections.Counter()
+        for (text,) in cur:
+            words.update(set(text.split()) - stopwords)
+            negations.update({match.keyword for match in matcher.find(text)})
+    conn.rollback()
+    return words.most_common(limit), negations.most_common(limit)
+
+
+def sql_top_terms(conn, days, limit):
+    with conn.cursor() as cur:
+        top = []
+        for kind in ("word", "negation"):
+            cur.execute("SELECT CURRENT_DATE - %s, CURRENT_DATE + 1", (days - 1,))
+            start, end = cur.fetchone()
+            cur.execute(TERMS_SQL, (kind, start, end, limit))
+            top.append(cur.fetchall())
+    conn.rollback()
+    return top
+
+
+def timed(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(1000 * (time.perf_counter() - started))
+    return statistics.median(timings)
+
+
+def time_inserts(conn, rows, triggers):
+    with conn.cursor() as cur:
+        if not triggers:
+            for event in ("insert", "update", "delete"):
+                cur.execute(f"ALTER TABLE feedbacks DISABLE TRIGGER feedback_terms_{event}")
+        started = time.perf_counter()
+        cur.execute(INSERT_SQL, (rows,))
+        elapsed = 1000 * (time.perf_counter() - started)
+    conn.rollback()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="feedbacks_search_bench", help="database to read from")
+    parser.add_argument("--limit", type=int, default=20, help="terms listed")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query")
+    parser.add_argument("--insert-rows", type=int, nargs="+", default=[1, 1000, 100_000],
+                        help="rows per timed insert statement")
+    args = parser.parse_args()
+
+    matcher = load_matcher()
+    conn = connect(args.database)
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*), pg_size_pretty(pg_total_relation_size('feedback_terms_daily')) "
+                    "FROM feedback_terms_daily")
+        counts, size = cur.fetchone()
+    conn.rollback()
+    print(f"feedback_terms_daily: {counts} rows, {size}\n")
+
+    print(f"{'days':>5} {'Python ms':>10} {'SQL ms':>8}")
+    for days in (7, 30):
+        python_ms = timed(1, python_top_terms, conn, matcher, days, args.limit)
+        sql_ms = timed(args.repeat, sql_top_terms, conn, days, args.limit)
+        print(f"{days:>5} {python_ms:>10.1f} {sql_ms:>8.1f}")
+
+    print(f"\n{'rows':>8} {'insert ms':>10} {'without term triggers':>22}")
+    for rows in args.insert_rows:
+        with_triggers = statistics.median(time_inserts(conn, rows, True) for _ in range(3))
+        without = statistics.median(time_inserts(conn, rows, False) for _ in range(3))
+        print(f"{rows:>8} {with_triggers:>10.1f} {without:>22.1f}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+from metrics import POOL_IN_USE, POOL_IDLE, POOL_WAITING, POOL_WAIT_SECONDS, POOL_CONNECTS, POOL_HEALTH_CHECK_FAILURES
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of PostgreSQL connections.
+
+    Up to `max_size` connections are open at once; `min_size` of them are
+    opened up front and kept. A caller that finds the pool exhausted waits
+    up to `timeout` seconds for a connection to be returned. Connections
+    that sat idle for more than `check_idle_after` seconds are checked with
+    SELECT 1 before being handed out and replaced if they are broken.
+
+    max_size=0 disables pooling: every connection() opens a new connection
+    and closes it afterwards.
+    """
+    def __init__(self, min_size=1, max_size=10, timeout=10.0, check_idle_after=30.0, **connect_kwargs):
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle_after = check_idle_after
+        self.connect_kwargs = connect_kwargs
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, returned at), most recently returned last
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+
+    def open(self):
+        """
+        Opens the first `min_size` connections.
+        """
+        conns = [self._connect() for _ in range(self.min_size)]
+        with self._cond:
+            self._open += len(conns)
+            self._idle.extend((conn, time.monotonic()) for conn in conns)
+            self._update_gauges()
+        return self
+
+    @contextmanager
+    def connection(self):
+        """
+        Yields a connection and returns it to the pool afterwards. Work that
+        was not committed is rolled back before the connection is reused.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        except BaseException:
+            # Also GeneratorExit, when a streamed response is closed early
+            self.putconn(conn, rollback=True)
+            raise
+        else:
+            self.putconn(conn)
+
+    def getconn(self):
+        if self.max_size == 0:
+            return self._connect()
+
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._idle and self._open >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                self._waiting += 1
+                self._update_gauges()
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+            else:
+                conn, returned_at = None, None
+                self._open += 1
+            self._in_use += 1
+            self._update_gauges()
+        POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+        try:
+            if conn is None or not self._healthy(conn, returned_at):
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._update_gauges()
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn, rollback=False):
+        if self.max_size == 0:
+            conn.close()
+            return
+
+        keep = not conn.closed
+        if keep and (rollback or conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE):
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                keep = False
+        if not keep:
+            conn.close()
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._open -= 1
+            self._update_gauges()
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._update_gauges()
+        for conn, _ in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+            }
+
+    def _connect(self):
+        POOL_CONNECTS.inc()
+        return psycopg2.connect(**self.connect_kwargs)
+
+    def _healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_idle_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            POOL_HEALTH_CHECK_FAILURES.inc()
+            conn.close()
+            return False
+
+    def _update_gauges(self):
+        POOL_IN_USE.set(self._in_use)
+        POOL_IDLE.set(len(self._idle))
+        POOL_WAITING.set(self._waiting)
@@ -0,0 +1,144 @@
+import csv
+import datetime
+import io
+import json
+import uuid
+
+from metrics import EXPORT_ROWS
+
+
+def iter_chunks(connection, columns, where, params, chunk_size=2000):
+    """
+    Yields lists of row tuples of `columns`, newest first, read through a
+    server-side (named) cursor so at most `chunk_size` rows are held in
+    memory. The connection stays checked out until the generator is
+    exhausted or closed.
+    """
+    with connection() as conn, conn.cursor(name=f"feedback_export_{uuid.uuid4().hex}") as cur:
+        cur.itersize = chunk_size
+        cur.execute(f"""
+            SELECT {", ".join(columns)} FROM feedbacks
+            WHERE TRUE{where}
+            ORDER BY created_at DESC, id DESC
+            """, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_csv(chunks, columns):
+    """
+    Yields UTF-8 CSV with a header row. It starts with a byte order mark so
+    that Excel shows Arabic text correctly; the import endpoint accepts it.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        EXPORT_ROWS.labels("csv").inc(len(rows))
+
+
+def write_ndjson(chunks, columns):
+    """
+    Yields one JSON object per line, timestamps in ISO format.
+    """
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default) + "\n"
+                      for row in rows).encode("utf-8")
+        EXPORT_ROWS.labels("ndjson").inc(len(rows))
+
+
+class _ParquetSink:
+    """
+    File-like object for pyarrow that keeps only the bytes written since the
+    last drain(), so the Parquet file is streamed out as it is written.
+    """
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_parquet(chunks, columns, row_group_size=50000):
+    """
+    Yields a Parquet file, one row group per `row_group_size` rows. Each chunk
+    is converted to Arrow columns as it arrives, so memory is bounded by one
+    row group in columnar form rather than by the export. Needs pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"created_at": pa.timestamp("us"), "confidence": pa.float64(), "has_negation": pa.bool_()}
+    schema = pa.schema([(c, types.get(c, pa.string())) for c in columns])
+
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    batches = []
+    pending = 0
+
+    def write_row_group():
+        writer.write_table(pa.Table.from_batches(batches, schema=schema), row_group_size=pending)
+        EXPORT_ROWS.labels("parquet").inc(pending)
+        batches.clear()
+
+    for rows in chunks:
+        batches.append(pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)], schema=schema))
+        pending += len(rows)
+        if pending >= row_group_size:
+            write_row_group()
+            pending = 0
+            yield sink.drain()
+    if pending:
+        write_row_group()
+    writer.close()
+    yield sink.drain()
+
+
+# format: (writer, content type, file extension)
+EXPORT_FORMATS = {
+    "csv": (write_csv, "text/csv; charset=utf-8", "csv"),
+    "ndjson": (write_ndjson, "application/x-ndjson", "ndjson"),
+    "parquet": (write_parquet, "application/vnd.apache.parquet", "parquet"),
+}
@@ -0,0 +1,111 @@
+import base64
+import datetime
+import math
+
+# Columns a caller may ask for with ?fields=. id and created_at are always
+# returned because the page cursor is built from them.
+FEEDBACK_COLUMNS = ("id", "feedback", "user_id", "created_at", "sentiment", "cleaned_text",
+                    "processed_text", "confidence", "has_negation", "model_version")
+CURSOR_COLUMNS = ("id", "created_at")
+
+_BOOLEANS = {"true": True, "1": True, "yes": True, "false": False, "0": False, "no": False}
+
+
+def parse_fields(value):
+    """
+    Returns the columns to select for a comma separated ?fields= value
+    (all columns when empty), in table order.
+    """
+    if not value:
+        return list(FEEDBACK_COLUMNS)
+    requested = {f.strip() for f in value.split(",") if f.strip()}
+    unknown = requested - set(FEEDBACK_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.update(CURSOR_COLUMNS)
+    return [c for c in FEEDBACK_COLUMNS if c in requested]
+
+
+def parse_timestamp(name, value, end=False):
+    """
+    Parses an ISO date or timestamp query parameter; see parse_filters.
+    """
+    try:
+        if len(value) == 10:
+            # A plain date: 'from' starts at its midnight, 'to' includes the whole day
+            day = datetime.date.fromisoformat(value)
+            return datetime.datetime.combine(day + datetime.timedelta(days=1) if end else day, datetime.time())
+        timestamp = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"'{name}' must be an ISO date or timestamp")
+    if timestamp.tzinfo is not None:
+        # created_at is stored in server local time, see importer._parse_created_at
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+
+def parse_filters(args):
+    """
+    Builds the WHERE clause for the feedback filters in `args` (request.args):
+
+    - sentiment: one or more values, repeated or comma separated
+    - from / to: ISO date or timestamp; 'from' inclusive, 'to' exclusive
+      (a plain date for 'to' includes that whole day)
+    - has_negation: true/false
+    - min_confidence: number between 0 and 1
+
+    Returns (sql, params) where sql is "" or starts with " AND ".
+    Raises ValueError for invalid values.
+    """
+    clauses = []
+    params = []
+
+    sentiments = [s.strip() for value in args.getlist("sentiment") for s in value.split(",") if s.strip()]
+    if sentiments:
+        clauses.append("sentiment = ANY(%s)")
+        params.append(sentiments)
+
+    if args.get("from"):
+        clauses.append("created_at >= %s")
+        params.append(parse_timestamp("from", args["from"]))
+    if args.get("to"):
+        clauses.append("created_at < %s")
+        params.append(parse_timestamp("to", args["to"], end=True))
+
+    if args.get("has_negation"):
+        value = _BOOLEANS.get(args["has_negation"].lower())
+        if value is None:
+            raise ValueError("'has_negation' must be true or false")
+        clauses.append("has_negation = %s")
+        params.append(value)
+
+    if args.get("min_confidence"):
+        try:
+            min_confidence = float(args["min_confidence"])
+        except ValueError:
+            raise ValueError("'min_confidence' must be a number")
+        if not (math.isfinite(min_confidence) and 0 <= min_confidence <= 1):
+            raise ValueError("'min_confidence' must be between 0 and 1")
+        clauses.append("confidence >= %s")
+        params.append(min_confidence)
+
+    return "".join(f" AND {c}" for c in clauses), params
+
+
+def encode_cursor(row):
+    """
+    Opaque cursor pointing just after `row` in (created_at DESC, id DESC) order.
+    """
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Returns the (created_at, id) encoded by encode_cursor.
+    """
+    try:
+        created_at, feedback_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.datetime.fromisoformat(created_at), feedback_id
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
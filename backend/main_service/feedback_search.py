@@ -0,0 +1,119 @@
+"""
+Ranked search over feedbacks' cleaned_text, for GET /api/feedbacks/search.
+
+cleaned_text is the ML service's normalized text, so the query goes through
+the same clean_text before matching. Each query word matches the words of a
+feedback as a prefix ("خدم" finds "خدمه"), through the GIN index of
+migrations/0007_feedback_search.sql. When the pg_trgm extension is installed,
+feedbacks containing the query as a substring ("الخدمه" for "خدمه") match
+too, and with fuzzy=true so do close spellings; both go through the trigram
+index. Matches are ranked with ts_rank_cd, plus the trigram word similarity
+when pg_trgm is there, and paged by (rank, created_at, id) with an opaque
+cursor like GET /api/feedbacks.
+
+Ranking reads every match, which is fast for specific queries but not for a
+word found in a good part of all feedbacks. sort=newest pages those by
+(created_at, id) instead and only ranks the rows returned.
+"""
+import base64
+import datetime
+
+from text_hash import clean_text, contains_arabic
+
+# Must stay the expression feedbacks_search_idx is built on, or the index is not used
+SEARCH_VECTOR = "to_tsvector('simple', coalesce(cleaned_text, ''))"
+TRIGRAM_INDEX = "feedbacks_cleaned_text_trgm_idx"
+
+SORTS = ("rank", "newest")
+
+# Shorter queries have no trigram to look up, and a substring match would read the whole index
+_MIN_SUBSTRING_LENGTH = 3
+
+
+def normalize_query(query):
+    """
+    The search text for `query`: clean_text for Arabic text (as the ML
+    service stores cleaned_text), otherwise the text itself, which is what
+    cleaned_text holds for feedbacks without Arabic. Whitespace is collapsed.
+    """
+    text = clean_text(query) if contains_arabic(query) else query
+    return " ".join(text.split())
+
+
+def trigram_available(cur):
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL AS available", (TRIGRAM_INDEX,))
+    row = cur.fetchone()
+    return row["available"] if isinstance(row, dict) else row[0]
+
+
+def _like_pattern(text):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def build_search(query, columns, where="", params=(), cursor=None, limit=20, trigram=False, fuzzy=False,
+                 sort="rank"):
+    """
+    Returns (sql, params) selecting `columns` and rank of at most `limit`
+    feedbacks matching the normalized `query`, in `sort` order (best or
+    newest first). `where`/`params` are extra filters from
+    feedback_query.parse_filters and `cursor` the (rank, created_at, id)
+    after which the page starts. `fuzzy` only has an effect with `trigram`.
+    """
+    matches = [f"{SEARCH_VECTOR} @@ feedback_search_query(%s)"]
+    match_params = [query]
+    rank = f"ts_rank_cd({SEARCH_VECTOR}, feedback_search_query(%s), 1)"
+    rank_params = [query]
+    if trigram:
+        if len(query) >= _MIN_SUBSTRING_LENGTH:
+            matches.append("cleaned_text ILIKE %s")
+            match_params.append(_like_pattern(query))
+        if fuzzy:
+            matches.append("%s <%% cleaned_text")
+            match_params.append(query)
+        rank += " + word_similarity(%s, coalesce(cleaned_text, ''))"
+        rank_params.append(query)
+
+    order = "created_at DESC, id DESC" if sort == "newest" else "rank DESC, created_at DESC, id DESC"
+    after = ""
+    after_params = []
+    if cursor is not None:
+        if sort == "newest":
+            after = "WHERE (created_at, id) < (%s, %s)"
+            after_params = list(cursor[1:])
+        else:
+            after = "WHERE (rank, created_at, id) < (%s, %s, %s)"
+            after_params = list(cursor)
+
+    sql = f"""
+        SELECT * FROM (
+            SELECT {", ".join(columns)}, ({rank})::float8 AS rank
+            FROM feedbacks
+            WHERE ({" OR ".join(matches)}){where}
+        ) AS matches
+        {after}
+        ORDER BY {order}
+        LIMIT %s
+        """
+    return sql, [*rank_params, *match_params, *params, *after_params, limit]
+
+
+def encode_search_cursor(row):
+    """
+    Opaque cursor pointing just after `row` in either search order. The rank is
+    written with repr so that it reads back as the same float.
+    """
+    raw = f"{row['rank']!r}|{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_search_cursor(cursor):
+    """
+    Returns the (rank, created_at, id) encoded by encode_search_cursor.
+    """
+    try:
+        rank, created_at, feedback_id = base64.urlsafe_b64decode(
+            cursor.encode("ascii")).decode("utf-8").split("|", 2)
+        return float(rank), datetime.datetime.fromisoformat(created_at), feedback_id
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,120 @@
+import datetime
+
+from feedback_query import parse_timestamp
+
+# granularity: (rollup table, bucket length, most days one request may span)
+GRANULARITIES = {
+    "day": ("feedback_rollups_daily", datetime.timedelta(days=1), 366),
+    "hour": ("feedback_rollups_hourly", datetime.timedelta(hours=1), 31),
+}
+DEFAULT_DAYS = 30
+CONFIDENCE_BUCKETS = 10
+
+# Reported name of the NULL sentiment of feedbacks the ML service has not scored yet
+UNSCORED = "unscored"
+
+
+def _truncate(value, granularity):
+    value = value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0) if granularity == "day" else value
+
+
+def parse_stats_range(args, now=None):
+    """
+    Returns (granularity, start, end) for the stats parameters in `args`:
+
+    - granularity: day (default) or hour
+    - days: number of days ending with the current bucket (default 30), or
+    - from / to: ISO date or timestamp, rounded out to whole buckets
+
+    Raises ValueError for invalid values or a range longer than the
+    granularity allows.
+    """
+    granularity = args.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        raise ValueError("'granularity' must be day or hour")
+    _, step, max_days = GRANULARITIES[granularity]
+
+    try:
+        days = int(args.get("days", DEFAULT_DAYS))
+    except ValueError:
+        raise ValueError("'days' must be an integer")
+    if not 1 <= days <= max_days:
+        raise ValueError(f"'days' must be between 1 and {max_days} for granularity {granularity}")
+
+    if args.get("to"):
+        end = parse_timestamp("to", args["to"], end=True)
+        if _truncate(end, granularity) != end:
+            end = _truncate(end, granularity) + step
+    else:
+        end = _truncate(now or datetime.datetime.now(), granularity) + step
+    if args.get("from"):
+        start = _truncate(parse_timestamp("from", args["from"]), granularity)
+    else:
+        start = end - datetime.timedelta(days=days)
+
+    if start >= end:
+        raise ValueError("'from' must be before 'to'")
+    if end - start > datetime.timedelta(days=max_days):
+        raise ValueError(f"At most {max_days} days can be requested for granularity {granularity}")
+    return granularity, start, end
+
+
+def _average(total, count):
+    return total / count if count else None
+
+
+def summarize_rollups(rows, granularity, start, end):
+    """
+    Builds the stats response from rollup rows (dicts with bucket, sentiment,
+    has_negation, confidence_bucket, feedbacks and confidence_sum): totals
+    for the range and one series entry per bucket, including empty ones.
+    """
+    step = GRANULARITIES[granularity][1]
+    series = {}
+    bucket = start
+    while bucket < end:
+        series[bucket] = {"bucket": bucket.isoformat(), "feedbacks": 0, "by_sentiment": {},
+                          "with_negation": 0, "confidence_sum": 0.0, "scored": 0}
+        bucket += step
+
+    by_sentiment = {}
+    by_negation = {"true": 0, "false": 0, UNSCORED: 0}
+    by_confidence = [0] * CONFIDENCE_BUCKETS
+    confidence_sum = 0.0
+    scored = 0
+    for row in rows:
+        count = row["feedbacks"]
+        sentiment = row["sentiment"] or UNSCORED
+        point = series[row["bucket"]]
+        point["feedbacks"] += count
+        point["by_sentiment"][sentiment] = point["by_sentiment"].get(sentiment, 0) + count
+        by_sentiment[sentiment] = by_sentiment.get(sentiment, 0) + count
+
+        negation = UNSCORED if row["has_negation"] is None else str(row["has_negation"]).lower()
+        by_negation[negation] += count
+        if row["has_negation"]:
+            point["with_negation"] += count
+
+        if row["confidence_bucket"] is not None:
+            by_confidence[row["confidence_bucket"]] += count
+            confidence_sum += row["confidence_sum"]
+            scored += count
+            point["confidence_sum"] += row["confidence_sum"]
+            point["scored"] += count
+
+    for point in series.values():
+        point["avg_confidence"] = _average(point.pop("confidence_sum"), point.pop("scored"))
+
+    return {
+        "granularity": granularity,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "total": sum(by_sentiment.values()),
+        "by_sentiment": by_sentiment,
+        "by_negation": by_negation,
+        "by_confidence": [{"min": i / CONFIDENCE_BUCKETS, "max": (i + 1) / CONFIDENCE_BUCKETS, "feedbacks": n}
+                          for i, n in enumerate(by_confidence)],
+        "avg_confidence": _average(confidence_sum, scored),
+        "series": list(series.values()),
+    }
@@ -0,0 +1,261 @@
+import csv
+import datetime
+import io
+import json
+import uuid
+
+from metrics import IMPORT_ROWS, PREDICTIONS_REUSED
+from scoring import SCORE_COLUMNS
+from text_hash import text_hash
+
+# Columns written by an import, in COPY order; values[_SCORES] are SCORE_COLUMNS
+IMPORT_COLUMNS = ("id", "feedback", "user_id", "created_at", *SCORE_COLUMNS, "text_hash")
+_SCORES = slice(4, 4 + len(SCORE_COLUMNS))
+_HASH = IMPORT_COLUMNS.index("text_hash")
+
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_value(value):
+    """
+    Formats a value for COPY's text format.
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+class ImportRow:
+    __slots__ = ("line", "values")
+
+    def __init__(self, line, values):
+        self.line = line
+        self.values = values
+
+
+def parse_ndjson(stream):
+    """
+    Yields (line number, record dict or error message) for each non-empty
+    line of a UTF-8 NDJSON byte stream.
+    """
+    for number, line in enumerate(io.TextIOWrapper(stream, encoding="utf-8-sig"), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, f"invalid JSON: {e}"
+            continue
+        yield number, record if isinstance(record, dict) else "each line must be a JSON object"
+
+
+def parse_csv(stream):
+    """
+    Yields (line number, record dict) for each row of a UTF-8 CSV byte stream
+    whose first row is the header.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _parse_created_at(value):
+    if value in (None, ""):
+        return datetime.datetime.now()
+    if not isinstance(value, str):
+        raise ValueError("created_at must be an ISO timestamp")
+    try:
+        created_at = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("created_at must be an ISO timestamp")
+    if created_at.tzinfo is not None:
+        # created_at is stored in server local time, like datetime.now() elsewhere
+        created_at = created_at.astimezone().replace(tzinfo=None)
+    return created_at
+
+
+def build_row(line, record):
+    """
+    Validates one imported record and returns its ImportRow. Only id,
+    feedback, user_id and created_at are read; scores come from the ML service.
+    Raises ValueError with the reason if the record is invalid.
+    """
+    feedback = record.get("feedback")
+    if not isinstance(feedback, str) or not feedback.strip():
+        raise ValueError("feedback is required")
+    feedback_id = record.get("id") or str(uuid.uuid4())
+    user_id = record.get("user_id") or None
+    if not isinstance(feedback_id, str) or (user_id is not None and not isinstance(user_id, str)):
+        raise ValueError("id and user_id must be strings")
+    return ImportRow(line, [feedback_id, feedback, user_id, _parse_created_at(record.get("created_at")),
+                            *(None for _ in SCORE_COLUMNS), text_hash(feedback)])
+
+
+class FeedbackImporter:
+    """
+    Writes parsed records to feedbacks in chunks of `chunk_size`.
+
+    Each chunk is copied into a temporary staging table with COPY and moved
+    into feedbacks with one INSERT ... SELECT, in its own transaction. Months
+    without a partition yet get one. Invalid records, unknown user ids and
+    ids that already exist are reported per line and do not stop the load;
+    if a whole chunk fails, its rows are reported and the import continues.
+
+    `reuse` is an optional callable mapping a list of text hashes to the
+    stored predictions of the current model version and negation keyword
+    set ({hash: SCORE_COLUMNS
+    dict}); rows it answers are not sent to the ML service. `score` is an
+    optional callable mapping a list of texts to ML results
+    (MLClient.predict_batch); it is called once per distinct cleaned text of
+    a chunk. Rows of chunks it fails for are imported unscored and left to the
+    scoring worker.
+    """
+    def __init__(self, connection, chunk_size=5000, score=None, score_batch_size=500, max_errors=1000,
+                 reuse=None):
+        self.connection = connection
+        self.chunk_size = chunk_size
+        self.score = score
+        self.reuse = reuse
+        self.score_batch_size = score_batch_size
+        self.max_errors = max_errors
+        self.summary = {"received": 0, "inserted": 0, "scored": 0, "failed": 0, "errors": []}
+
+    def run(self, records):
+        """
+        Imports (line, record or error message) pairs and returns the summary.
+        """
+        chunk = []
+        for line, record in records:
+            self.summary["received"] += 1
+            if isinstance(record, str):
+                self._error(line, record)
+                continue
+            try:
+                chunk.append(build_row(line, record))
+            except ValueError as e:
+                self._error(line, str(e))
+                continue
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._write_chunk(chunk)
+        return self.summary
+
+    def _error(self, line, message):
+        self.summary["failed"] += 1
+        IMPORT_ROWS.labels("failed").inc()
+        if len(self.summary["errors"]) < self.max_errors:
+            self.summary["errors"].append({"line": line, "error": message})
+
+    def _reuse_chunk(self, chunk):
+        if self.reuse is None:
+            return
+        try:
+            found = self.reuse([row.values[_HASH] for row in chunk])
+        except Exception as e:
+            print(f"Import prediction reuse failed: {e}")
+            return
+        reused = 0
+        for row in chunk:
+            scores = found.get(row.values[_HASH])
+            if scores:
+                row.values[_SCORES] = [scores[c] for c in SCORE_COLUMNS]
+                reused += 1
+        PREDICTIONS_REUSED.labels("import").inc(reused)
+
+    def _score_chunk(self, chunk):
+        if self.score is None:
+            return
+        # Rows with equal hashes share one prediction; rows without a hash
+        # (no Arabic text) are sent on their own
+        groups = {}
+        for row in chunk:
+            if row.values[4] is None:
+                groups.setdefault(row.values[_HASH] or row, []).append(row)
+        groups = list(groups.values())
+        for start in range(0, len(groups), self.score_batch_size):
+            batch = groups[start:start + self.score_batch_size]
+            try:
+                results = self.score([rows[0].values[1] for rows in batch])
+            except Exception as e:
+                print(f"Import scoring failed, rows left for the scoring worker: {e}")
+                return
+            for rows, result in zip(batch, results):
+                if result.get("sentiment") is None:
+                    continue
+                for row in rows:
+                    row.values[_SCORES] = [result.get(c) for c in SCORE_COLUMNS]
+                PREDICTIONS_REUSED.labels("import").inc(len(rows) - 1)
+
+    def _write_chunk(self, chunk):
+        self._reuse_chunk(chunk)
+        self._score_chunk(chunk)
+
+        buffer = io.StringIO()
+        for row in chunk:
+            buffer.write("\t".join(_copy_value(v) for v in row.values))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        columns = ", ".join(IMPORT_COLUMNS)
+        try:
+            with self.connection() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS feedbacks_import
+                    (LIKE feedbacks INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+                    """)
+                cur.copy_expert(f"COPY feedbacks_import ({columns}) FROM STDIN", buffer)
+                cur.execute("""
+                    SELECT DISTINCT i.user_id FROM feedbacks_import i
+                    WHERE i.user_id IS NOT NULL
+                      AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = i.user_id)
+                    """)
+                unknown_users = {r[0] for r in cur.fetchall()}
+                cur.execute("""
+                    SELECT count(*) FROM (SELECT DISTINCT date_trunc('month', created_at) AS month
+                                          FROM feedbacks_import) AS m,
+                    LATERAL feedback_partitions_ensure(m.month, m.month + interval '1 month')
+                    """)
+                # Ids are claimed in feedback_ids (migrations/0009_feedback_ids.sql), whose
+                # primary key makes a concurrent import or create of the same id wait and
+                # then skip it; the first row of an id repeated within the chunk wins
+                cur.execute(f"""
+                    WITH claimed AS (
+                        INSERT INTO feedback_ids (id, created_at)
+                        SELECT DISTINCT ON (i.id) i.id, i.created_at
+                        FROM feedbacks_import i
+                        WHERE i.user_id IS NULL OR EXISTS (SELECT 1 FROM users u WHERE u.id = i.user_id)
+                        ORDER BY i.id, i.ctid
+                        ON CONFLICT DO NOTHING
+                        RETURNING id, created_at
+                    )
+                    INSERT INTO feedbacks ({columns})
+                    SELECT DISTINCT ON (i.id) {", ".join(f"i.{c}" for c in IMPORT_COLUMNS)}
+                    FROM feedbacks_import i JOIN claimed c ON c.id = i.id AND c.created_at = i.created_at
+                    ORDER BY i.id, i.ctid
+                    RETURNING id
+                    """)
+                inserted = {r[0] for r in cur.fetchall()}
+                conn.commit()
+        except Exception as e:
+            for row in chunk:
+                self._error(row.line, f"chunk failed: {e}")
+            return
+
+        for row in chunk:
+            feedback_id = row.values[0]
+            if feedback_id in inserted:
+                # Later rows repeating an id within the chunk count as duplicates
+                inserted.discard(feedback_id)
+                self.summary["inserted"] += 1
+                IMPORT_ROWS.labels("inserted").inc()
+                if row.values[4] is not None:
+                    self.summary["scored"] += 1
+            elif row.values[2] in unknown_users:
+                self._error(row.line, f"unknown user_id {row.values[2]}")
+            else:
+                self._error(row.line, f"duplicate id {feedback_id}")
@@ -0,0 +1,241 @@
+"""
+Maintenance commands for the backend database.
+
+    python manage.py rebuild-rollups   recompute the stats rollups from feedbacks
+    python manage.py rebuild-terms [--keywords-file FILE]
+                                       recount the term counts, after adding the ML service's extra
+                                       negation keywords from FILE
+    python manage.py rescore           rescore stale or unscored feedbacks (resumable)
+    python manage.py rescore --list    list rescoring jobs
+    python manage.py hash-texts        fill in text_hash for feedbacks written before it existed
+    python manage.py partitions        list the monthly feedbacks partitions, creating missing future ones
+    python manage.py archive-partitions --months N
+                                       archive and drop the months older than N months
+    python manage.py restore-partition FILE
+                                       load an archived month back
+"""
+import argparse
+import time
+
+from psycopg2.extras import execute_values
+
+
+def rebuild_rollups(conn):
+    """
+    Recomputes feedback_rollups_hourly and feedback_rollups_daily from
+    feedbacks. Writes to feedbacks wait until it is done.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT feedback_rollups_rebuild()")
+        cur.execute("SELECT count(*), coalesce(sum(feedbacks), 0) FROM feedback_rollups_hourly")
+        groups, feedbacks = cur.fetchone()
+    conn.commit()
+    return groups, feedbacks
+
+
+def cmd_rebuild_rollups(conn, args):
+    started = time.perf_counter()
+    groups, feedbacks = rebuild_rollups(conn)
+    print(f"Rebuilt rollups: {feedbacks} feedbacks in {groups} hourly groups "
+          f"({time.perf_counter() - started:.1f}s)")
+
+
+def rebuild_terms(conn, extra_keywords=()):
+    """
+    Adds `extra_keywords` (normalized with clean_text, as the ML service
+    does) to feedback_negation_keywords and recounts feedback_terms_daily
+    from feedbacks. Writes to feedbacks wait until it is done. Returns
+    (keywords, terms counted).
+    """
+    from text_hash import clean_text
+
+    keywords = sorted({" ".join(clean_text(k).split()) for k in extra_keywords} - {""})
+    with conn.cursor() as cur:
+        if keywords:
+            execute_values(cur, "INSERT INTO feedback_negation_keywords (keyword) VALUES %s ON CONFLICT DO NOTHING",
+                           [(k,) for k in keywords])
+        cur.execute("SELECT feedback_terms_rebuild()")
+        cur.execute("SELECT (SELECT count(*) FROM feedback_negation_keywords), count(*) FROM feedback_terms_daily")
+        counts = cur.fetchone()
+    conn.commit()
+    return counts
+
+
+def cmd_rebuild_terms(conn, args):
+    extra = []
+    if args.keywords_file:
+        with open(args.keywords_file, encoding="utf-8") as f:
+            # Same format as the ML service's NEGATION_KEYWORDS_FILE
+            extra = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    started = time.perf_counter()
+    keywords, terms = rebuild_terms(conn, extra)
+    print(f"Rebuilt term counts: {terms} (kind, day, term, sentiment) counts, {keywords} negation keywords "
+          f"({time.perf_counter() - started:.1f}s)")
+
+
+def cmd_rescore(conn, args):
+    from app import ml_client, get_db_connection
+    from rescoring import RescoringJob, create_job, find_resumable_job, get_job, list_jobs, pause_job
+
+    if args.list:
+        for job in list_jobs(conn):
+            print(f"{job['id']}: {job['mode']} model={job['model_version']} {job['status']} "
+                  f"scanned={job['scanned']} rescored={job['rescored']} updated={job['updated_at']:%Y-%m-%d %H:%M:%S}")
+        return
+
+    if args.resume:
+        job = get_job(conn, args.resume)
+        if job is None:
+            raise SystemExit(f"No rescoring job {args.resume}")
+    else:
+        model_version, negation_keywords = ml_client.scorer()
+        job = find_resumable_job(conn, args.mode, model_version, negation_keywords)
+        if job is None:
+            job = create_job(conn, args.mode, model_version, negation_keywords, args.chunk_size, args.rate)
+
+    try:
+        job = RescoringJob(get_db_connection, ml_client, job["id"]).run()
+    except KeyboardInterrupt:
+        job = pause_job(conn, job["id"])
+        print(f"Paused; resume with: python manage.py rescore --resume {job['id']}")
+    print(f"Job {job['id']}: {job['status']}, {job['rescored']} of {job['scanned']} rows rescored")
+
+
+def hash_texts(conn, chunk_size=5000):
+    """
+    Sets text_hash on feedbacks that have none, walking the table by id in
+    chunks of `chunk_size`, one transaction each. Texts without Arabic
+    characters keep a NULL hash. Returns (rows scanned, rows updated).
+    """
+    from text_hash import text_hash
+
+    scanned = updated = 0
+    last_id = ""
+    while True:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, feedback FROM feedbacks
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+                """, (last_id, chunk_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            values = [(r[0], h) for r, h in ((r, text_hash(r[1])) for r in rows) if h is not None]
+            if values:
+                execute_values(cur, """
+                    UPDATE feedbacks AS f SET text_hash = v.text_hash
+                    FROM (VALUES %s) AS v (id, text_hash)
+                    WHERE f.id = v.id AND f.text_hash IS NULL
+                    """, values, page_size=len(values))
+                updated += cur.rowcount
+        conn.commit()
+        scanned += len(rows)
+        last_id = rows[-1][0]
+    return scanned, updated
+
+
+def cmd_hash_texts(conn, args):
+    started = time.perf_counter()
+    scanned, updated = hash_texts(conn, args.chunk_size)
+    print(f"Hashed {updated} of {scanned} feedbacks ({time.perf_counter() - started:.1f}s)")
+
+
+def cmd_partitions(conn, args):
+    from app import PARTITION_MONTHS_AHEAD
+    from partitions import ensure_partitions, list_partitions
+
+    for name in ensure_partitions(conn, PARTITION_MONTHS_AHEAD):
+        print(f"Created {name}")
+    for partition in list_partitions(conn):
+        rows = "?" if partition["rows"] is None else f"~{partition['rows']}"
+        state = "" if partition["attached"] else "  (detached, archive pending)"
+        print(f"{partition['name']}  {rows} rows  {partition['bytes'] / 2**20:.1f} MB{state}")
+
+
+def cmd_archive_partitions(conn, args):
+    from app import FEEDBACK_ARCHIVE_DIR, FEEDBACK_RETENTION_MONTHS
+    from partitions import apply_retention
+
+    months = args.months or FEEDBACK_RETENTION_MONTHS
+    if months < 1:
+        raise SystemExit("Give --months (or set FEEDBACK_RETENTION_MONTHS)")
+    archived = apply_retention(conn, months, args.dir or FEEDBACK_ARCHIVE_DIR, dry_run=args.dry_run)
+    if args.dry_run:
+        print("Would archive: " + (", ".join(archived) or "nothing"))
+    elif not archived:
+        print("Nothing to archive")
+
+
+def cmd_restore_partition(conn, args):
+    from partitions import restore_archive
+
+    started = time.perf_counter()
+    rows = restore_archive(conn, args.file)
+    print(f"Restored {rows} feedbacks from {args.file} ({time.perf_counter() - started:.1f}s)")
+
+
+COMMANDS = {
+    "rebuild-rollups": cmd_rebuild_rollups,
+    "rebuild-terms": cmd_rebuild_terms,
+    "rescore": cmd_rescore,
+    "hash-texts": cmd_hash_texts,
+    "partitions": cmd_partitions,
+    "archive-partitions": cmd_archive_partitions,
+    "restore-partition": cmd_restore_partition,
+}
+
+
+def rescore_chunk_size(value):
+    """
+    argparse type of rescore --chunk-size, bounded like the HTTP endpoint's.
+    """
+    from rescoring import MAX_CHUNK_SIZE
+    size = int(value)
+    if not 1 <= size <= MAX_CHUNK_SIZE:
+        raise argparse.ArgumentTypeError(f"must be between 1 and {MAX_CHUNK_SIZE}")
+    return size
+
+
+def rescore_rate(value):
+    rate = float(value)
+    if rate < 0:
+        raise argparse.ArgumentTypeError("must be at least 0")
+    return rate
+
+
+def main():
+    from app import get_db_connection
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild-rollups", help="recompute the stats rollups from feedbacks")
+    terms = subparsers.add_parser("rebuild-terms", help="recount the term counts from feedbacks")
+    terms.add_argument("--keywords-file", help="extra negation keywords, one per line (NEGATION_KEYWORDS_FILE)")
+    rescore = subparsers.add_parser("rescore", help="rescore stale or unscored feedbacks")
+    rescore.add_argument("--mode", choices=("stale", "unscored", "all"), default="stale",
+                         help="stale: unscored or scored by another model version or negation keyword set "
+                              "(default)")
+    rescore.add_argument("--chunk-size", type=rescore_chunk_size, default=256,
+                         help="rows per ML batch call and UPDATE (1 to 1000)")
+    rescore.add_argument("--rate", type=rescore_rate, default=0, help="max rows per second (0: no limit)")
+    rescore.add_argument("--resume", type=int, metavar="JOB_ID", help="resume this job")
+    rescore.add_argument("--list", action="store_true", help="list recent jobs")
+    hash_parser = subparsers.add_parser("hash-texts", help="fill in text_hash for older feedbacks")
+    hash_parser.add_argument("--chunk-size", type=int, default=5000, help="rows per UPDATE and transaction")
+    subparsers.add_parser("partitions", help="list the monthly feedbacks partitions")
+    archive = subparsers.add_parser("archive-partitions", help="archive and drop old monthly partitions")
+    archive.add_argument("--months", type=int, help="keep this many months (default: FEEDBACK_RETENTION_MONTHS)")
+    archive.add_argument("--dir", help="archive directory (default: FEEDBACK_ARCHIVE_DIR)")
+    archive.add_argument("--dry-run", action="store_true", help="only list the partitions that would be archived")
+    restore = subparsers.add_parser("restore-partition", help="load an archived month back")
+    restore.add_argument("file", help="feedbacks_pYYYY_MM.csv.gz written by archive-partitions")
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        COMMANDS[args.command](conn, args)
+
+
+if __name__ == "__main__":
+    main()
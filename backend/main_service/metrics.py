@@ -0,0 +1,57 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Background scoring of feedbacks (scoring.py)
+SCORING_QUEUE_DEPTH = Gauge("feedback_scoring_queue_depth", "Feedbacks waiting to be scored")
+SCORING_LAG = Gauge("feedback_scoring_lag_seconds", "Age of the oldest feedback waiting to be scored")
+SCORING_DELAY = Histogram(
+    "feedback_scoring_delay_seconds", "Time from a feedback being created to it being scored",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+)
+SCORED_ROWS = Counter("feedback_scored_total", "Feedbacks scored by the background worker")
+SCORING_BATCHES = Counter("feedback_scoring_batches_total", "Scoring batches by outcome", ["outcome"])
+
+
+# Calls to the ML service (ml_client.py)
+ML_CALLS = Counter("ml_client_calls_total", "Calls to the ML service by endpoint and outcome "
+                   "(ok, failed, rejected by the open circuit breaker)", ["endpoint", "outcome"])
+ML_CALL_SECONDS = Histogram(
+    "ml_client_call_seconds", "Duration of calls to the ML service", ["endpoint"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+ML_BREAKER_STATE = Gauge("ml_client_circuit_state", "ML service circuit breaker: 0 closed, 1 half-open, 2 open")
+PREDICTIONS_REUSED = Counter("feedback_predictions_reused_total",
+                             "Feedbacks given the stored prediction of an identical text instead of calling "
+                             "the ML service, by write path", ["path"])
+
+
+# Database connection pool (db.py)
+POOL_IN_USE = Gauge("db_pool_connections_in_use", "Pooled connections currently checked out")
+POOL_IDLE = Gauge("db_pool_connections_idle", "Open connections waiting in the pool")
+POOL_WAITING = Gauge("db_pool_waiting", "Requests waiting for a free connection")
+POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds", "Time spent getting a connection from the pool",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+)
+POOL_CONNECTS = Counter("db_pool_connects_total", "New database connections opened")
+POOL_HEALTH_CHECK_FAILURES = Counter("db_pool_health_check_failures_total", "Idle connections found broken")
+
+
+# Bulk import and export (importer.py, exporter.py)
+IMPORT_ROWS = Counter("feedback_import_rows_total", "Rows received by the bulk import, by outcome", ["outcome"])
+EXPORT_ROWS = Counter("feedback_export_rows_total", "Rows streamed by the export endpoint, by format", ["format"])
+
+
+# Rescoring backfills (rescoring.py)
+RESCORED_ROWS = Counter("feedback_rescored_total", "Feedbacks rescored by rescoring jobs")
+
+
+# Monthly partitions of feedbacks (partitions.py)
+PARTITIONS_CREATED = Counter("feedback_partitions_created_total", "Monthly feedbacks partitions created ahead of time")
+PARTITIONS_ARCHIVED = Counter("feedback_partitions_archived_total", "Monthly feedbacks partitions archived and dropped")
+ARCHIVED_ROWS = Counter("feedback_archived_rows_total", "Feedbacks written to archive files")
+
+def render():
+    """
+    Returns (body, content type) for the /metrics endpoint.
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
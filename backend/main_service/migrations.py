@@ -0,0 +1,164 @@
+"""
+Versioned schema migrations for the backend database.
+
+Migrations are the .sql files in migrations/, named NNNN_description.sql and
+applied in order of NNNN. Applied versions are recorded in
+schema_migrations, so each file runs once per database. A file runs in a
+single transaction unless its first line is
+
+    -- migrate: no-transaction
+
+in which case its statements (separated by ';' at the end of a line) run
+one by one in autocommit mode, which CREATE INDEX CONCURRENTLY needs. Such
+migrations must be safe to re-run (IF NOT EXISTS), because a failure
+part-way leaves the earlier statements applied. A CREATE INDEX CONCURRENTLY
+that fails leaves an INVALID index behind, which IF NOT EXISTS would then
+keep; so before each CREATE INDEX CONCURRENTLY IF NOT EXISTS an invalid
+index of that name is dropped, and afterwards the index is checked to be
+valid.
+
+    python migrations.py            apply pending migrations
+    python migrations.py --status   list applied and pending migrations
+"""
+import argparse
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+# Arbitrary key for pg_advisory_lock so that two processes starting at the
+# same time do not apply the same migration twice.
+_LOCK_KEY = 7263810
+
+_FILENAME_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+_CONCURRENT_INDEX_RE = re.compile(r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)",
+                                  re.IGNORECASE)
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """
+    Returns [(version, name, sql)] sorted by version.
+    """
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILENAME_RE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            migrations.append((int(match.group(1)), match.group(2), f.read()))
+    migrations.sort()
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def _ensure_table(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )""")
+    conn.commit()
+
+
+def applied_versions(conn):
+    _ensure_table(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT version FROM schema_migrations")
+        versions = {row[0] for row in cur.fetchall()}
+    conn.commit()
+    return versions
+
+
+def _statements(sql):
+    body = "\n".join(line for line in sql.splitlines() if not line.strip().startswith("--"))
+    return [s.strip() for s in re.split(r";\s*$", body, flags=re.MULTILINE) if s.strip()]
+
+
+def _invalid_index(cur, name):
+    cur.execute("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND c.relnamespace = to_regnamespace(current_schema()) AND NOT i.indisvalid
+        """, (name,))
+    return cur.fetchone() is not None
+
+
+def _apply(conn, version, name, sql, log=print):
+    if sql.lstrip().startswith(NO_TRANSACTION):
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                for statement in _statements(sql):
+                    index = _CONCURRENT_INDEX_RE.match(statement)
+                    if index and _invalid_index(cur, index.group(1)):
+                        log(f"Dropping invalid index {index.group(1)} left by an earlier failed build")
+                        cur.execute(f"DROP INDEX CONCURRENTLY {index.group(1)}")
+                    cur.execute(statement)
+                    if index and _invalid_index(cur, index.group(1)):
+                        raise RuntimeError(f"Index {index.group(1)} is invalid after CREATE INDEX CONCURRENTLY")
+        finally:
+            conn.autocommit = False
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        conn.commit()
+    else:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def migrate(conn, target=None, directory=MIGRATIONS_DIR, log=print):
+    """
+    Applies the pending migrations up to and including `target` (all when
+    None) and returns the versions applied.
+    """
+    applied = []
+    _ensure_table(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s)", (_LOCK_KEY,))
+    conn.commit()
+    try:
+        done = applied_versions(conn)
+        for version, name, sql in load_migrations(directory):
+            if version in done or (target is not None and version > target):
+                continue
+            log(f"Applying migration {version:04d}_{name}")
+            _apply(conn, version, name, sql, log)
+            applied.append(version)
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (_LOCK_KEY,))
+        conn.commit()
+    return applied
+
+
+def main():
+    from app import get_db_connection
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="list migrations without applying them")
+    parser.add_argument("--target", type=int, help="apply migrations up to this version only")
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        if args.status:
+            done = applied_versions(conn)
+            for version, name, _ in load_migrations():
+                print(f"{version:04d}_{name}: {'applied' if version in done else 'pending'}")
+            return
+        if not migrate(conn, target=args.target):
+            print("Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
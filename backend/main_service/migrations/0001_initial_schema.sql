@@ -0,0 +1,13 @@
+-- Tables as created by init_db before migrations existed; a no-op on those databases.
+CREATE TABLE IF NOT EXISTS users
+    (id TEXT PRIMARY KEY, username TEXT, password TEXT, role TEXT);
+
+CREATE TABLE IF NOT EXISTS feedbacks
+    (id TEXT PRIMARY KEY, feedback TEXT, user_id TEXT,
+     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+     sentiment TEXT,
+     cleaned_text TEXT,
+     processed_text TEXT,
+     confidence FLOAT,
+     has_negation BOOLEAN,
+     FOREIGN KEY(user_id) REFERENCES users(id));
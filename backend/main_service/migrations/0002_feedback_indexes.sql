@@ -0,0 +1,18 @@
+-- migrate: no-transaction
+-- Built CONCURRENTLY so that existing databases keep accepting feedbacks meanwhile.
+
+-- GET /api/feedbacks: newest first, keyset pagination on (created_at, id) and date ranges
+CREATE INDEX CONCURRENTLY IF NOT EXISTS feedbacks_created_at_id_idx
+    ON feedbacks (created_at DESC, id DESC);
+
+-- Filtering by sentiment, newest first (id keeps the keyset order exact)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS feedbacks_sentiment_created_at_idx
+    ON feedbacks (sentiment, created_at DESC, id DESC);
+
+-- A user's feedbacks, and the foreign key check when users are deleted
+CREATE INDEX CONCURRENTLY IF NOT EXISTS feedbacks_user_id_idx
+    ON feedbacks (user_id);
+
+-- The scoring worker's queue: oldest feedbacks without a sentiment yet
+CREATE INDEX CONCURRENTLY IF NOT EXISTS feedbacks_unscored_idx
+    ON feedbacks (created_at) WHERE sentiment IS NULL;
@@ -0,0 +1,140 @@
+-- Per-hour and per-day feedback counts by sentiment, negation flag and
+-- confidence bucket (0 = [0, 0.1), ..., 9 = [0.9, 1]), for GET /api/feedbacks/stats.
+-- NULL sentiment/has_negation/confidence_bucket is a feedback that has not been scored yet.
+-- Kept up to date by statement-level triggers on feedbacks, so every write path
+-- (API, bulk import, scoring worker, manual SQL) is covered and a bulk statement
+-- costs one upsert per group, not one per row.
+
+CREATE TABLE IF NOT EXISTS feedback_rollups_hourly (
+    bucket TIMESTAMP NOT NULL,
+    sentiment TEXT,
+    has_negation BOOLEAN,
+    confidence_bucket SMALLINT,
+    feedbacks BIGINT NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    UNIQUE NULLS NOT DISTINCT (bucket, sentiment, has_negation, confidence_bucket)
+);
+
+CREATE TABLE IF NOT EXISTS feedback_rollups_daily (LIKE feedback_rollups_hourly INCLUDING ALL);
+
+CREATE TYPE feedback_rollup_delta AS (
+    bucket TIMESTAMP,
+    sentiment TEXT,
+    has_negation BOOLEAN,
+    confidence_bucket SMALLINT,
+    feedbacks BIGINT,
+    confidence_sum DOUBLE PRECISION
+);
+
+CREATE OR REPLACE FUNCTION feedback_confidence_bucket(confidence DOUBLE PRECISION) RETURNS SMALLINT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT LEAST(GREATEST(floor(confidence * 10), 0), 9)::SMALLINT
+$$;
+
+-- Adds hourly deltas to both rollup tables. Groups that drop to zero are left
+-- in place (they add nothing to the sums) until the next rebuild.
+CREATE OR REPLACE FUNCTION feedback_rollups_add(deltas feedback_rollup_delta[]) RETURNS void
+LANGUAGE sql AS $$
+    WITH changes AS (
+        SELECT * FROM unnest(deltas) WHERE feedbacks <> 0 OR confidence_sum <> 0
+    ), hourly AS (
+        INSERT INTO feedback_rollups_hourly AS r
+            (bucket, sentiment, has_negation, confidence_bucket, feedbacks, confidence_sum)
+        SELECT bucket, sentiment, has_negation, confidence_bucket, feedbacks, confidence_sum FROM changes
+        ON CONFLICT (bucket, sentiment, has_negation, confidence_bucket) DO UPDATE
+            SET feedbacks = r.feedbacks + EXCLUDED.feedbacks,
+                confidence_sum = r.confidence_sum + EXCLUDED.confidence_sum
+    )
+    INSERT INTO feedback_rollups_daily AS r
+        (bucket, sentiment, has_negation, confidence_bucket, feedbacks, confidence_sum)
+    SELECT date_trunc('day', bucket), sentiment, has_negation, confidence_bucket,
+           sum(feedbacks), sum(confidence_sum)
+    FROM changes
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (bucket, sentiment, has_negation, confidence_bucket) DO UPDATE
+        SET feedbacks = r.feedbacks + EXCLUDED.feedbacks,
+            confidence_sum = r.confidence_sum + EXCLUDED.confidence_sum
+$$;
+
+-- Trigger functions: +1 for each new row version, -1 for each old one. An update
+-- that does not touch created_at or the scores nets out to nothing.
+CREATE OR REPLACE FUNCTION feedback_rollups_on_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM feedback_rollups_add(ARRAY(
+        SELECT ROW(d.*)::feedback_rollup_delta FROM (
+            SELECT date_trunc('hour', created_at), sentiment, has_negation,
+                   feedback_confidence_bucket(confidence), count(*), coalesce(sum(confidence), 0)
+            FROM new_rows WHERE created_at IS NOT NULL
+            GROUP BY 1, 2, 3, 4) AS d));
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION feedback_rollups_on_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM feedback_rollups_add(ARRAY(
+        SELECT ROW(d.*)::feedback_rollup_delta FROM (
+            SELECT date_trunc('hour', created_at), sentiment, has_negation,
+                   feedback_confidence_bucket(confidence), sum(delta), coalesce(sum(delta * confidence), 0)
+            FROM (
+                SELECT created_at, sentiment, has_negation, confidence, 1 AS delta FROM new_rows
+                UNION ALL
+                SELECT created_at, sentiment, has_negation, confidence, -1 AS delta FROM old_rows
+            ) AS changes
+            WHERE created_at IS NOT NULL
+            GROUP BY 1, 2, 3, 4) AS d));
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION feedback_rollups_on_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM feedback_rollups_add(ARRAY(
+        SELECT ROW(d.*)::feedback_rollup_delta FROM (
+            SELECT date_trunc('hour', created_at), sentiment, has_negation,
+                   feedback_confidence_bucket(confidence), -count(*), -coalesce(sum(confidence), 0)
+            FROM old_rows WHERE created_at IS NOT NULL
+            GROUP BY 1, 2, 3, 4) AS d));
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER feedback_rollups_insert AFTER INSERT ON feedbacks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedback_rollups_on_insert();
+
+CREATE TRIGGER feedback_rollups_update AFTER UPDATE ON feedbacks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedback_rollups_on_update();
+
+CREATE TRIGGER feedback_rollups_delete AFTER DELETE ON feedbacks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedback_rollups_on_delete();
+
+-- Recomputes both tables from feedbacks. Writers are blocked meanwhile so that
+-- no change is counted twice or missed.
+CREATE OR REPLACE FUNCTION feedback_rollups_rebuild() RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    LOCK TABLE feedbacks IN SHARE MODE;
+    TRUNCATE feedback_rollups_hourly, feedback_rollups_daily;
+    INSERT INTO feedback_rollups_hourly
+        (bucket, sentiment, has_negation, confidence_bucket, feedbacks, confidence_sum)
+    SELECT date_trunc('hour', created_at), sentiment, has_negation, feedback_confidence_bucket(confidence),
+           count(*), coalesce(sum(confidence), 0)
+    FROM feedbacks
+    WHERE created_at IS NOT NULL
+    GROUP BY 1, 2, 3, 4;
+    INSERT INTO feedback_rollups_daily
+        (bucket, sentiment, has_negation, confidence_bucket, feedbacks, confidence_sum)
+    SELECT date_trunc('day', bucket), sentiment, has_negation, confidence_bucket,
+           sum(feedbacks), sum(confidence_sum)
+    FROM feedback_rollups_hourly
+    GROUP BY 1, 2, 3, 4;
+END
+$$;
+
+SELECT feedback_rollups_rebuild();
@@ -0,0 +1,25 @@
+-- Version of the model that produced each feedback's scores (NULL for rows scored
+-- before this column existed, or not scored yet). Adding a nullable column without
+-- a default does not rewrite the table.
+ALTER TABLE feedbacks ADD COLUMN IF NOT EXISTS model_version TEXT;
+
+-- Resumable rescoring backfills (rescoring.py). The cursor is the (created_at, id)
+-- of the last row of the last committed chunk; a job restarted after a crash or a
+-- pause carries on from there.
+CREATE TABLE IF NOT EXISTS rescoring_jobs (
+    id SERIAL PRIMARY KEY,
+    mode TEXT NOT NULL CHECK (mode IN ('unscored', 'stale', 'all')),
+    model_version TEXT,
+    status TEXT NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'running', 'paused', 'done', 'failed')),
+    chunk_size INTEGER NOT NULL,
+    max_rows_per_second DOUBLE PRECISION NOT NULL DEFAULT 0,
+    cursor_created_at TIMESTAMP,
+    cursor_id TEXT,
+    scanned BIGINT NOT NULL DEFAULT 0,
+    rescored BIGINT NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
@@ -0,0 +1,11 @@
+-- migrate: no-transaction
+-- SHA-256 of each feedback's normalized text (text_hash.py), so a prediction for
+-- the same text and model version can be reused instead of calling the ML service.
+-- NULL for texts without Arabic and for rows written before this migration until
+-- `python manage.py hash-texts` fills them in.
+ALTER TABLE feedbacks ADD COLUMN IF NOT EXISTS text_hash TEXT;
+
+-- Finding a reusable prediction (text_hash, model_version), and the duplicates
+-- report, which only needs text_hash and so runs as an index-only scan.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS feedbacks_text_hash_idx
+    ON feedbacks (text_hash, model_version) WHERE text_hash IS NOT NULL;
@@ -0,0 +1,119 @@
+-- feedbacks becomes a table partitioned by month on created_at, one partition per
+-- month named feedbacks_pYYYY_MM. Queries on a date range only read the months
+-- in range, and old months are archived by detaching their partition
+-- (partitions.py) instead of deleting rows one by one.
+--
+-- PostgreSQL requires the partition key in every unique constraint, so the
+-- primary key becomes (id, created_at) and created_at NOT NULL. Lookups by id
+-- probe each partition's primary key index.
+
+-- Partition holding the month of `month`
+CREATE OR REPLACE FUNCTION feedback_partition_name(month TIMESTAMP) RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT 'feedbacks_p' || to_char(month, 'YYYY_MM')
+$$;
+
+-- Creates the missing monthly partitions of `parent` covering [from_ts, to_ts)
+-- and returns their names. Each is created as a plain table and then attached,
+-- which only needs a SHARE UPDATE EXCLUSIVE lock on the parent, so reads and
+-- writes of feedbacks go on meanwhile.
+CREATE OR REPLACE FUNCTION feedback_partitions_ensure(from_ts TIMESTAMP, to_ts TIMESTAMP,
+                                                      parent TEXT DEFAULT 'feedbacks') RETURNS SETOF TEXT
+LANGUAGE plpgsql AS $$
+DECLARE
+    month TIMESTAMP := date_trunc('month', from_ts);
+    partition TEXT;
+BEGIN
+    WHILE month < to_ts LOOP
+        partition := feedback_partition_name(month);
+        IF to_regclass(partition) IS NULL THEN
+            -- Two sessions adding the same month would otherwise collide
+            PERFORM pg_advisory_xact_lock(7263812);
+        END IF;
+        IF to_regclass(partition) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', partition, parent);
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           parent, partition, month, month + interval '1 month');
+            RETURN NEXT partition;
+        END IF;
+        month := month + interval '1 month';
+    END LOOP;
+END
+$$;
+
+-- Converts an existing non-partitioned feedbacks table. Its rows are copied into
+-- a new partitioned table while it is locked against writes only, so the API
+-- keeps serving reads; the swap at the end is instant. Rollups are not touched:
+-- the copy happens before the new table has its triggers.
+DO $$
+DECLARE
+    month TIMESTAMP;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'feedbacks'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    -- Rows without a timestamp cannot be placed in a month
+    UPDATE feedbacks SET created_at = '1970-01-01' WHERE created_at IS NULL;
+    LOCK TABLE feedbacks IN SHARE MODE;
+
+    CREATE TABLE feedbacks_partitioned (LIKE feedbacks INCLUDING DEFAULTS) PARTITION BY RANGE (created_at);
+    ALTER TABLE feedbacks_partitioned ALTER COLUMN id SET NOT NULL, ALTER COLUMN created_at SET NOT NULL;
+    FOR month IN SELECT DISTINCT date_trunc('month', created_at) FROM feedbacks LOOP
+        PERFORM feedback_partitions_ensure(month, month + interval '1 month', 'feedbacks_partitioned');
+    END LOOP;
+    PERFORM feedback_partitions_ensure(date_trunc('month', LOCALTIMESTAMP),
+                                       date_trunc('month', LOCALTIMESTAMP) + interval '4 months',
+                                       'feedbacks_partitioned');
+    INSERT INTO feedbacks_partitioned SELECT * FROM feedbacks;
+
+    -- Indexes are built after the copy, which is faster than maintaining them row by row
+    ALTER TABLE feedbacks_partitioned ADD CONSTRAINT feedbacks_partitioned_pkey PRIMARY KEY (id, created_at);
+    ALTER TABLE feedbacks_partitioned ADD CONSTRAINT feedbacks_partitioned_user_id_fkey
+        FOREIGN KEY (user_id) REFERENCES users (id);
+    CREATE INDEX feedbacks_partitioned_created_at_id_idx ON feedbacks_partitioned (created_at DESC, id DESC);
+    CREATE INDEX feedbacks_partitioned_sentiment_created_at_idx
+        ON feedbacks_partitioned (sentiment, created_at DESC, id DESC);
+    CREATE INDEX feedbacks_partitioned_user_id_idx ON feedbacks_partitioned (user_id);
+    CREATE INDEX feedbacks_partitioned_unscored_idx ON feedbacks_partitioned (created_at) WHERE sentiment IS NULL;
+    CREATE INDEX feedbacks_partitioned_text_hash_idx
+        ON feedbacks_partitioned (text_hash, model_version) WHERE text_hash IS NOT NULL;
+
+    DROP TABLE feedbacks;
+    ALTER TABLE feedbacks_partitioned RENAME TO feedbacks;
+    ALTER TABLE feedbacks RENAME CONSTRAINT feedbacks_partitioned_pkey TO feedbacks_pkey;
+    ALTER TABLE feedbacks RENAME CONSTRAINT feedbacks_partitioned_user_id_fkey TO feedbacks_user_id_fkey;
+    ALTER INDEX feedbacks_partitioned_created_at_id_idx RENAME TO feedbacks_created_at_id_idx;
+    ALTER INDEX feedbacks_partitioned_sentiment_created_at_idx RENAME TO feedbacks_sentiment_created_at_idx;
+    ALTER INDEX feedbacks_partitioned_user_id_idx RENAME TO feedbacks_user_id_idx;
+    ALTER INDEX feedbacks_partitioned_unscored_idx RENAME TO feedbacks_unscored_idx;
+    ALTER INDEX feedbacks_partitioned_text_hash_idx RENAME TO feedbacks_text_hash_idx;
+
+    -- The rollup triggers of 0003, which went with the old table
+    CREATE TRIGGER feedback_rollups_insert AFTER INSERT ON feedbacks
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION feedback_rollups_on_insert();
+    CREATE TRIGGER feedback_rollups_update AFTER UPDATE ON feedbacks
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION feedback_rollups_on_update();
+    CREATE TRIGGER feedback_rollups_delete AFTER DELETE ON feedbacks
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION feedback_rollups_on_delete();
+END
+$$;
+
+-- Removes the rows of a detached partition from the rollups, so that the stats
+-- keep matching feedbacks after a month is archived (partitions.py).
+CREATE OR REPLACE FUNCTION feedback_rollups_subtract(detached REGCLASS) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE format($sql$
+        SELECT feedback_rollups_add(ARRAY(
+            SELECT ROW(d.*)::feedback_rollup_delta FROM (
+                SELECT date_trunc('hour', created_at), sentiment, has_negation,
+                       feedback_confidence_bucket(confidence), -count(*), -coalesce(sum(confidence), 0)
+                FROM %s
+                GROUP BY 1, 2, 3, 4) AS d))
+        $sql$, detached);
+END
+$$;
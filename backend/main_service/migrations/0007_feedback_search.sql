@@ -0,0 +1,34 @@
+-- Indexes for GET /api/feedbacks/search (feedback_search.py).
+--
+-- cleaned_text is already normalized by the ML service's clean_text, so it is
+-- indexed with the 'simple' text search config, which only lowercases and
+-- splits on word boundaries: no stemming or stop words for a language
+-- PostgreSQL has no dictionary for. An index on the partitioned table cannot
+-- be built CONCURRENTLY: writes to feedbacks wait until it is done (22s at 1M
+-- feedbacks locally); reads go on.
+CREATE INDEX IF NOT EXISTS feedbacks_search_idx
+    ON feedbacks USING gin (to_tsvector('simple', coalesce(cleaned_text, '')));
+
+-- The words of `query` as a tsquery matching each of them as a prefix, all
+-- required; NULL when it has no words. Tokenized by the same parser as the
+-- index, so that the words line up.
+CREATE OR REPLACE FUNCTION feedback_search_query(query TEXT) RETURNS tsquery
+LANGUAGE sql IMMUTABLE STRICT AS $$
+    SELECT to_tsquery('simple', string_agg(quote_literal(word) || ':*', ' & '))
+    FROM unnest(tsvector_to_array(to_tsvector('simple', query))) AS word
+$$;
+
+-- Substring and fuzzy matches go through a trigram index, when the pg_trgm
+-- extension is available on the server (it ships with PostgreSQL's contrib
+-- package). Without it, search matches whole words and word prefixes only.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS feedbacks_cleaned_text_trgm_idx
+            ON feedbacks USING gin (cleaned_text gin_trgm_ops);
+    ELSE
+        RAISE NOTICE 'pg_trgm is not available; feedback search will not match substrings';
+    END IF;
+END
+$$;
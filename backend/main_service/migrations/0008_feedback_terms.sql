@@ -0,0 +1,236 @@
+-- Per-day counts of the terms in feedbacks' cleaned_text by sentiment, for
+-- GET /api/feedbacks/terms ("top complaint words this week", "which negation
+-- keywords fire most"). Two kinds of terms are counted:
+--
+-- - word: each distinct whitespace-separated token, except the stopwords in
+--   feedback_term_stopwords
+-- - negation: each distinct keyword of feedback_negation_keywords found the way
+--   the ML service's utils.NegationMatcher finds them (whole tokens, the
+--   longest keyword at the leftmost position first, matches not overlapping),
+--   which is what decides has_negation
+--
+-- A feedback counts once per term however often the term occurs in it, on the
+-- day of its created_at and under its sentiment. Feedbacks without cleaned_text
+-- (not scored yet) have no terms. Like the rollups of 0003, the counts are kept
+-- current by statement-level triggers on feedbacks, so every write path is
+-- covered. After changing either list, recount with `manage.py rebuild-terms`.
+
+-- The ML service's ARABIC_NEGATIVE_KEYWORDS as normalized by clean_text, which is
+-- how NegationMatcher stores them; test_terms.py checks that the two lists agree.
+CREATE TABLE IF NOT EXISTS feedback_negation_keywords (keyword TEXT PRIMARY KEY);
+INSERT INTO feedback_negation_keywords (keyword) VALUES
+    ('لا'), ('لن'), ('لم'), ('ليس'), ('ليست'), ('ليسوا'), ('لست'), ('لسنا'), ('لسن'), ('ما'),
+    ('غير'), ('بدون'), ('دون'), ('بلا'), ('محدش'), ('مفيش'), ('مافيش'), ('ولا'), ('مش'), ('مو'),
+    ('موش'), ('ماحدش'), ('محد'), ('ماحد'), ('مالوش'), ('ملوش'), ('مليش'), ('ماليش'), ('لا يوجد'),
+    ('لا توجد'), ('لا اعتقد'), ('لا افكر'), ('لا اظن'), ('لا احب'), ('لا اريد'), ('لا استطيع'),
+    ('لا اقدر'), ('ما ينفعش'), ('مينفعش'), ('ما يصحش'), ('مايصحش'), ('سيء'), ('سيءه'), ('سيءين'),
+    ('فاشل'), ('فشل'), ('رديء'), ('ردء'), ('مقرف'), ('قبيح'), ('كريه'), ('مزعج'), ('محبط'),
+    ('مخيب'), ('ضعيف'), ('سخيف'), ('تافه'), ('حقير'), ('وحش'), ('فظيع'), ('مرعب'), ('مخيف'),
+    ('مءلم'), ('حزين'), ('كءيب'), ('محزن'), ('غاضب'), ('زعلان'), ('منزعج'), ('مستاء'), ('ساخط'),
+    ('زباله'), ('قمامه'), ('خرا'), ('تعبان'), ('وسخ'), ('لا يعجبني'), ('لا يعجب'), ('لا افضل'),
+    ('لا انصح'), ('ما انصحش'), ('غير جيد'), ('غير مقبول'), ('غير صحيح'), ('غير مناسب'),
+    ('بدون فاءده'), ('بلا فاءده'), ('بلا معني'), ('بدون معني'), ('ما تجربوش'), ('ماتجربوش'),
+    ('ما تشتروش'), ('ماتشتروش'), ('ما تنزلوش'), ('ماتنزلوش'), ('ينزله'), ('تنزله'), ('يشتريه'),
+    ('تشتريه'), ('للاسف'), ('مع الاسف'), ('يا للاسف'), ('واحسرتاه'), ('مشكله'), ('مشاكل'), ('عيب'),
+    ('عيوب'), ('خطا'), ('اخطاء'), ('خساره'), ('خسران'), ('ضرر'), ('اضرار'), ('كارثه'), ('كوارث'),
+    ('مصيبه'), ('مصاءب'), ('ازمه'), ('ازمات')
+ON CONFLICT DO NOTHING;
+
+-- Function words left out of the word counts, normalized like cleaned_text. The
+-- negation particles among them are still counted as negation terms.
+CREATE TABLE IF NOT EXISTS feedback_term_stopwords (word TEXT PRIMARY KEY);
+INSERT INTO feedback_term_stopwords (word) VALUES
+    ('في'), ('من'), ('علي'), ('الي'), ('عن'), ('مع'), ('هذا'), ('هذه'), ('ذلك'), ('تلك'), ('التي'),
+    ('الذي'), ('الذين'), ('و'), ('او'), ('ثم'), ('ان'), ('انا'), ('انت'), ('انتم'), ('هو'), ('هي'),
+    ('نحن'), ('هم'), ('كان'), ('كانت'), ('قد'), ('لقد'), ('كل'), ('بعد'), ('قبل'), ('عند'), ('حتي'),
+    ('اي'), ('به'), ('بها'), ('له'), ('لها'), ('لي'), ('فيه'), ('فيها'), ('منه'), ('منها'),
+    ('عليه'), ('عليها'), ('يا'), ('جدا'), ('لا'), ('لم'), ('لن'), ('ما')
+ON CONFLICT DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS feedback_terms_daily (
+    kind TEXT NOT NULL CHECK (kind IN ('word', 'negation')),
+    day DATE NOT NULL,
+    term TEXT NOT NULL,
+    sentiment TEXT,
+    feedbacks BIGINT NOT NULL DEFAULT 0,
+    UNIQUE NULLS NOT DISTINCT (kind, day, term, sentiment)
+);
+
+-- The keyword and stopword lists as the functions below take them, read once per
+-- statement by their callers: sets (jsonb objects, looked up with ?) of the
+-- keywords, of the first word of each and of the stopwords, and the most words
+-- in a keyword.
+CREATE TYPE feedback_term_lists AS (
+    keywords JSONB,
+    first_words JSONB,
+    stopwords JSONB,
+    max_words INT
+);
+
+CREATE OR REPLACE FUNCTION feedback_term_lists() RETURNS feedback_term_lists
+LANGUAGE sql STABLE AS $$
+    SELECT coalesce((SELECT jsonb_object_agg(keyword, true) FROM feedback_negation_keywords), '{}'),
+           coalesce((SELECT jsonb_object_agg(split_part(keyword, ' ', 1), true) FROM feedback_negation_keywords), '{}'),
+           coalesce((SELECT jsonb_object_agg(word, true) FROM feedback_term_stopwords), '{}'),
+           (SELECT coalesce(max(cardinality(string_to_array(keyword, ' '))), 1) FROM feedback_negation_keywords)
+$$;
+
+-- The negation keywords found in `tokens` as NegationMatcher.find finds them: the
+-- longest keyword starting at a token, then on after it.
+CREATE OR REPLACE FUNCTION feedback_negation_terms(tokens TEXT[], lists feedback_term_lists) RETURNS TEXT[]
+LANGUAGE plpgsql IMMUTABLE STRICT AS $$
+DECLARE
+    found TEXT[] := '{}';
+    tokens_count INT := cardinality(tokens);
+    matched INT;
+    i INT := 1;
+BEGIN
+    WHILE i <= tokens_count LOOP
+        matched := 0;
+        IF lists.first_words ? tokens[i] THEN
+            FOR words IN REVERSE least(lists.max_words, tokens_count - i + 1)..1 LOOP
+                IF lists.keywords ? array_to_string(tokens[i:i + words - 1], ' ') THEN
+                    matched := words;
+                    EXIT;
+                END IF;
+            END LOOP;
+        END IF;
+        IF matched = 0 THEN
+            i := i + 1;
+        ELSE
+            found := found || array_to_string(tokens[i:i + matched - 1], ' ');
+            i := i + matched;
+        END IF;
+    END LOOP;
+    RETURN found;
+END
+$$;
+
+-- The (kind, term) rows of one cleaned text, each term once. Tokens are split on
+-- whitespace like NegationMatcher's; the keyword walk only runs for texts
+-- containing the first word of some keyword.
+CREATE OR REPLACE FUNCTION feedback_terms_of(cleaned TEXT, lists feedback_term_lists)
+RETURNS TABLE (kind TEXT, term TEXT)
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT DISTINCT t.kind, t.term
+    -- OFFSET 0 splits the text once rather than at each use of tokens
+    FROM (SELECT array_remove(regexp_split_to_array(cleaned, '\s+'), '') AS tokens OFFSET 0) AS s
+    CROSS JOIN LATERAL (
+        SELECT 'word', token FROM unnest(s.tokens) AS token WHERE NOT lists.stopwords ? token
+        UNION ALL
+        SELECT 'negation', keyword
+        FROM unnest(CASE WHEN lists.first_words ?| s.tokens THEN feedback_negation_terms(s.tokens, lists) END)
+            AS keyword
+    ) AS t (kind, term)
+$$;
+
+CREATE TYPE feedback_term_source AS (
+    created_at TIMESTAMP,
+    sentiment TEXT,
+    cleaned_text TEXT,
+    delta INTEGER
+);
+
+-- Adds `delta` to the count of each term of each source on its day and sentiment.
+-- The upserts go in key order, so that concurrent writers lock the rows they share
+-- in the same order. Counts that drop to zero are left in place until the next
+-- rebuild.
+CREATE OR REPLACE FUNCTION feedback_terms_add(sources feedback_term_source[]) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    lists feedback_term_lists := feedback_term_lists();
+BEGIN
+    INSERT INTO feedback_terms_daily AS d (kind, day, term, sentiment, feedbacks)
+    SELECT t.kind, s.created_at::date, t.term, s.sentiment, sum(s.delta)
+    FROM unnest(sources) AS s
+    CROSS JOIN LATERAL feedback_terms_of(s.cleaned_text, lists) AS t
+    GROUP BY 1, 2, 3, 4
+    HAVING sum(s.delta) <> 0
+    ORDER BY 1, 2, 3, 4
+    ON CONFLICT (kind, day, term, sentiment) DO UPDATE SET feedbacks = d.feedbacks + EXCLUDED.feedbacks;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION feedback_terms_on_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM feedback_terms_add(ARRAY(
+        SELECT ROW(created_at, sentiment, cleaned_text, 1)::feedback_term_source
+        FROM new_rows WHERE cleaned_text IS NOT NULL));
+    RETURN NULL;
+END
+$$;
+
+-- Only rows whose day, sentiment or cleaned_text changed are tokenized, so that
+-- updates of other columns (scores of a rescoring that agree, text_hash) are cheap.
+CREATE OR REPLACE FUNCTION feedback_terms_on_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM feedback_terms_add(ARRAY(
+        SELECT ROW(s.*)::feedback_term_source
+        FROM old_rows AS o
+        FULL JOIN new_rows AS n ON n.id = o.id AND n.created_at = o.created_at
+        CROSS JOIN LATERAL (VALUES (o.created_at, o.sentiment, o.cleaned_text, -1),
+                                   (n.created_at, n.sentiment, n.cleaned_text, 1))
+            AS s (created_at, sentiment, cleaned_text, delta)
+        WHERE (o.created_at::date, o.sentiment, o.cleaned_text)
+              IS DISTINCT FROM (n.created_at::date, n.sentiment, n.cleaned_text)
+          AND s.cleaned_text IS NOT NULL));
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION feedback_terms_on_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM feedback_terms_add(ARRAY(
+        SELECT ROW(created_at, sentiment, cleaned_text, -1)::feedback_term_source
+        FROM old_rows WHERE cleaned_text IS NOT NULL));
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER feedback_terms_insert AFTER INSERT ON feedbacks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedback_terms_on_insert();
+
+CREATE TRIGGER feedback_terms_update AFTER UPDATE ON feedbacks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedback_terms_on_update();
+
+CREATE TRIGGER feedback_terms_delete AFTER DELETE ON feedbacks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedback_terms_on_delete();
+
+-- Removes the terms of a detached partition's rows, like feedback_rollups_subtract
+-- (partitions.py archives a month this way, without deleting its rows).
+CREATE OR REPLACE FUNCTION feedback_terms_subtract(detached REGCLASS) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE format($sql$
+        SELECT feedback_terms_add(ARRAY(
+            SELECT ROW(created_at, sentiment, cleaned_text, -1)::feedback_term_source
+            FROM %s WHERE cleaned_text IS NOT NULL))
+        $sql$, detached);
+END
+$$;
+
+-- Recounts feedback_terms_daily from feedbacks, e.g. after a change to the keyword
+-- or stopword lists. Writers are blocked meanwhile so that no change is counted
+-- twice or missed.
+CREATE OR REPLACE FUNCTION feedback_terms_rebuild() RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    lists feedback_term_lists := feedback_term_lists();
+BEGIN
+    LOCK TABLE feedbacks IN SHARE MODE;
+    TRUNCATE feedback_terms_daily;
+    INSERT INTO feedback_terms_daily (kind, day, term, sentiment, feedbacks)
+    SELECT t.kind, f.created_at::date, t.term, f.sentiment, count(*)
+    FROM feedbacks AS f
+    CROSS JOIN LATERAL feedback_terms_of(f.cleaned_text, lists) AS t
+    GROUP BY 1, 2, 3, 4;
+END
+$$;
+
+SELECT feedback_terms_rebuild();
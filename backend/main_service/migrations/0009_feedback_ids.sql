@@ -0,0 +1,118 @@
+-- Feedback ids are unique again. Since 0006 the primary key of feedbacks is
+-- (id, created_at), which does not stop two rows from sharing an id under
+-- different timestamps, and a NOT EXISTS check races with concurrent writers.
+-- feedback_ids is not partitioned, so its primary key covers every month, and
+-- triggers on feedbacks keep it in step with every write path (API, import,
+-- archive restore, manual SQL).
+--
+-- An inserted feedback claims its id with the row's created_at. The claim
+-- waits for a concurrent transaction holding the same id to finish; if the id
+-- then belongs to another row the insert fails with a unique violation, as the
+-- primary key did before 0006. The importer claims its ids itself first, with
+-- ON CONFLICT DO NOTHING, so that duplicates only skip rows.
+CREATE TABLE IF NOT EXISTS feedback_ids (
+    id TEXT PRIMARY KEY,
+    created_at TIMESTAMP NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION feedback_ids_on_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    duplicate TEXT;
+BEGIN
+    INSERT INTO feedback_ids (id, created_at)
+    SELECT id, created_at FROM new_rows
+    ORDER BY id
+    ON CONFLICT (id) DO NOTHING;
+    SELECT n.id INTO duplicate
+    FROM new_rows n JOIN feedback_ids i USING (id)
+    WHERE i.created_at <> n.created_at
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE unique_violation USING MESSAGE = format('duplicate feedback id %s', duplicate),
+                                     CONSTRAINT = 'feedback_ids_pkey';
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION feedback_ids_on_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM feedback_ids i USING old_rows o WHERE i.id = o.id AND i.created_at = o.created_at;
+    RETURN NULL;
+END
+$$;
+
+-- Only rows whose id or created_at changed move their claim. The API never
+-- changes either, so for its updates this finds nothing to do. Rows moved to
+-- another month's partition are in the transition tables as well.
+CREATE OR REPLACE FUNCTION feedback_ids_on_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    duplicate TEXT;
+BEGIN
+    DELETE FROM feedback_ids i USING old_rows o
+    WHERE i.id = o.id AND i.created_at = o.created_at
+      AND NOT EXISTS (SELECT 1 FROM new_rows n WHERE n.id = o.id AND n.created_at = o.created_at);
+    INSERT INTO feedback_ids (id, created_at)
+    SELECT id, created_at FROM new_rows n
+    WHERE NOT EXISTS (SELECT 1 FROM old_rows o WHERE o.id = n.id AND o.created_at = n.created_at)
+    ORDER BY id
+    ON CONFLICT (id) DO NOTHING;
+    SELECT n.id INTO duplicate
+    FROM new_rows n JOIN feedback_ids i USING (id)
+    WHERE i.created_at <> n.created_at
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE unique_violation USING MESSAGE = format('duplicate feedback id %s', duplicate),
+                                     CONSTRAINT = 'feedback_ids_pkey';
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- Removes the ids of a detached partition, so that an archived month's ids
+-- can be used again (restoring the archive claims them back).
+CREATE OR REPLACE FUNCTION feedback_ids_subtract(detached REGCLASS) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE format('DELETE FROM feedback_ids i USING %s d WHERE i.id = d.id AND i.created_at = d.created_at',
+                   detached);
+END
+$$;
+
+-- Existing ids are copied while writes wait, as in 0006. Should rows already
+-- share an id, the oldest keeps it and the others are reported; delete or
+-- re-id them, as the API cannot tell them apart.
+DO $$
+DECLARE
+    duplicates BIGINT;
+BEGIN
+    LOCK TABLE feedbacks IN SHARE MODE;
+    INSERT INTO feedback_ids (id, created_at)
+    SELECT DISTINCT ON (id) id, created_at FROM feedbacks
+    ORDER BY id, created_at
+    ON CONFLICT (id) DO NOTHING;
+    SELECT count(*) INTO duplicates
+    FROM feedbacks f JOIN feedback_ids i USING (id)
+    WHERE i.created_at <> f.created_at;
+    IF duplicates > 0 THEN
+        RAISE WARNING '% feedbacks share their id with an older one; find them with: '
+                      'SELECT f.* FROM feedbacks f JOIN feedback_ids i USING (id) WHERE i.created_at <> f.created_at',
+                      duplicates;
+    END IF;
+END
+$$;
+
+CREATE TRIGGER feedback_ids_insert AFTER INSERT ON feedbacks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedback_ids_on_insert();
+
+CREATE TRIGGER feedback_ids_update AFTER UPDATE ON feedbacks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedback_ids_on_update();
+
+CREATE TRIGGER feedback_ids_delete AFTER DELETE ON feedbacks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedback_ids_on_delete();
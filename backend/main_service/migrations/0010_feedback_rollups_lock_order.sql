@@ -0,0 +1,28 @@
+-- feedback_rollups_add (0003) upserts its groups in a fixed order, as
+-- feedback_terms_add (0008) does. Import chunks, scoring batches and rescoring
+-- updates touching the same hours and days then lock those rollup rows in the
+-- same order and wait for each other instead of deadlocking.
+CREATE OR REPLACE FUNCTION feedback_rollups_add(deltas feedback_rollup_delta[]) RETURNS void
+LANGUAGE sql AS $$
+    WITH changes AS (
+        SELECT * FROM unnest(deltas) WHERE feedbacks <> 0 OR confidence_sum <> 0
+    ), hourly AS (
+        INSERT INTO feedback_rollups_hourly AS r
+            (bucket, sentiment, has_negation, confidence_bucket, feedbacks, confidence_sum)
+        SELECT bucket, sentiment, has_negation, confidence_bucket, feedbacks, confidence_sum FROM changes
+        ORDER BY bucket, sentiment, has_negation, confidence_bucket
+        ON CONFLICT (bucket, sentiment, has_negation, confidence_bucket) DO UPDATE
+            SET feedbacks = r.feedbacks + EXCLUDED.feedbacks,
+                confidence_sum = r.confidence_sum + EXCLUDED.confidence_sum
+    )
+    INSERT INTO feedback_rollups_daily AS r
+        (bucket, sentiment, has_negation, confidence_bucket, feedbacks, confidence_sum)
+    SELECT date_trunc('day', bucket) AS bucket, sentiment, has_negation, confidence_bucket,
+           sum(feedbacks), sum(confidence_sum)
+    FROM changes
+    GROUP BY 1, 2, 3, 4
+    ORDER BY bucket, sentiment, has_negation, confidence_bucket
+    ON CONFLICT (bucket, sentiment, has_negation, confidence_bucket) DO UPDATE
+        SET feedbacks = r.feedbacks + EXCLUDED.feedbacks,
+            confidence_sum = r.confidence_sum + EXCLUDED.confidence_sum
+$$;
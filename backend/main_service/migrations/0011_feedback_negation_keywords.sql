@@ -0,0 +1,10 @@
+-- Fingerprint of the negation keyword set the ML service matched when it scored
+-- each feedback (NULL for rows scored before this column existed, or not scored
+-- yet). The processed text and negation flag depend on that set as well as on the
+-- model, and /negation/reload or NEGATION_KEYWORDS_FILE change it without a new
+-- model version, so predictions are only reused, and rows only count as fresh
+-- for stale rescoring, when both match. Adding nullable columns without a
+-- default does not rewrite the tables.
+ALTER TABLE feedbacks ADD COLUMN IF NOT EXISTS negation_keywords TEXT;
+
+ALTER TABLE rescoring_jobs ADD COLUMN IF NOT EXISTS negation_keywords TEXT;
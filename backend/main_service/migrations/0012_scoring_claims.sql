@@ -0,0 +1,9 @@
+-- Unscored feedbacks a scoring worker is scoring (scoring.py). A worker claims
+-- its batch here and commits before it calls the ML service, so no row locks
+-- are held during the call. Other workers skip claimed rows until
+-- claimed_until; the rows of a worker that stopped mid-batch are claimed again
+-- after that. The table only holds the batches in flight.
+CREATE TABLE IF NOT EXISTS scoring_claims (
+    id TEXT PRIMARY KEY,
+    claimed_until TIMESTAMP NOT NULL
+);
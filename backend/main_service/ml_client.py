@@ -0,0 +1,190 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import ML_BREAKER_STATE, ML_CALLS, ML_CALL_SECONDS
+
+
+class CircuitOpen(Exception):
+    """
+    Raised instead of calling the ML service while the breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing service for a while. After `failure_threshold`
+    consecutive failures the breaker opens and allow() raises CircuitOpen at
+    once; after `reset_timeout` seconds one trial call is let through
+    (half-open), and its outcome closes or re-opens the breaker. `clock`
+    returns the current time in seconds.
+    """
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        ML_BREAKER_STATE.set(0)
+
+    def _set_state(self, state):
+        self.state = state
+        ML_BREAKER_STATE.set(self._STATE_VALUES[state])
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            raise CircuitOpen(f"ML service circuit is open after {self.failures} failures: {self.last_error}")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            if self.state != self.CLOSED:
+                print("ML service circuit closed")
+                self._set_state(self.CLOSED)
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                if self.state == self.CLOSED:
+                    print(f"ML service circuit opened after {self.failures} failures: {error}")
+                self._set_state(self.OPEN)
+                self.opened_at = self.clock()
+
+    def release_trial(self):
+        """
+        Ends the trial call without an outcome, for calls that failed for a
+        reason other than the service; the next call becomes the trial.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+            return {"state": self.state, "consecutive_failures": self.failures,
+                    "last_error": self.last_error, "retry_in_seconds": retry_in}
+
+
+class MLClient:
+    """
+    Client for the ML service shared by all of main_service's callers. One
+    requests.Session keeps up to `pool_size` keep-alive connections open,
+    every call has separate connect and read timeouts, and a CircuitBreaker
+    makes calls fail fast with CircuitOpen while the service is down, so
+    callers leave the rows unscored for the scoring worker instead of waiting
+    out a timeout each.
+
+    Connection errors, timeouts and 5xx responses count as failures; 4xx
+    responses raise requests.HTTPError without tripping the breaker.
+    """
+    def __init__(self, predict_url, batch_url, health_url, connect_timeout=1.0, read_timeout=5.0,
+                 batch_read_timeout=30.0, pool_size=10, breaker=None):
+        self.predict_url = predict_url
+        self.batch_url = batch_url
+        self.health_url = health_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.batch_read_timeout = batch_read_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.served = (None, None)
+        self._served_seen_at = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _call(self, endpoint, method, url, read_timeout, **kwargs):
+        try:
+            self.breaker.allow()
+        except CircuitOpen:
+            ML_CALLS.labels(endpoint, "rejected").inc()
+            raise
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=(self.connect_timeout, read_timeout), **kwargs)
+            if response.status_code >= 500:
+                response.raise_for_status()
+        except requests.RequestException as e:
+            self.breaker.record_failure(e)
+            ML_CALLS.labels(endpoint, "failed").inc()
+            raise
+        except BaseException:
+            # Otherwise a half-open breaker would wait for this trial forever
+            self.breaker.release_trial()
+            raise
+        finally:
+            ML_CALL_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+        self.breaker.record_success()
+        ML_CALLS.labels(endpoint, "ok").inc()
+        response.raise_for_status()
+        return response.json()
+
+    def _saw(self, result):
+        if result.get("model_version") is not None:
+            self.served = (result["model_version"], result.get("negation_keywords"))
+            self._served_seen_at = time.monotonic()
+
+    def predict(self, text):
+        """
+        Scores one text and returns the ML service's result.
+        """
+        result = self._call("predict", "POST", self.predict_url, self.read_timeout, json={"text": text})
+        self._saw(result)
+        return result
+
+    def predict_batch(self, texts):
+        """
+        Scores texts with one /predict/batch call and returns the per-text
+        results, in order.
+        """
+        results = self._call("predict_batch", "POST", self.batch_url, self.batch_read_timeout,
+                             json={"texts": texts})["results"]
+        for result in results:
+            self._saw(result)
+        return results
+
+    def scorer(self):
+        """
+        The (model_version, negation_keywords) pair the ML service is serving,
+        from its /health endpoint. Its predictions depend on both: the model,
+        and the fingerprint of the negation keyword set it matches.
+        """
+        health = self._call("health", "GET", self.health_url, self.read_timeout)
+        self._saw(health)
+        return health.get("model_version"), health.get("negation_keywords")
+
+    def current_scorer(self, max_age=60.0):
+        """
+        The served (model_version, negation_keywords) as last seen in a
+        response, asking /health when that was more than `max_age` seconds
+        ago. While the ML service cannot be reached, the last pair seen (or
+        (None, None)) is returned.
+        """
+        if self._served_seen_at is None or time.monotonic() - self._served_seen_at > max_age:
+            try:
+                self.scorer()
+            except (CircuitOpen, requests.RequestException, ValueError):
+                pass
+        return self.served
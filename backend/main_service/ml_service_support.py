@@ -0,0 +1,24 @@
+"""
+Loads ml_service's utils.py for the tests and benchmarks that compare
+main_service's text processing with the ML service's. The services are
+deployed separately, so this only works where ml_service is checked out next
+to main_service.
+"""
+import functools
+import importlib.util
+import os
+
+ML_UTILS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ml_service", "utils.py")
+
+
+@functools.lru_cache(maxsize=None)
+def ml_service_utils():
+    """
+    The ML service's utils module, or None if ml_service is not checked out.
+    """
+    if not os.path.exists(ML_UTILS):
+        return None
+    spec = importlib.util.spec_from_file_location("ml_service_utils", ML_UTILS)
+    utils = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(utils)
+    return utils
@@ -0,0 +1,247 @@
+"""
+Monthly partitions of feedbacks (migrations/0006_feedback_partitions.sql):
+creating them ahead of time, and archiving old ones to gzipped CSV files.
+
+Archiving a month detaches its partition (so the API no longer sees it),
+copies the rows to <archive dir>/feedbacks_pYYYY_MM.csv.gz, removes them
+from the stats rollups, term counts and feedback_ids and drops the table.
+No rows are deleted one by one, so there is no bloat left for vacuum. A run
+interrupted part-way leaves the partition detached; the next run finishes
+it. restore_archive() loads a file back.
+"""
+import csv
+import datetime
+import gzip
+import os
+import re
+import threading
+import time
+
+from metrics import ARCHIVED_ROWS, PARTITIONS_ARCHIVED, PARTITIONS_CREATED
+
+PARTITION_RE = re.compile(r"^feedbacks_p(\d{4})_(\d{2})$")
+
+# pg_try_advisory_lock key held by a maintenance run, so that several backend
+# processes do not archive the same partition at once
+_LOCK_KEY = 7263813
+
+# SQLSTATE of "no partition of relation ... found for row" (and of CHECK constraints)
+_CHECK_VIOLATION = "23514"
+
+
+def partition_month(name):
+    """
+    First day of the month a partition holds, from its name.
+    """
+    match = PARTITION_RE.fullmatch(name)
+    if not match:
+        raise ValueError(f"{name} is not a feedbacks partition")
+    return datetime.date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def ensure_partitions(conn, months_ahead=3):
+    """
+    Creates the partitions of the current month and the next `months_ahead`
+    months that do not exist yet, and returns their names.
+    """
+    month = datetime.date.today().replace(day=1)
+    with conn.cursor() as cur:
+        # Attaching waits for DDL and VACUUM on feedbacks; rather try again next run
+        cur.execute("SET LOCAL lock_timeout = '5s'")
+        cur.execute("SELECT feedback_partitions_ensure(%s, %s)", (month, add_months(month, months_ahead + 1)))
+        created = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    PARTITIONS_CREATED.inc(len(created))
+    return created
+
+
+def is_missing_partition(error):
+    """
+    Whether a failed statement wrote a row to a month without a partition.
+    """
+    return getattr(error, "pgcode", None) == _CHECK_VIOLATION and "no partition of relation" in str(error)
+
+
+def ensure_month_partition(conn, timestamp):
+    """
+    Creates the partition of `timestamp`'s month if it does not exist, for a
+    write that found none because partition maintenance has not run since
+    the months created ahead ran out (it is disabled, or failed).
+    """
+    month = timestamp.date().replace(day=1)
+    with conn.cursor() as cur:
+        cur.execute("SELECT feedback_partitions_ensure(%s, %s)", (month, add_months(month, 1)))
+        created = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    PARTITIONS_CREATED.inc(len(created))
+    return created
+
+
+def list_partitions(conn):
+    """
+    The feedbacks partitions, oldest first, as dicts with name, month,
+    attached (False for one left detached by an interrupted archive run),
+    rows (planner estimate, None before the first ANALYZE) and bytes.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname, i.inhrelid IS NOT NULL, coalesce(i.inhdetachpending, false),
+                   c.reltuples::bigint, pg_total_relation_size(c.oid)
+            FROM pg_class c
+            LEFT JOIN pg_inherits i ON i.inhrelid = c.oid AND i.inhparent = 'feedbacks'::regclass
+            WHERE c.relkind = 'r' AND c.relname ~ '^feedbacks_p[0-9]{4}_[0-9]{2}$'
+              AND c.relnamespace = current_schema()::regnamespace
+            ORDER BY c.relname
+            """)
+        rows = cur.fetchall()
+    conn.commit()
+    return [{"name": name, "month": partition_month(name), "attached": attached and not pending,
+             "rows": None if estimate < 0 else estimate, "bytes": size}
+            for name, attached, pending, estimate, size in rows]
+
+
+def archive_partition(conn, partition, archive_dir):
+    """
+    Archives one partition (attached or left detached) and returns
+    (archive file path, rows written).
+    """
+    partition_month(partition)
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT inhdetachpending FROM pg_inherits
+            WHERE inhrelid = to_regclass(%s) AND inhparent = 'feedbacks'::regclass
+            """, (partition,))
+        attached = cur.fetchone()
+    conn.commit()
+    if attached is not None:
+        # CONCURRENTLY waits for queries on feedbacks instead of blocking them,
+        # and cannot run inside a transaction
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                mode = "FINALIZE" if attached[0] else "CONCURRENTLY"
+                cur.execute(f"ALTER TABLE feedbacks DETACH PARTITION {partition} {mode}")
+        finally:
+            conn.autocommit = False
+
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{partition}.csv.gz")
+    partial = path + ".partial"
+    with conn.cursor() as cur:
+        with open(partial, "wb") as raw:
+            with gzip.GzipFile(filename=f"{partition}.csv", mode="wb", fileobj=raw) as out:
+                cur.copy_expert(f"COPY {partition} TO STDOUT WITH (FORMAT csv, HEADER)", out)
+            written = cur.rowcount
+            raw.flush()
+            os.fsync(raw.fileno())
+        cur.execute(f"SELECT count(*) FROM {partition}")
+        rows = cur.fetchone()[0]
+        if written != rows:
+            raise RuntimeError(f"Archive of {partition} has {written} of its {rows} rows; the partition is kept")
+        os.replace(partial, path)
+
+        cur.execute("SELECT feedback_rollups_subtract(%s::regclass)", (partition,))
+        cur.execute("SELECT feedback_terms_subtract(%s::regclass)", (partition,))
+        cur.execute("SELECT feedback_ids_subtract(%s::regclass)", (partition,))
+        cur.execute(f"DROP TABLE {partition}")
+    conn.commit()
+    PARTITIONS_ARCHIVED.inc()
+    ARCHIVED_ROWS.inc(rows)
+    return path, rows
+
+
+def apply_retention(conn, retention_months, archive_dir, dry_run=False, log=print):
+    """
+    Archives the partitions whose whole month is more than
+    `retention_months` months ago, and any left detached. Returns the names
+    of the partitions archived (or that would be, with dry_run).
+    """
+    cutoff = add_months(datetime.date.today().replace(day=1), -retention_months)
+    archived = []
+    for partition in list_partitions(conn):
+        if partition["attached"] and add_months(partition["month"], 1) > cutoff:
+            continue
+        archived.append(partition["name"])
+        if dry_run:
+            continue
+        started = time.perf_counter()
+        path, rows = archive_partition(conn, partition["name"], archive_dir)
+        log(f"Archived {partition['name']}: {rows} feedbacks to {path} ({time.perf_counter() - started:.1f}s)")
+    return archived
+
+
+def restore_archive(conn, path):
+    """
+    Loads an archive file written by archive_partition back into feedbacks
+    (the stats rollups and term counts count the rows again) and returns the
+    rows loaded. Fails without loading anything if any of its feedback ids
+    is in use.
+    """
+    month = partition_month(os.path.basename(path).split(".", 1)[0])
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f, conn.cursor() as cur:
+        columns = next(csv.reader([f.readline()]))
+        if not all(re.fullmatch(r"\w+", c) for c in columns):
+            raise ValueError(f"{path} does not start with a header of column names")
+        cur.execute("SELECT feedback_partitions_ensure(%s, %s)", (month, add_months(month, 1)))
+        cur.copy_expert(f"COPY feedbacks ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", f)
+        rows = cur.rowcount
+    conn.commit()
+    return rows
+
+
+class PartitionMaintainer:
+    """
+    Background thread that, every `interval` seconds, creates the partitions
+    of the next `months_ahead` months and, if `retention_months` is set,
+    archives older ones to `archive_dir`. Only one backend process runs it
+    at a time; the others skip that round. `connection` is a callable
+    returning a connection context manager (get_db_connection).
+    """
+    def __init__(self, connection, months_ahead=3, retention_months=0, archive_dir="archive",
+                 interval=3600.0, log=print):
+        self.connection = connection
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self.log = log
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="feedback-partitions", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.log(f"Feedback partition maintenance failed: {e}")
+            time.sleep(self.interval)
+
+    def run_once(self):
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (_LOCK_KEY,))
+                locked = cur.fetchone()[0]
+            conn.commit()
+            if not locked:
+                return
+            try:
+                created = ensure_partitions(conn, self.months_ahead)
+                if created:
+                    self.log(f"Created feedback partitions {', '.join(created)}")
+                if self.retention_months:
+                    apply_retention(conn, self.retention_months, self.archive_dir, log=self.log)
+            finally:
+                conn.rollback()
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (_LOCK_KEY,))
+                conn.commit()
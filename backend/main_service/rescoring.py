@@ -0,0 +1,264 @@
+import time
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from metrics import RESCORED_ROWS
+from text_hash import text_hash
+
+# Rows each mode sends back through the model
+MODES = {
+    "unscored": "sentiment IS NULL",
+    "stale": "(sentiment IS NULL OR model_version IS DISTINCT FROM %(model_version)s"
+             " OR negation_keywords IS DISTINCT FROM %(negation_keywords)s)",
+    "all": "TRUE",
+}
+
+# pg_advisory_lock(_LOCK_CLASS, job id) is held while a job runs, so the same
+# job is never run by two processes at once.
+_LOCK_CLASS = 7263811
+
+# Most rows a job may send per /predict/batch call (the ML service's default
+# PREDICT_BATCH_MAX_ITEMS)
+MAX_CHUNK_SIZE = 1000
+
+# Statuses a job can be (re)started from
+RESUMABLE = ("pending", "running", "paused", "failed")
+
+
+class JobBusy(Exception):
+    pass
+
+
+def create_job(conn, mode, model_version, negation_keywords, chunk_size, max_rows_per_second=0):
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("""
+            INSERT INTO rescoring_jobs (mode, model_version, negation_keywords, chunk_size, max_rows_per_second)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING *
+            """, (mode, model_version, negation_keywords, chunk_size, max_rows_per_second))
+        job = cur.fetchone()
+    conn.commit()
+    return job
+
+
+def get_job(conn, job_id):
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT * FROM rescoring_jobs WHERE id = %s", (job_id,))
+        job = cur.fetchone()
+    conn.commit()
+    return job
+
+
+def list_jobs(conn, limit=20):
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT * FROM rescoring_jobs ORDER BY id DESC LIMIT %s", (limit,))
+        jobs = cur.fetchall()
+    conn.commit()
+    return jobs
+
+
+def find_resumable_job(conn, mode, model_version, negation_keywords):
+    """
+    The latest unfinished job for the same mode, model version and negation
+    keyword set, if any.
+    """
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("""
+            SELECT * FROM rescoring_jobs
+            WHERE mode = %s AND model_version IS NOT DISTINCT FROM %s
+              AND negation_keywords IS NOT DISTINCT FROM %s AND status = ANY(%s)
+            ORDER BY id DESC LIMIT 1
+            """, (mode, model_version, negation_keywords, list(RESUMABLE)))
+        job = cur.fetchone()
+    conn.commit()
+    return job
+
+
+def is_running(conn, job_id):
+    """
+    Whether some process currently holds the job's lock.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT EXISTS (SELECT 1 FROM pg_locks
+                           WHERE locktype = 'advisory' AND classid = %s AND objid = %s AND granted)
+            """, (_LOCK_CLASS, job_id))
+        running = cur.fetchone()[0]
+    conn.commit()
+    return running
+
+
+def pause_job(conn, job_id):
+    """
+    Asks a job to stop after its current chunk. Returns the job, or None if
+    it does not exist.
+    """
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("""
+            UPDATE rescoring_jobs SET status = 'paused', updated_at = now()
+            WHERE id = %s AND status IN ('pending', 'running')
+            """, (job_id,))
+        cur.execute("SELECT * FROM rescoring_jobs WHERE id = %s", (job_id,))
+        job = cur.fetchone()
+    conn.commit()
+    return job
+
+
+class RescoringJob:
+    """
+    Runs one rescoring_jobs row: walks feedbacks in (created_at, id) order
+    from the job's cursor, `chunk_size` matching rows at a time, scores their
+    texts with one /predict/batch call per chunk and writes the results (with
+    the model version and negation keyword set) back with a single UPDATE.
+    Each chunk's UPDATE and the job's new cursor commit together, so a job
+    that stops for any reason resumes after the last chunk written. The job
+    is done once a chunk finds no more rows.
+
+    Chunk rows are read without locks and the ML service is called with no
+    transaction open, so live edits and deletes never wait for a chunk. A
+    row edited meanwhile keeps its new text's scores: results are only
+    written to rows whose text is still the one sent. `max_rows_per_second`
+    (0 for no limit) spaces chunks out so the ML service and the database
+    keep capacity for live traffic.
+
+    `connection` is a callable returning a connection context manager; the
+    job holds that one connection until it stops. `ml_client` is an
+    ml_client.MLClient.
+    """
+    def __init__(self, connection, ml_client, job_id, max_retries=5, log=print):
+        self.connection = connection
+        self.ml_client = ml_client
+        self.job_id = job_id
+        self.max_retries = max_retries
+        self.log = log
+
+    def run(self):
+        """
+        Runs the job until it is done, paused or fails, and returns its final
+        row. Raises JobBusy if another process is running it.
+        """
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (_LOCK_CLASS, self.job_id))
+                locked = cur.fetchone()[0]
+            conn.commit()
+            if not locked:
+                raise JobBusy(f"Rescoring job {self.job_id} is already running")
+            try:
+                return self._run(conn)
+            finally:
+                conn.rollback()
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s, %s)", (_LOCK_CLASS, self.job_id))
+                conn.commit()
+
+    def _run(self, conn):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                UPDATE rescoring_jobs SET status = 'running', error = NULL, updated_at = now()
+                WHERE id = %s AND status = ANY(%s)
+                RETURNING *
+                """, (self.job_id, list(RESUMABLE)))
+            job = cur.fetchone()
+        conn.commit()
+        if job is None:
+            return get_job(conn, self.job_id)
+        self.log(f"Rescoring job {job['id']} ({job['mode']}, model {job['model_version']}) "
+                 f"resuming after {job['scanned']} rows")
+
+        retries = 0
+        while job["status"] == "running":
+            started = time.monotonic()
+            try:
+                job, rows = self._chunk(conn, job)
+                retries = 0
+            except Exception as e:
+                conn.rollback()
+                retries += 1
+                if retries > self.max_retries:
+                    job = self._finish(conn, "failed", error=str(e))
+                    self.log(f"Rescoring job {job['id']} failed: {e}")
+                    break
+                delay = min(60, 2 ** retries)
+                self.log(f"Rescoring chunk failed, retrying in {delay}s: {e}")
+                time.sleep(delay)
+                continue
+
+            if rows == 0 and job["status"] == "running":
+                job = self._finish(conn, "done")
+                self.log(f"Rescoring job {job['id']} done: {job['rescored']} of {job['scanned']} rows rescored")
+                break
+            if job["max_rows_per_second"]:
+                time.sleep(max(0.0, rows / job["max_rows_per_second"] - (time.monotonic() - started)))
+        return job
+
+    def _chunk(self, conn, job):
+        params = {"model_version": job["model_version"], "negation_keywords": job["negation_keywords"],
+                  "limit": job["chunk_size"],
+                  "cursor_created_at": job["cursor_created_at"], "cursor_id": job["cursor_id"]}
+        after = ""
+        if job["cursor_created_at"] is not None:
+            after = "AND (created_at, id) > (%(cursor_created_at)s, %(cursor_id)s)"
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT id, feedback, created_at FROM feedbacks
+                WHERE created_at IS NOT NULL {after} AND {MODES[job['mode']]}
+                ORDER BY created_at, id
+                LIMIT %(limit)s
+                """, params)
+            rows = cur.fetchall()
+        conn.commit()
+
+        rescored = 0
+        if rows:
+            results = self.ml_client.predict_batch([r[1] or "" for r in rows])
+            # Rows written before text_hash existed get it here, so they
+            # become reusable for the new model version
+            scored = [(r[0], r[2], r[1], p["sentiment"], p.get("cleaned_text"), p.get("processed_text"),
+                       p.get("confidence"), p.get("has_negation"), p.get("model_version"),
+                       p.get("negation_keywords"), text_hash(r[1]))
+                      for r, p in zip(rows, results) if p.get("sentiment") is not None]
+            if scored:
+                with conn.cursor() as cur:
+                    execute_values(cur, """
+                        UPDATE feedbacks AS f SET
+                            sentiment = v.sentiment, cleaned_text = v.cleaned_text,
+                            processed_text = v.processed_text, confidence = v.confidence,
+                            has_negation = v.has_negation, model_version = v.model_version,
+                            negation_keywords = v.negation_keywords, text_hash = v.text_hash
+                        FROM (VALUES %s) AS v (id, created_at, feedback, sentiment, cleaned_text, processed_text,
+                                               confidence, has_negation, model_version, negation_keywords,
+                                               text_hash)
+                        WHERE f.id = v.id AND f.created_at = v.created_at
+                          AND f.feedback IS NOT DISTINCT FROM v.feedback
+                        """, scored, template="(%s, %s::timestamp, %s, %s, %s, %s, %s::float, %s::boolean, %s, %s, %s)",
+                        page_size=len(scored))
+                    rescored = cur.rowcount
+
+        last = rows[-1] if rows else (job["cursor_id"], None, job["cursor_created_at"])
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # A pause requested meanwhile is kept; the chunk still counts
+            cur.execute("""
+                UPDATE rescoring_jobs SET cursor_created_at = %s, cursor_id = %s,
+                    scanned = scanned + %s, rescored = rescored + %s, updated_at = now()
+                WHERE id = %s
+                RETURNING *
+                """, (last[2], last[0], len(rows), rescored, job["id"]))
+            job = cur.fetchone()
+        conn.commit()
+        RESCORED_ROWS.inc(rescored)
+        return job, len(rows)
+
+    def _finish(self, conn, status, error=None):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                UPDATE rescoring_jobs SET status = %s, error = %s, updated_at = now(),
+                    finished_at = CASE WHEN %s = 'done' THEN now() END
+                WHERE id = %s
+                RETURNING *
+                """, (status, error, status, self.job_id))
+            job = cur.fetchone()
+        conn.commit()
+        return job
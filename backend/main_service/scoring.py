@@ -0,0 +1,194 @@
+import datetime
+import threading
+import time
+
+from psycopg2.extras import execute_values
+
+from metrics import SCORING_QUEUE_DEPTH, SCORING_LAG, SCORING_DELAY, SCORED_ROWS, SCORING_BATCHES
+
+# Rows still waiting for a prediction. In async ingestion mode every new
+# feedback starts like this; in sync mode only those whose ML call failed.
+UNSCORED = "sentiment IS NULL"
+
+# Columns filled in from the ML service's response, in table order
+SCORE_COLUMNS = ("sentiment", "cleaned_text", "processed_text", "confidence", "has_negation", "model_version",
+                 "negation_keywords")
+
+
+def reusable_scores(cur, hashes, model_version, negation_keywords):
+    """
+    Returns {text_hash: SCORE_COLUMNS dict} for those of `hashes` that some
+    feedback was already scored for by `model_version` with the negation
+    keyword set `negation_keywords`, taken from one such feedback (see
+    text_hash.py for why they are interchangeable).
+    """
+    hashes = sorted({h for h in hashes if h is not None})
+    if not hashes or model_version is None or negation_keywords is None:
+        return {}
+    columns = ", ".join(SCORE_COLUMNS)
+    cur.execute(f"""
+        SELECT h.text_hash, {columns}
+        FROM unnest(%s::text[]) AS h (text_hash)
+        CROSS JOIN LATERAL (
+            SELECT {columns} FROM feedbacks f
+            WHERE f.text_hash = h.text_hash AND f.model_version = %s AND f.negation_keywords = %s
+              AND f.sentiment IS NOT NULL
+            LIMIT 1
+        ) AS s
+        """, (hashes, model_version, negation_keywords))
+    return {row[0]: dict(zip(SCORE_COLUMNS, row[1:])) for row in cur.fetchall()}
+
+
+class ScoringWorker:
+    """
+    Background thread that scores unscored feedbacks in batches. `connection`
+    is a callable returning a connection context manager (get_db_connection)
+    and `ml_client` an ml_client.MLClient.
+
+    Each cycle claims up to `batch_size` of the oldest unscored rows in
+    scoring_claims for `claim_seconds` (so several backend processes can run
+    a worker without scoring the same rows) and commits, sends their texts to
+    the ML service's /predict/batch in one request with no transaction open,
+    and writes the results back with a single UPDATE. Rows edited or scored
+    meanwhile are left as they are. Full batches are followed immediately by
+    the next one; otherwise the worker sleeps for `interval` seconds or until
+    notify() is called.
+    """
+    def __init__(self, connection, ml_client, batch_size=64, interval=2.0, max_backoff=30.0,
+                 claim_seconds=120.0):
+        self.connection = connection
+        self.ml_client = ml_client
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.claim_seconds = claim_seconds
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="feedback-scoring", daemon=True)
+            self._thread.start()
+        return self
+
+    def notify(self):
+        """
+        Wakes the worker up, e.g. right after a feedback was written.
+        """
+        self._wake.set()
+
+    def _run(self):
+        backoff = 0.0
+        while True:
+            try:
+                while self.score_batch() == self.batch_size:
+                    pass
+                backoff = 0.0
+            except Exception as e:
+                backoff = min(self.max_backoff, max(self.interval, backoff * 2))
+                print(f"Feedback scoring failed, retrying in {backoff:.0f}s: {e}")
+            try:
+                self.update_queue_metrics()
+            except Exception as e:
+                print(f"Feedback scoring metrics failed: {e}")
+            if backoff:
+                # New feedbacks do not cut a backoff short
+                time.sleep(backoff)
+            else:
+                self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def score_batch(self):
+        """
+        Scores one batch of unscored feedbacks and returns how many were updated.
+        Rows the ML service returned no sentiment for stay unscored.
+        """
+        rows = self._claim()
+        if not rows:
+            return 0
+        try:
+            results = self.ml_client.predict_batch([r[1] or "" for r in rows])
+        except Exception:
+            SCORING_BATCHES.labels("failed").inc()
+            self._release(rows)
+            raise
+
+        values = [(r[0], r[1], p["sentiment"], p.get("cleaned_text"), p.get("processed_text"), p.get("confidence"),
+                   p.get("has_negation"), p.get("model_version"), p.get("negation_keywords"))
+                  for r, p in zip(rows, results) if p.get("sentiment") is not None]
+        with self.connection() as conn:
+            with conn, conn.cursor() as cur:
+                # Only rows still unscored and with the text that was scored
+                updated = execute_values(cur, f"""
+                    UPDATE feedbacks AS f SET
+                        sentiment = v.sentiment, cleaned_text = v.cleaned_text,
+                        processed_text = v.processed_text, confidence = v.confidence,
+                        has_negation = v.has_negation, model_version = v.model_version,
+                        negation_keywords = v.negation_keywords
+                    FROM (VALUES %s) AS v (id, feedback, sentiment, cleaned_text, processed_text, confidence,
+                                           has_negation, model_version, negation_keywords)
+                    WHERE f.id = v.id AND f.feedback IS NOT DISTINCT FROM v.feedback AND f.{UNSCORED}
+                    RETURNING f.created_at
+                    """, values, template="(%s, %s, %s, %s, %s, %s::float, %s::boolean, %s, %s)",
+                    page_size=len(rows), fetch=True) if values else []
+                cur.execute("DELETE FROM scoring_claims WHERE id = ANY(%s)", ([r[0] for r in rows],))
+
+        now = datetime.datetime.now()
+        for (created_at,) in updated:
+            if created_at is not None:
+                SCORING_DELAY.observe((now - created_at).total_seconds())
+        SCORED_ROWS.inc(len(updated))
+        SCORING_BATCHES.labels("ok").inc()
+        return len(updated)
+
+    def _claim(self):
+        """
+        Claims up to `batch_size` of the oldest unscored rows nobody else has
+        claimed and returns their (id, feedback, created_at), committed.
+        """
+        with self.connection() as conn:
+            with conn, conn.cursor() as cur:
+                cur.execute("DELETE FROM scoring_claims WHERE claimed_until <= LOCALTIMESTAMP")
+                # A row claimed by a worker that committed after this statement
+                # started is not in `claimed`, and so is not returned
+                cur.execute(f"""
+                    WITH candidates AS (
+                        SELECT f.id, f.feedback, f.created_at FROM feedbacks f
+                        WHERE f.{UNSCORED}
+                          AND NOT EXISTS (SELECT 1 FROM scoring_claims c WHERE c.id = f.id)
+                        ORDER BY f.created_at
+                        LIMIT %s
+                        FOR UPDATE OF f SKIP LOCKED
+                    ), claimed AS (
+                        INSERT INTO scoring_claims (id, claimed_until)
+                        SELECT id, LOCALTIMESTAMP + %s * interval '1 second' FROM candidates
+                        ORDER BY id
+                        ON CONFLICT (id) DO NOTHING
+                        RETURNING id
+                    )
+                    SELECT c.id, c.feedback, c.created_at FROM candidates c JOIN claimed USING (id)
+                    ORDER BY c.created_at
+                    """, (self.batch_size, self.claim_seconds))
+                return cur.fetchall()
+
+    def _release(self, rows):
+        """
+        Gives up the claims of a batch that could not be scored, so the next
+        cycle can take it up again; if this fails, the claims expire.
+        """
+        try:
+            with self.connection() as conn:
+                with conn, conn.cursor() as cur:
+                    cur.execute("DELETE FROM scoring_claims WHERE id = ANY(%s)", ([r[0] for r in rows],))
+        except Exception as e:
+            print(f"Releasing scoring claims failed: {e}")
+
+    def update_queue_metrics(self):
+        """
+        Refreshes the queue depth and lag (age of the oldest unscored feedback).
+        """
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute(f"SELECT count(*), min(created_at) FROM feedbacks WHERE {UNSCORED}")
+            depth, oldest = cur.fetchone()
+        SCORING_QUEUE_DEPTH.set(depth)
+        SCORING_LAG.set((datetime.datetime.now() - oldest).total_seconds() if oldest else 0.0)
@@ -1,9 +1,12 @@
 import requests
 import unittest
+import json
 import time
 import subprocess
 import sys
 import os
+import random
+import datetime
 
 BASE_URL = "http://localhost:5000/api"
 
@@ -67,7 +70,7 @@ class TestBackendService(unittest.TestCase):
         # 2. Read All
         r_all = requests.get(f"{BASE_URL}/feedbacks")
         self.assertEqual(r_all.status_code, 200)
-        self.assertTrue(len(r_all.json()) > 0)
+        self.assertTrue(len(r_all.json()['feedbacks']) > 0)
 
         # 3. Read One
         r_one = requests.get(f"{BASE_URL}/feedbacks/{feedback_id}")
@@ -78,6 +81,15 @@ class TestBackendService(unittest.TestCase):
         r_update = requests.put(f"{BASE_URL}/feedbacks/{feedback_id}", json={"feedback": "Updated Feedback"})
         self.assertEqual(r_update.status_code, 200)
         self.assertEqual(r_update.json()['feedback'], "Updated Feedback")
+        # The old scores are replaced: re-scored now, or cleared for the scoring worker
+        self.assertIn(r_update.json()['cleaned_text'], ("Updated Feedback", None))
+        r_missing = requests.put(f"{BASE_URL}/feedbacks/does-not-exist", json={"feedback": "Updated Feedback"})
+        self.assertEqual(r_missing.status_code, 404)
+        for body in ("not json", "[1, 2]"):
+            r_bad = requests.put(f"{BASE_URL}/feedbacks/{feedback_id}", data=body,
+                                 headers={"Content-Type": "application/json"})
+            self.assertEqual(r_bad.status_code, 400)
+            self.assertIn('error', r_bad.json())
 
         # 5. Delete
         r_delete = requests.delete(f"{BASE_URL}/feedbacks/{feedback_id}")
@@ -88,6 +100,306 @@ class TestBackendService(unittest.TestCase):
         self.assertEqual(r_check.status_code, 404)
         print("Feedback CRUD passed.")
 
+    def test_05_feedback_pagination(self):
+        print("\nTesting Feedback Pagination...")
+        r_user = requests.post(f"{BASE_URL}/users/register", json={"role": "anonymous"})
+        user_id = r_user.json()['user_id']
+        created = [requests.post(f"{BASE_URL}/feedbacks", json={"feedback": f"Page test {i}", "user_id": user_id}).json()
+                   for i in range(5)]
+
+        # Walk the pages with a small limit and only some columns; the new
+        # feedbacks are the newest, so they are all within the first pages
+        created_ids = {fb.get('id') for fb in created}
+        seen = []
+        cursor = None
+        while not created_ids.issubset(seen):
+            params = {"limit": 2, "fields": "feedback,user_id"}
+            if cursor:
+                params["cursor"] = cursor
+            r_page = requests.get(f"{BASE_URL}/feedbacks", params=params)
+            self.assertEqual(r_page.status_code, 200)
+            page = r_page.json()
+            self.assertTrue(len(page['feedbacks']) <= 2)
+            for fb in page['feedbacks']:
+                self.assertEqual(set(fb), {"id", "created_at", "feedback", "user_id"})
+            seen.extend(fb['id'] for fb in page['feedbacks'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertTrue(created_ids.issubset(seen))
+
+        # Filters and validation
+        r_filtered = requests.get(f"{BASE_URL}/feedbacks", params={"has_negation": "true", "min_confidence": 0.5})
+        self.assertEqual(r_filtered.status_code, 200)
+        for fb in r_filtered.json()['feedbacks']:
+            self.assertTrue(fb['has_negation'])
+            self.assertGreaterEqual(fb['confidence'], 0.5)
+        for value in ("nan", "inf", "-5", "7", "high"):
+            self.assertEqual(requests.get(f"{BASE_URL}/feedbacks", params={"min_confidence": value}).status_code, 400)
+        self.assertEqual(requests.get(f"{BASE_URL}/feedbacks", params={"limit": 0}).status_code, 400)
+        self.assertEqual(requests.get(f"{BASE_URL}/feedbacks", params={"fields": "password"}).status_code, 400)
+        self.assertEqual(requests.get(f"{BASE_URL}/feedbacks", params={"cursor": "bogus"}).status_code, 400)
+
+        for fb in created:
+            requests.delete(f"{BASE_URL}/feedbacks/{fb.get('id')}")
+
+    def test_06_bulk_import(self):
+        print("\nTesting Bulk Import...")
+        r_user = requests.post(f"{BASE_URL}/users/register", json={"role": "anonymous"})
+        user_id = r_user.json()['user_id']
+        feedback_id = f"import-{user_id}"
+
+        lines = [
+            json.dumps({"id": feedback_id, "feedback": "Imported feedback", "user_id": user_id,
+                        "created_at": "2025-01-02T03:04:05"}),
+            json.dumps({"feedback": ""}),
+            "not json",
+            json.dumps({"id": feedback_id, "feedback": "Same id again"}),
+        ]
+        response = requests.post(f"{BASE_URL}/feedbacks/import", data="\n".join(lines).encode("utf-8"),
+                                 headers={"Content-Type": "application/x-ndjson"})
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(summary['received'], 4)
+        self.assertEqual(summary['inserted'], 1)
+        self.assertEqual(summary['failed'], 3)
+        self.assertEqual(sorted(e['line'] for e in summary['errors']), [2, 3, 4])
+
+        r_one = requests.get(f"{BASE_URL}/feedbacks/{feedback_id}")
+        self.assertEqual(r_one.status_code, 200)
+        self.assertEqual(r_one.json()['feedback'], "Imported feedback")
+
+        csv_body = "feedback,user_id\nFrom CSV,\n,\n"
+        response = requests.post(f"{BASE_URL}/feedbacks/import", data=csv_body.encode("utf-8"),
+                                 headers={"Content-Type": "text/csv"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['inserted'], 1)
+        self.assertEqual(response.json()['errors'], [{"line": 3, "error": "feedback is required"}])
+
+        response = requests.post(f"{BASE_URL}/feedbacks/import", data=b"x", headers={"Content-Type": "text/plain"})
+        self.assertEqual(response.status_code, 415)
+
+        requests.delete(f"{BASE_URL}/feedbacks/{feedback_id}")
+
+    def test_07_metrics(self):
+        print("\nTesting Metrics...")
+        response = requests.get(BASE_URL.replace("/api", "/metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("feedback_scoring_queue_depth", response.text)
+        self.assertIn("feedback_scoring_lag_seconds", response.text)
+
+    def test_08_feedback_stats(self):
+        print("\nTesting Feedback Stats...")
+        before = requests.get(f"{BASE_URL}/feedbacks/stats", params={"days": 1})
+        self.assertEqual(before.status_code, 200)
+        self.assertEqual(len(before.json()['series']), 1)
+
+        r_user = requests.post(f"{BASE_URL}/users/register", json={"role": "anonymous"})
+        payload = {"feedback": "Stats test", "user_id": r_user.json()['user_id']}
+        feedback_id = requests.post(f"{BASE_URL}/feedbacks", json=payload).json()['id']
+
+        during = requests.get(f"{BASE_URL}/feedbacks/stats", params={"days": 1}).json()
+        self.assertEqual(during['total'], before.json()['total'] + 1)
+        hourly = requests.get(f"{BASE_URL}/feedbacks/stats", params={"granularity": "hour", "days": 1}).json()
+        self.assertEqual(len(hourly['series']), 24)
+        self.assertEqual(hourly['series'][-1]['feedbacks'], sum(hourly['series'][-1]['by_sentiment'].values()))
+
+        requests.delete(f"{BASE_URL}/feedbacks/{feedback_id}")
+        after = requests.get(f"{BASE_URL}/feedbacks/stats", params={"days": 1}).json()
+        self.assertEqual(after['total'], before.json()['total'])
+
+        # Timestamps with a UTC offset are compared in server local time
+        plus_two = datetime.timezone(datetime.timedelta(hours=2))
+        start = (datetime.datetime.now(plus_two) - datetime.timedelta(days=3)).replace(microsecond=0)
+        for params in ({"from": start.isoformat()},
+                       {"from": start.isoformat(), "to": (start + datetime.timedelta(days=2)).isoformat()},
+                       {"from": start.astimezone(datetime.timezone.utc).isoformat().replace("+00:00", "Z")}):
+            r_offset = requests.get(f"{BASE_URL}/feedbacks/stats", params=params)
+            self.assertEqual(r_offset.status_code, 200)
+            self.assertEqual(r_offset.json()['total'], sum(p['feedbacks'] for p in r_offset.json()['series']))
+        self.assertEqual(requests.get(f"{BASE_URL}/feedbacks/stats", params={"granularity": "week"}).status_code, 400)
+        self.assertEqual(requests.get(f"{BASE_URL}/feedbacks/stats", params={"days": 400}).status_code, 400)
+
+    def test_09_export(self):
+        print("\nTesting Export...")
+        r_user = requests.post(f"{BASE_URL}/users/register", json={"role": "anonymous"})
+        payload = {"feedback": "Export test, with a comma", "user_id": r_user.json()['user_id']}
+        feedback_id = requests.post(f"{BASE_URL}/feedbacks", json=payload).json()['id']
+
+        r_csv = requests.get(f"{BASE_URL}/feedbacks/export", params={"format": "csv", "fields": "feedback"})
+        self.assertEqual(r_csv.status_code, 200)
+        self.assertIn("attachment", r_csv.headers['Content-Disposition'])
+        lines = r_csv.content.decode("utf-8-sig").splitlines()
+        self.assertEqual(lines[0], "id,feedback,created_at")
+        self.assertTrue(any(line.startswith(f'{feedback_id},"Export test, with a comma",') for line in lines))
+
+        r_ndjson = requests.get(f"{BASE_URL}/feedbacks/export", params={"format": "ndjson"})
+        self.assertEqual(r_ndjson.status_code, 200)
+        rows = [json.loads(line) for line in r_ndjson.text.splitlines()]
+        self.assertIn(feedback_id, [row['id'] for row in rows])
+
+        self.assertEqual(requests.get(f"{BASE_URL}/feedbacks/export", params={"format": "xml"}).status_code, 400)
+        requests.delete(f"{BASE_URL}/feedbacks/{feedback_id}")
+
+    def test_10_rescoring_job(self):
+        print("\nTesting Rescoring Job...")
+        r_start = requests.post(f"{BASE_URL}/rescoring-jobs", json={"mode": "unscored", "chunk_size": 50})
+        if r_start.status_code == 503:
+            self.skipTest("ML service not running")
+        self.assertIn(r_start.status_code, (202, 409))
+        job_id = r_start.json()['id']
+
+        r_job = requests.get(f"{BASE_URL}/rescoring-jobs/{job_id}")
+        self.assertEqual(r_job.status_code, 200)
+        self.assertEqual(r_job.json()['mode'], "unscored")
+        self.assertIn(job_id, [job['id'] for job in requests.get(f"{BASE_URL}/rescoring-jobs").json()['jobs']])
+
+        self.assertEqual(requests.post(f"{BASE_URL}/rescoring-jobs/{job_id}/pause").status_code, 200)
+        self.assertEqual(requests.get(f"{BASE_URL}/rescoring-jobs/999999999").status_code, 404)
+        self.assertEqual(requests.post(f"{BASE_URL}/rescoring-jobs", json={"mode": "bogus"}).status_code, 400)
+
+    def test_11_health(self):
+        print("\nTesting Health...")
+        response = requests.get(f"{BASE_URL}/health")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['database'], "ok")
+        self.assertIn(data['ml_service']['state'], ("closed", "half_open", "open"))
+        self.assertEqual(data['status'], "ok" if data['ml_service']['state'] == "closed" else "degraded")
+
+    def test_12_duplicate_reuse(self):
+        print("\nTesting Duplicate Prediction Reuse...")
+        r_user = requests.post(f"{BASE_URL}/users/register", json={"role": "anonymous"})
+        user_id = r_user.json()['user_id']
+        text = "".join(random.choice("ابتثجحخدذرزسشصضطظعغفقكلمنهوي ") for _ in range(40)) + " ممتاز"
+        first = requests.post(f"{BASE_URL}/feedbacks", json={"feedback": text, "user_id": user_id}).json()
+        # Same text after clean_text: diacritics, punctuation and spacing differ
+        second = requests.post(f"{BASE_URL}/feedbacks", json={"feedback": f"  {text}ً!! ", "user_id": user_id}).json()
+        try:
+            if first.get('sentiment') is None:
+                self.skipTest("ML service not running")
+            self.assertEqual(second['text_hash'], first['text_hash'])
+            self.assertIsNotNone(first['negation_keywords'])
+            for column in ("sentiment", "confidence", "model_version", "negation_keywords"):
+                self.assertEqual(second[column], first[column])
+
+            response = requests.get(f"{BASE_URL}/feedbacks/duplicates", params={"limit": 5})
+            self.assertEqual(response.status_code, 200)
+            report = response.json()
+            self.assertGreaterEqual(report['clusters_total'], 1)
+            self.assertGreaterEqual(report['duplicate_rows'], 1)
+            self.assertTrue(all(c['size'] >= 2 for c in report['clusters']))
+            self.assertEqual(requests.get(f"{BASE_URL}/feedbacks/duplicates",
+                                          params={"min_size": 1}).status_code, 400)
+        finally:
+            requests.delete(f"{BASE_URL}/feedbacks/{first['id']}")
+            requests.delete(f"{BASE_URL}/feedbacks/{second['id']}")
+
+    def test_13_search(self):
+        print("\nTesting Feedback Search...")
+        user_id = requests.post(f"{BASE_URL}/users/register", json={"role": "anonymous"}).json()['user_id']
+        # A made-up word, so that only these feedbacks match it
+        word = "".join(random.choice("بتثجحخدذرزسشصضطظعغفقكلمن") for _ in range(10))
+        texts = [f"الخدمة {word} ممتازة", f"{word} سيئة جدا والانتظار طويل", f"شكرا {word}ً!!"]
+        created = [requests.post(f"{BASE_URL}/feedbacks", json={"feedback": t, "user_id": user_id}).json()
+                   for t in texts]
+        created_ids = {fb['id'] for fb in created}
+        try:
+            if any(fb.get('sentiment') is None for fb in created):
+                self.skipTest("ML service not running")
+
+            # Page through the matches one at a time, by whole word and by prefix, in both orders
+            for q, sort in ((word, "rank"), (word[:6], "rank"), (word, "newest")):
+                seen = []
+                ranks = []
+                cursor = None
+                while True:
+                    params = {"q": q, "sort": sort, "limit": 1, "fields": "feedback"}
+                    if cursor:
+                        params["cursor"] = cursor
+                    r_page = requests.get(f"{BASE_URL}/feedbacks/search", params=params)
+                    self.assertEqual(r_page.status_code, 200)
+                    page = r_page.json()
+                    for fb in page['feedbacks']:
+                        self.assertEqual(set(fb), {"id", "created_at", "feedback", "rank"})
+                    seen.extend(fb['id'] for fb in page['feedbacks'])
+                    ranks.extend(fb['rank'] for fb in page['feedbacks'])
+                    cursor = page['next_cursor']
+                    if not cursor:
+                        break
+                self.assertEqual(sorted(seen), sorted(created_ids))
+                if sort == "rank":
+                    self.assertEqual(ranks, sorted(ranks, reverse=True))
+                else:
+                    self.assertEqual(seen, [fb['id'] for fb in reversed(created)])
+
+            # Two words must both match; filters apply
+            both = requests.get(f"{BASE_URL}/feedbacks/search", params={"q": f"{word} طويل"}).json()
+            self.assertEqual([fb['id'] for fb in both['feedbacks']], [created[1]['id']])
+            filtered = requests.get(f"{BASE_URL}/feedbacks/search",
+                                    params={"q": word, "sentiment": created[0]['sentiment']}).json()
+            self.assertIn(created[0]['id'], [fb['id'] for fb in filtered['feedbacks']])
+            self.assertTrue(all(fb['sentiment'] == created[0]['sentiment'] for fb in filtered['feedbacks']))
+
+            self.assertEqual(requests.get(f"{BASE_URL}/feedbacks/search", params={"q": "   "}).status_code, 400)
+            self.assertEqual(requests.get(f"{BASE_URL}/feedbacks/search",
+                                          params={"q": word, "sort": "oldest"}).status_code, 400)
+            self.assertEqual(requests.get(f"{BASE_URL}/feedbacks/search",
+                                          params={"q": word, "cursor": "bogus"}).status_code, 400)
+        finally:
+            for fb in created:
+                requests.delete(f"{BASE_URL}/feedbacks/{fb['id']}")
+
+    def test_14_terms(self):
+        print("\nTesting Term Counts...")
+        user_id = requests.post(f"{BASE_URL}/users/register", json={"role": "anonymous"}).json()['user_id']
+        word = "".join(random.choice("بتثجحخدذرزسشصضطظعغفقكلمن") for _ in range(10))
+        phrases = "يا للاسف,لا يعجبني,للاسف,لا"
+
+        def counts(kind, terms):
+            response = requests.get(f"{BASE_URL}/feedbacks/terms",
+                                    params={"kind": kind, "days": 1, "term": terms, "limit": 200})
+            self.assertEqual(response.status_code, 200)
+            return {t['term']: t['feedbacks'] for t in response.json()['terms']}
+
+        before = counts("negation", phrases)
+        created = [requests.post(f"{BASE_URL}/feedbacks",
+                                 json={"feedback": f"يا للأسف {word} لا يعجبني", "user_id": user_id}).json()
+                   for _ in range(2)]
+        try:
+            if any(fb.get('sentiment') is None for fb in created):
+                self.skipTest("ML service not running")
+            self.assertEqual(counts("word", word), {word: 2})
+            # Counted as NegationMatcher matches them: longest keyword first, no overlaps
+            after = counts("negation", phrases)
+            self.assertEqual(after.get("يا للاسف", 0), before.get("يا للاسف", 0) + 2)
+            self.assertEqual(after.get("لا يعجبني", 0), before.get("لا يعجبني", 0) + 2)
+            self.assertEqual(after.get("للاسف", 0), before.get("للاسف", 0))
+            self.assertEqual(after.get("لا", 0), before.get("لا", 0))
+
+            requests.put(f"{BASE_URL}/feedbacks/{created[0]['id']}", json={"feedback": "الخدمة ممتازة"})
+            self.assertEqual(counts("word", word), {word: 1})
+            requests.delete(f"{BASE_URL}/feedbacks/{created[1]['id']}")
+            self.assertEqual(counts("word", word), {})
+            self.assertEqual(counts("negation", phrases), before)
+
+            top = requests.get(f"{BASE_URL}/feedbacks/terms", params={"kind": "negation", "limit": 5}).json()
+            self.assertLessEqual(len(top['terms']), 5)
+            self.assertEqual([t['feedbacks'] for t in top['terms']],
+                             sorted((t['feedbacks'] for t in top['terms']), reverse=True))
+            for t in top['terms']:
+                self.assertEqual(sum(t['by_sentiment'].values()), t['feedbacks'])
+            self.assertEqual(requests.get(f"{BASE_URL}/feedbacks/terms", params={"kind": "x"}).status_code, 400)
+            offset = requests.get(f"{BASE_URL}/feedbacks/terms",
+                                  params={"kind": "negation", "from": "2026-10-01T00:00:00+02:00",
+                                          "to": "2026-10-02T00:00:00+02:00"})
+            self.assertEqual(offset.status_code, 200)
+        finally:
+            for fb in created:
+                requests.delete(f"{BASE_URL}/feedbacks/{fb['id']}")
+
 if __name__ == '__main__':
     # Ensure server is running or wait a bit if we just started it
     try:
@@ -0,0 +1,132 @@
+import unittest
+
+import requests
+
+from ml_client import CircuitBreaker, CircuitOpen, MLClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """
+    Answers each request with the next of `outcomes`: a status code, or an
+    exception to raise.
+    """
+    def __init__(self):
+        self.outcomes = []
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return FakeResponse(outcome, {"sentiment": "Positive", "model_version": "v1"})
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = MLClient("http://ml/predict", "http://ml/predict/batch", "http://ml/health",
+                               breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=self.clock))
+        self.session = self.client.session = FakeSession()
+
+    def call(self):
+        return self.client.predict("نص")
+
+    def open_breaker(self):
+        self.session.outcomes = [requests.ConnectionError("down"), 503]
+        for _ in range(2):
+            with self.assertRaises(requests.RequestException):
+                self.call()
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.OPEN)
+
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        self.session.outcomes = [requests.Timeout("slow"), 200, requests.Timeout("slow")]
+        for expected in (requests.Timeout, None, requests.Timeout):
+            if expected:
+                with self.assertRaises(expected):
+                    self.call()
+            else:
+                self.call()
+        # A success in between resets the count
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.CLOSED)
+
+        self.session.outcomes = [requests.Timeout("slow")]
+        with self.assertRaises(requests.Timeout):
+            self.call()
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.OPEN)
+        calls = self.session.calls
+        with self.assertRaises(CircuitOpen):
+            self.call()
+        self.assertEqual(self.session.calls, calls)
+
+    def test_client_errors_do_not_count(self):
+        self.session.outcomes = [400, 404, 422]
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                self.call()
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_successful_trial_closes(self):
+        self.open_breaker()
+        self.clock.now = 29
+        with self.assertRaises(CircuitOpen):
+            self.call()
+        self.clock.now = 30
+        self.session.outcomes = [200]
+        self.assertEqual(self.call()["sentiment"], "Positive")
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        self.open_breaker()
+        self.clock.now = 30
+        self.session.outcomes = [502]
+        with self.assertRaises(requests.HTTPError):
+            self.call()
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.OPEN)
+        self.clock.now = 59
+        with self.assertRaises(CircuitOpen):
+            self.call()
+
+    def test_only_one_trial_at_a_time(self):
+        self.open_breaker()
+        self.clock.now = 30
+        self.client.breaker.allow()
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpen):
+            self.call()
+
+    def test_trial_ended_by_another_error_lets_the_next_call_through(self):
+        self.open_breaker()
+        self.clock.now = 30
+        self.session.outcomes = [RuntimeError("bug"), 200]
+        with self.assertRaises(RuntimeError):
+            self.call()
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.call()
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import datetime
+import unittest
+
+from partitions import add_months, is_missing_partition, partition_month
+
+
+class TestPartitionMonths(unittest.TestCase):
+
+    def test_add_months(self):
+        self.assertEqual(add_months(datetime.date(2026, 10, 1), 3), datetime.date(2027, 1, 1))
+        self.assertEqual(add_months(datetime.date(2026, 1, 1), -1), datetime.date(2025, 12, 1))
+        self.assertEqual(add_months(datetime.date(2026, 12, 1), -24), datetime.date(2024, 12, 1))
+
+    def test_partition_month(self):
+        self.assertEqual(partition_month("feedbacks_p2025_03"), datetime.date(2025, 3, 1))
+        for name in ("feedbacks", "feedbacks_p2025_3", "feedbacks_p2025_03; DROP TABLE users"):
+            with self.assertRaises(ValueError):
+                partition_month(name)
+
+
+class FakeError(Exception):
+    def __init__(self, pgcode, message):
+        super().__init__(message)
+        self.pgcode = pgcode
+
+
+class TestMissingPartition(unittest.TestCase):
+
+    def test_is_missing_partition(self):
+        self.assertTrue(is_missing_partition(FakeError("23514", 'no partition of relation "feedbacks" found for row')))
+        self.assertFalse(is_missing_partition(FakeError("23514", 'violates check constraint "c"')))
+        self.assertFalse(is_missing_partition(FakeError("23505", "duplicate key value")))
+        self.assertFalse(is_missing_partition(ValueError("no partition of relation")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import re
+import unittest
+
+from ml_service_support import ml_service_utils
+from text_hash import clean_text
+
+MIGRATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations", "0008_feedback_terms.sql")
+
+
+def migration_values(table):
+    """
+    The strings inserted into `table` by the term counts migration.
+    """
+    with open(MIGRATION, encoding="utf-8") as f:
+        sql = f.read()
+    match = re.search(rf"INSERT INTO {table} \(\w+\) VALUES(.*?)ON CONFLICT", sql, re.S)
+    return re.findall(r"\('([^']*)'\)", match.group(1))
+
+
+class TestTermLists(unittest.TestCase):
+
+    def test_keywords_match_ml_service(self):
+        ml_utils = ml_service_utils()
+        if ml_utils is None:
+            self.skipTest("ml_service not checked out next to main_service")
+        keywords = migration_values("feedback_negation_keywords")
+        self.assertEqual(len(keywords), len(set(keywords)))
+        self.assertEqual(set(keywords), set(ml_utils.NegationMatcher(ml_utils.ARABIC_NEGATIVE_KEYWORDS).keywords))
+
+    def test_stopwords_are_normalized(self):
+        stopwords = migration_values("feedback_term_stopwords")
+        self.assertTrue(stopwords)
+        for word in stopwords:
+            self.assertEqual(clean_text(word), word)
+            self.assertEqual(word.split(), [word])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from ml_service_support import ml_service_utils
+from text_hash import clean_text, text_hash
+
+SAMPLES = [
+    "الخدمة ممتازة",
+    "الخدمةُ مُمتازةٌ جداً!!",
+    "  إنتظار طويل  في المكتب، لم يرد أحد ",
+    "مستشفى آمن و مؤسسة ناجحة",
+    "ﻻ ﺃﺣﺐ هذا",
+    "خدمة سيئة 😡 123 abc",
+    "ٱلسلام عليكم\tو\nرحمة",
+    "Great service",
+    "",
+]
+
+
+class TestTextHash(unittest.TestCase):
+
+    def test_matches_ml_service_clean_text(self):
+        ml_utils = ml_service_utils()
+        if ml_utils is None:
+            self.skipTest("ml_service not checked out next to main_service")
+        texts = SAMPLES + ["".join(chr(c) for c in range(start, start + 64)) for start in range(0, 0x10000, 64)]
+        for text in texts:
+            self.assertEqual(clean_text(text), ml_utils.clean_text(text), repr(text))
+
+    def test_equal_after_cleaning(self):
+        self.assertEqual(text_hash("الخدمة ممتازة"), text_hash("الخدمةُ مُمتازةٌ!! "))
+        self.assertNotEqual(text_hash("الخدمة ممتازة"), text_hash("الخدمة سيئة"))
+
+    def test_no_hash_without_arabic(self):
+        self.assertIsNone(text_hash("Great service"))
+        self.assertIsNone(text_hash(""))
+        self.assertIsNone(text_hash(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Normalized-text hashes for reusing predictions across identical feedbacks.
+
+The ML service's prediction of an Arabic text depends on clean_text(text),
+the model version and the negation keyword set it matches (which
+/negation/reload and NEGATION_KEYWORDS_FILE change without a new model
+version). Feedbacks whose cleaned texts are equal therefore get the same
+sentiment, confidence, cleaned/processed text and negation flag from the
+same model version and keyword set, and predictions are only reused when
+both match (scoring.reusable_scores). The normalization below is a copy of
+ml_service/utils.clean_text (the services are deployed separately);
+test_text_hash.py checks that the two agree.
+"""
+import hashlib
+
+# Character ranges kept by clean_text; everything else except whitespace is dropped.
+_ALLOWED_RANGES = (
+    (0x0600, 0x06FF),  # Arabic
+    (0x0750, 0x077F),  # Arabic Supplement
+    (0xFB50, 0xFDFF),  # Arabic Presentation Forms-A
+    (0xFE70, 0xFEFF),  # Arabic Presentation Forms-B
+)
+
+# Letter folding applied by clean_text
+_FOLDED = {
+    "إ": "ا", "أ": "ا", "آ": "ا",
+    "ى": "ي",
+    "ؤ": "ء", "ئ": "ء",
+    "ة": "ه",
+}
+
+
+def _normalize_char(codepoint):
+    if 0x064B <= codepoint <= 0x065F or codepoint == 0x0670:
+        return None  # diacritics
+    char = chr(codepoint)
+    if char in _FOLDED:
+        return _FOLDED[char]
+    if char.isspace() or any(low <= codepoint <= high for low, high in _ALLOWED_RANGES):
+        return codepoint
+    return None
+
+
+class _NormalizeTable(dict):
+    def __missing__(self, codepoint):
+        value = self[codepoint] = _normalize_char(codepoint)
+        return value
+
+
+_NORMALIZE_TABLE = _NormalizeTable()
+
+
+def clean_text(text):
+    """
+    Same result as ml_service's utils.clean_text.
+    """
+    return str(text).translate(_NORMALIZE_TABLE).strip()
+
+
+def contains_arabic(text):
+    return any("\u0600" <= char <= "\u06ff" for char in text)
+
+
+def text_hash(text):
+    """
+    Hex SHA-256 of the cleaned text, or None for texts the ML service does
+    not run through the model (no Arabic characters); those are answered
+    with the raw text echoed back, so their results cannot be shared.
+    """
+    if not isinstance(text, str) or not contains_arabic(text):
+        return None
+    return hashlib.sha256(clean_text(text).encode("utf-8")).hexdigest()
@@ -1,18 +1,65 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from predict import ModelWrapper
 from train import train_model
+from utils import (load_extra_keywords, negation_matcher, publish_keyword_file, reset_keyword_file,
+                   NEGATION_KEYWORDS_FILE)
+from model_store import publish_version, prune_versions
+from metrics import REQUESTS, REQUEST_SECONDS, server_timing_header, render
 import threading
+import time
+import os
 
 app = Flask(__name__)
 
+# Micro-batching: concurrent /predict calls are grouped into one forward pass.
+# A request waits at most PREDICT_MAX_WAIT_MS for others to join its batch.
+# Setting PREDICT_MAX_BATCH_SIZE to 1 disables batching.
+PREDICT_MAX_BATCH_SIZE = int(os.getenv('PREDICT_MAX_BATCH_SIZE', '16'))
+PREDICT_MAX_WAIT_MS = float(os.getenv('PREDICT_MAX_WAIT_MS', '10'))
+
+# Prediction cache bounds; PREDICT_CACHE_MAX_ENTRIES=0 disables the cache.
+PREDICT_CACHE_MAX_ENTRIES = int(os.getenv('PREDICT_CACHE_MAX_ENTRIES', '10000'))
+PREDICT_CACHE_MAX_MB = float(os.getenv('PREDICT_CACHE_MAX_MB', '64'))
+
+# Number of trained model versions kept on disk (the served one is always kept)
+MODEL_KEEP_VERSIONS = int(os.getenv('MODEL_KEEP_VERSIONS', '3'))
+
+# How often (seconds) each process checks whether CURRENT points to a new model
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', '10'))
+
+# /predict/batch limits: items accepted per request and rows per forward pass.
+PREDICT_BATCH_MAX_ITEMS = int(os.getenv('PREDICT_BATCH_MAX_ITEMS', '1000'))
+PREDICT_BATCH_CHUNK_SIZE = int(os.getenv('PREDICT_BATCH_CHUNK_SIZE', '32'))
+
 # Initialize model wrapper
 # We won't load the model immediately if it doesn't exist yet (first run)
 model_wrapper = ModelWrapper()
+if PREDICT_MAX_BATCH_SIZE > 1:
+    model_wrapper.enable_batching(PREDICT_MAX_BATCH_SIZE, PREDICT_MAX_WAIT_MS)
+if PREDICT_CACHE_MAX_ENTRIES > 0:
+    model_wrapper.enable_cache(PREDICT_CACHE_MAX_ENTRIES, int(PREDICT_CACHE_MAX_MB * 1024 * 1024))
 if model_wrapper.load_model():
     print("Model loaded at startup.")
 else:
     print("Model not found at startup. Please train first.")
 
+# A keyword file posted to /negation/reload is matched until the next restart,
+# which starts from NEGATION_KEYWORDS_FILE again
+reset_keyword_file()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unknown"
+    REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+    return response
+
 @app.route('/predict', methods=['POST'])
 def predict():
     data = request.get_json()
@@ -20,21 +67,56 @@ def predict():
         return jsonify({"error": "No text provided"}), 400
 
     text = data['text']
-    result = model_wrapper.predict(text)
-    print(result)
+    timings = {}
+    result = model_wrapper.predict(text, timings=timings)
     if result is None:
         return jsonify({"error": "Model not loaded. Please train the model first."}), 503
 
-    return jsonify(result)
+    response = jsonify(result)
+    response.headers['Server-Timing'] = server_timing_header(timings)
+    return response
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    data = request.get_json()
+    if not data or not isinstance(data.get('texts'), list):
+        return jsonify({"error": "'texts' must be a list"}), 400
+
+    texts = data['texts']
+    if len(texts) > PREDICT_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Too many texts, at most {PREDICT_BATCH_MAX_ITEMS} per request"}), 413
+
+    valid = [(i, t) for i, t in enumerate(texts) if isinstance(t, str)]
+    timings = {}
+    predictions = model_wrapper.predict_batch([t for _, t in valid], chunk_size=PREDICT_BATCH_CHUNK_SIZE,
+                                              timings=timings)
+    if predictions is None:
+        return jsonify({"error": "Model not loaded. Please train the model first."}), 503
+
+    results = [{"error": "text must be a string"}] * len(texts)
+    for (index, _), prediction in zip(valid, predictions):
+        results[index] = prediction
+
+    response = jsonify({"results": results})
+    response.headers['Server-Timing'] = server_timing_header(timings)
+    return response
 
 def run_training_background(dataset_path):
     # This logic assumes we want to train in background and then reload the model
-    success, metrics = train_model(dataset_path)
-    if success:
-        print("Training completed successfully. Reloading model...")
-        model_wrapper.load_model()
-    else:
+    success, metrics = train_model(dataset_path, output_dir=model_wrapper.model_path)
+    if not success:
         print(f"Training failed: {metrics}")
+        return
+
+    version = metrics["model_version"]
+    print(f"Training completed successfully. Loading model {version}...")
+    # The new version is loaded and warmed while the old one keeps serving;
+    # CURRENT only moves once the swap has succeeded.
+    if model_wrapper.load_model(version):
+        publish_version(model_wrapper.model_path, version)
+        prune_versions(model_wrapper.model_path, keep=MODEL_KEEP_VERSIONS)
+    else:
+        print(f"Model {version} failed to load, still serving {model_wrapper.model_version}")
 
 @app.route('/train', methods=['POST'])
 def train():
@@ -49,9 +131,60 @@ def train():
     
     return jsonify({"message": "Training started in background", "dataset": dataset_path})
 
+@app.route('/negation/reload', methods=['POST'])
+def reload_negation_keywords():
+    data = request.get_json(silent=True) or {}
+    path = data.get('path', NEGATION_KEYWORDS_FILE)
+    if not path:
+        return jsonify({"error": "No keyword file given and NEGATION_KEYWORDS_FILE is not set"}), 400
+
+    try:
+        count = load_extra_keywords(path)
+        # The other workers load it on their next watch cycle
+        publish_keyword_file(path)
+    except OSError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": "Negation keywords reloaded", "path": path, "keywords": count,
+                    "negation_keywords": negation_matcher().fingerprint})
+
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"status": "ok", "model_loaded": model_wrapper.model is not None})
+    return jsonify({
+        "status": "ok",
+        "model_loaded": model_wrapper.model is not None,
+        "model_version": model_wrapper.model_version,
+        "negation_keywords": negation_matcher().fingerprint,
+        "backend": model_wrapper.backend
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = render()
+    return Response(body, content_type=content_type)
+
+@app.route('/metrics/batching', methods=['GET'])
+def batching_metrics():
+    padding = model_wrapper.padding_stats.snapshot()
+    if model_wrapper.batcher is None:
+        return jsonify({"enabled": False, "padding": padding})
+    stats = model_wrapper.batcher.stats.snapshot()
+    stats.update({
+        "enabled": True,
+        "max_batch_size": model_wrapper.batcher.max_batch_size,
+        "max_wait_ms": model_wrapper.batcher.max_wait * 1000,
+        "padding": padding,
+    })
+    return jsonify(stats)
+
+@app.route('/metrics/cache', methods=['GET'])
+def cache_metrics():
+    if model_wrapper.cache is None:
+        return jsonify({"enabled": False})
+    stats = model_wrapper.cache.stats()
+    stats.update({"enabled": True, "model_version": model_wrapper.model_version})
+    return jsonify(stats)
 
 if __name__ == '__main__':
+    # Development server; see gunicorn.conf.py for the multi-worker production mode
+    model_wrapper.start_version_watcher(MODEL_WATCH_INTERVAL)
     app.run(host='0.0.0.0', port=5001)
@@ -0,0 +1,180 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+
+class _PendingRequest:
+    __slots__ = ("item", "enqueued_at", "event", "result", "error")
+
+    def __init__(self, item):
+        self.item = item
+        self.enqueued_at = time.perf_counter()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchStats:
+    """
+    Running counters for the batcher: how big the batches are and how long
+    requests wait in the queue before their batch starts.
+    """
+    def __init__(self, window=1024):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = {}
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self._recent_waits = deque(maxlen=window)
+
+    def record(self, batch_size, queue_waits):
+        with self._lock:
+            self.batches += 1
+            self.items += batch_size
+            self.batch_sizes[batch_size] = self.batch_sizes.get(batch_size, 0) + 1
+            for wait in queue_waits:
+                self.queue_wait_total += wait
+                self.queue_wait_max = max(self.queue_wait_max, wait)
+                self._recent_waits.append(wait)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent_waits)
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+                "queue_wait_ms": {
+                    "avg": 1000 * self.queue_wait_total / self.items if self.items else 0.0,
+                    "max": 1000 * self.queue_wait_max,
+                    "p50": 1000 * _percentile(recent, 0.50),
+                    "p95": 1000 * _percentile(recent, 0.95),
+                },
+            }
+
+
+class PaddingStats:
+    """
+    Padding efficiency of model batches: real tokens / padded tokens.
+    """
+    def __init__(self, window=1024):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self._recent = deque(maxlen=window)
+
+    def record(self, real_tokens, padded_tokens):
+        with self._lock:
+            self.batches += 1
+            self.real_tokens += real_tokens
+            self.padded_tokens += padded_tokens
+            self._recent.append(real_tokens / padded_tokens if padded_tokens else 1.0)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            return {
+                "batches": self.batches,
+                "real_tokens": self.real_tokens,
+                "padded_tokens": self.padded_tokens,
+                "efficiency": self.real_tokens / self.padded_tokens if self.padded_tokens else 1.0,
+                "batch_efficiency": {
+                    "last": self._recent[-1] if self._recent else 1.0,
+                    "p5": _percentile(recent, 0.05) if recent else 1.0,
+                    "p50": _percentile(recent, 0.50) if recent else 1.0,
+                },
+            }
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item requests into one call of `process_batch`.
+
+    The worker takes the first queued request, then keeps collecting until
+    either `max_batch_size` items are queued or `max_wait_ms` has passed since
+    that first request arrived. `process_batch` receives the list of items and
+    must return one result per item, in the same order; otherwise every
+    caller of the batch gets a RuntimeError.
+    """
+    def __init__(self, process_batch, max_batch_size=16, max_wait_ms=10):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.stats = BatchStats()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def submit(self, item):
+        """
+        Queues one item and blocks until its batch has been processed.
+        """
+        self._ensure_worker()
+        pending = _PendingRequest(item)
+        self._queue.put(pending)
+        pending.event.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so a worker started in a parent process
+        # is restarted the first time a forked child submits.
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+                return
+            if self._worker_pid != pid:
+                self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name="predict-batcher", daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self.stats.record(len(batch), [started - p.enqueued_at for p in batch])
+            try:
+                results = list(self.process_batch([p.item for p in batch]))
+                # A short list would hand the callers past its end None
+                if len(results) != len(batch):
+                    raise RuntimeError(f"process_batch returned {len(results)} results for {len(batch)} items")
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.event.set()
@@ -0,0 +1,72 @@
+"""
+Memory use of ML service processes, read from /proc/<pid>/smaps_rollup.
+
+Pass the pid of `python app.py` for the single-process baseline, or of the
+gunicorn master to list the master and every worker. Optionally sends some
+prediction requests first so the workers have touched the model.
+
+    python bench_memory.py --pid $(pgrep -f 'gunicorn.*app:app' | head -1) --warm-url http://localhost:5001
+"""
+import argparse
+import os
+
+
+def read_rollup(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[-1] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+    }
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def warm(url, requests_per_worker, workers):
+    import requests
+
+    texts = ["الخدمه ممتازه", "لا يوجد اي تعاون من الموظفين", "الانتظار طويل جدا"]
+    for i in range(requests_per_worker * max(1, workers)):
+        requests.post(f"{url}/predict", json={"text": texts[i % len(texts)]}, timeout=30)
+
+
+def mb(value):
+    return f"{value / (1024 * 1024):>9.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pid', type=int, required=True, help="Single process or gunicorn master pid")
+    parser.add_argument('--warm-url', help="Base URL to send warm-up predictions to first")
+    parser.add_argument('--warm-requests', type=int, default=20, help="Warm-up requests per worker")
+    args = parser.parse_args()
+
+    workers = children(args.pid)
+    if args.warm_url:
+        warm(args.warm_url, args.warm_requests, len(workers))
+
+    print(f"{'process':<16}{'RSS MB':>9}{'PSS MB':>9}{'USS MB':>9}{'shared MB':>10}")
+    total_pss = 0
+    for label, pid in [("master" if workers else "single", args.pid)] + [(f"worker {p}", p) for p in workers]:
+        usage = read_rollup(pid)
+        total_pss += usage["pss"]
+        print(f"{label:<16}{mb(usage['rss'])}{mb(usage['pss'])}{mb(usage['uss'])} {mb(usage['shared'])}")
+    print(f"\ntotal PSS (actual memory charged to these processes): {mb(total_pss).strip()} MB")
+
+
+if __name__ == '__main__':
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("bench_memory.py needs Linux /proc/<pid>/smaps_rollup")
+    main()
@@ -0,0 +1,48 @@
+"""
+Microbenchmark: single-pass clean_text vs. the original chained re.sub version.
+
+    python bench_normalizer.py --size 100000
+"""
+import argparse
+import timeit
+
+from test_utils import build_corpus, legacy_clean_text
+from utils import clean_text, clean_texts
+
+
+def bench(label, fn, repeat):
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f"{label:<36}{best * 1000:>10.1f} ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=100000, help="Number of strings in the corpus")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = build_corpus(size=args.size)
+    chars = sum(len(t) for t in corpus)
+    print(f"{len(corpus)} strings, {chars} characters, best of {args.repeat}\n")
+
+    legacy = bench("legacy re.sub (list)", lambda: [legacy_clean_text(t) for t in corpus], args.repeat)
+    single = bench("single pass clean_texts (list)", lambda: clean_texts(corpus), args.repeat)
+
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    if pd is not None:
+        series = pd.Series(corpus)
+        legacy_series = bench("legacy re.sub (Series.apply)", lambda: series.apply(legacy_clean_text), args.repeat)
+        single_series = bench("single pass clean_texts (Series)", lambda: clean_texts(series), args.repeat)
+
+    print(f"\nspeedup (list):   {legacy / single:.1f}x")
+    if pd is not None:
+        print(f"speedup (Series): {legacy_series / single_series:.1f}x")
+    assert clean_texts(corpus) == [legacy_clean_text(t) for t in corpus]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Accuracy vs. latency comparison of the ModelWrapper inference backends.
+
+Runs every backend over the same labelled CSV (columns `text` and `label`,
+as in the training dataset) and reports accuracy, batch latency and how many
+Positive/Negative decisions differ from the fp32 PyTorch reference. Exits with
+status 1 if any backend flips more decisions than `--tolerance` allows.
+
+    python compare_backends.py --data arabic_twitter_dataset.csv --holdout
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from inference import BACKENDS
+from predict import ModelWrapper
+from utils import clean_texts
+
+
+def load_dataset(path, holdout, limit):
+    df = pd.read_csv(path)
+    df = df[df['label'].isin(['positive', 'negative'])]
+    if holdout:
+        # Reproduce the test split used by train.train_model
+        df['clean_text'] = clean_texts(df['text'])
+        df = df[df['clean_text'].str.len() > 2]
+        _, df = train_test_split(df, test_size=0.2, random_state=42, stratify=df['label'])
+    if limit:
+        df = df.head(limit)
+    labels = ["Positive" if label == 'positive' else "Negative" for label in df['label']]
+    return df['text'].astype(str).tolist(), labels
+
+
+def run_backend(model_path, backend, texts, batch_size):
+    wrapper = ModelWrapper(model_path, backend=backend)
+    if not wrapper.load_model():
+        raise RuntimeError(f"Could not load model for backend '{backend}'")
+
+    # Warm up so one-time allocations are not counted
+    wrapper.predict_batch(texts[:batch_size], chunk_size=batch_size)
+
+    predictions = []
+    latencies = []
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        started = time.perf_counter()
+        predictions.extend(wrapper.predict_batch(chunk, chunk_size=batch_size))
+        latencies.append(time.perf_counter() - started)
+    return predictions, latencies
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data', required=True, help="CSV with 'text' and 'label' columns")
+    parser.add_argument('--model-path', default='my_gov_model')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--limit', type=int, default=0, help="Only use the first N rows")
+    parser.add_argument('--holdout', action='store_true', help="Use the train.py test split of --data")
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help="Max fraction of decisions allowed to differ from fp32 torch")
+    args = parser.parse_args()
+
+    texts, labels = load_dataset(args.data, args.holdout, args.limit)
+    print(f"Comparing {len(args.backends)} backends on {len(texts)} rows\n")
+
+    reference = None
+    if 'torch' not in args.backends:
+        reference, _ = run_backend(args.model_path, 'torch', texts, args.batch_size)
+
+    failed = False
+    header = f"{'backend':<12}{'accuracy':>10}{'flips':>8}{'max|dconf|':>12}{'p50 ms':>10}{'p95 ms':>10}{'ms/item':>10}"
+    print(header)
+    print("-" * len(header))
+    for backend in sorted(args.backends, key=lambda b: b != 'torch'):
+        predictions, latencies = run_backend(args.model_path, backend, texts, args.batch_size)
+        if backend == 'torch':
+            reference = predictions
+
+        decisions = [p['sentiment'] for p in predictions]
+        accuracy = sum(d == l for d, l in zip(decisions, labels)) / len(labels)
+        flips = sum(p['sentiment'] != r['sentiment'] for p, r in zip(predictions, reference))
+        max_conf_delta = max(abs(p['confidence'] - r['confidence']) for p, r in zip(predictions, reference))
+        per_item = 1000 * sum(latencies) / len(texts)
+
+        print(f"{backend:<12}{accuracy:>10.4f}{flips:>8}{max_conf_delta:>12.4f}"
+              f"{1000 * percentile(latencies, 0.5):>10.1f}{1000 * percentile(latencies, 0.95):>10.1f}{per_item:>10.2f}")
+
+        if flips / len(texts) > args.tolerance:
+            failed = True
+            print(f"  {backend}: {flips} decisions differ from fp32 torch, above tolerance {args.tolerance:.2%}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
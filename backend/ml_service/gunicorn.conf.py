@@ -0,0 +1,65 @@
+"""
+Production serving for the ML service: gunicorn -c gunicorn.conf.py app:app
+
+The master process imports app.py once (preload_app), which loads and warms
+the model, then forks ML_WORKERS workers. The workers only read the model
+weights, so their pages stay shared copy-on-write with the master instead of
+every worker holding its own copy.
+"""
+import gc
+import os
+import shutil
+
+import torch
+
+
+def _available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('ML_PORT', '5001')}"
+workers = int(os.getenv("ML_WORKERS", "2"))
+# Request threads per worker; concurrent requests are what the micro-batcher groups
+worker_class = "gthread"
+threads = int(os.getenv("ML_WORKER_THREADS", "8"))
+preload_app = True
+timeout = 120
+
+# Each worker writes its Prometheus metrics to files in this directory and
+# /metrics aggregates them. It must be set before app.py (and with it
+# prometheus_client) is imported, and is emptied on every start.
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/ml_service_metrics")
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir, exist_ok=True)
+
+# Intra-op threads per worker so that workers x torch threads matches the cores
+torch_threads = int(os.getenv("ML_TORCH_THREADS", "0")) or max(1, _available_cores() // workers)
+
+# The master only loads and warms the model. Keeping it single threaded means
+# no OpenMP thread pool exists yet when the workers are forked, which is not
+# fork safe.
+torch.set_num_threads(1)
+
+
+def when_ready(server):
+    # Move everything allocated while loading the app into the permanent
+    # generation, so the garbage collector in the workers does not touch
+    # (and thereby copy) those pages.
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Model preloaded, forking {workers} workers with {torch_threads} torch threads each")
+
+
+def post_fork(server, worker):
+    torch.set_num_threads(torch_threads)
+
+    from app import model_wrapper, MODEL_WATCH_INTERVAL
+    model_wrapper.start_version_watcher(MODEL_WATCH_INTERVAL)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,119 @@
+import inspect
+import os
+
+import torch
+from transformers import AutoModelForSequenceClassification
+
+# Selectable CPU inference backends for ModelWrapper:
+#   torch       - the saved fp32 PyTorch model (default)
+#   torch_int8  - PyTorch dynamic int8 quantization of the Linear layers
+#   onnx        - the model exported to ONNX and run through onnxruntime
+BACKENDS = ("torch", "torch_int8", "onnx")
+
+ONNX_FILENAME = "model.onnx"
+ONNX_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+class TorchRunner:
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def __call__(self, inputs):
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            return self.model(**inputs).logits
+
+
+class OnnxRunner:
+    device = "cpu"
+
+    def __init__(self, session):
+        self.session = session
+        self.input_names = [i.name for i in session.get_inputs()]
+
+    def __call__(self, inputs):
+        feed = {name: inputs[name].numpy() for name in self.input_names}
+        logits = self.session.run(["logits"], feed)[0]
+        return torch.from_numpy(logits)
+
+
+class _LogitsOnly(torch.nn.Module):
+    """
+    Wraps a sequence classification model so the exported graph has plain
+    tensor inputs and a single `logits` output.
+    """
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                          token_type_ids=token_type_ids).logits
+
+
+def export_onnx(model_path, onnx_path):
+    """
+    Exports the fp32 model in `model_path` to `onnx_path` with dynamic batch
+    and sequence axes.
+    """
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    dummy = tuple(torch.ones((1, 8), dtype=torch.long) for _ in ONNX_INPUT_NAMES)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ONNX_INPUT_NAMES}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    kwargs = {}
+    # Newer torch versions default to the dynamo exporter; keep the
+    # TorchScript based one, which handles the BERT graph without extra deps.
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+
+    tmp_path = onnx_path + ".tmp"
+    torch.onnx.export(
+        _LogitsOnly(model), dummy, tmp_path,
+        input_names=list(ONNX_INPUT_NAMES), output_names=["logits"],
+        dynamic_axes=dynamic_axes, opset_version=17, **kwargs
+    )
+    os.replace(tmp_path, onnx_path)
+
+
+def _onnx_is_stale(model_path, onnx_path):
+    if not os.path.exists(onnx_path):
+        return True
+    onnx_mtime = os.path.getmtime(onnx_path)
+    for name in ("model.safetensors", "pytorch_model.bin", "config.json"):
+        weights = os.path.join(model_path, name)
+        if os.path.exists(weights) and os.path.getmtime(weights) > onnx_mtime:
+            return True
+    return False
+
+
+def load_runner(model_path, backend, device):
+    """
+    Builds or loads the artifact for `backend` from `model_path` and returns
+    a callable mapping tokenizer outputs (torch tensors) to logits.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'. Expected one of {BACKENDS}")
+
+    if backend == "onnx":
+        import onnxruntime
+
+        onnx_path = os.path.join(model_path, ONNX_FILENAME)
+        if _onnx_is_stale(model_path, onnx_path):
+            print(f"Exporting ONNX model to {onnx_path}...")
+            export_onnx(model_path, onnx_path)
+        session = onnxruntime.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        return OnnxRunner(session)
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    if backend == "torch_int8":
+        # Dynamic quantization only runs on CPU and is quick to apply, so it is
+        # built from the fp32 weights on every load instead of being stored.
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return TorchRunner(model, "cpu")
+
+    model.to(device)
+    return TorchRunner(model, device)
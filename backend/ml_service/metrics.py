@@ -0,0 +1,68 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+# Stages of a prediction, in order: clean_text, negation (keyword matching and
+# the negation feature), queue (waiting for a micro-batch), tokenize, forward
+# (the model itself) and postprocess (softmax/argmax). tokenize is observed
+# once per call into the model, forward and postprocess once per model batch.
+STAGE_SECONDS = Histogram(
+    "ml_predict_stage_seconds", "Time spent in each stage of a prediction", ["stage"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+INPUT_TOKENS = Histogram(
+    "ml_input_tokens", "Tokenized length of each text sent to the model",
+    buckets=(4, 8, 16, 24, 32, 48, 64, 96, 128)
+)
+BATCH_SIZE = Histogram(
+    "ml_forward_batch_size", "Texts per model forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+REQUESTS = Counter("ml_http_requests_total", "HTTP requests handled", ["endpoint", "method", "status"])
+REQUEST_SECONDS = Histogram(
+    "ml_http_request_duration_seconds", "HTTP request latency", ["endpoint"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+
+def record_stage(stage, seconds, timings=None):
+    """
+    Observes `seconds` for `stage` and adds it to the per-request `timings`
+    dict when one is given.
+    """
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage, timings=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started, timings)
+
+
+def server_timing_header(timings):
+    """
+    Formats stage timings (seconds) as a Server-Timing header value.
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+
+def render():
+    """
+    Returns (body, content type) for the /metrics endpoint. Under gunicorn the
+    workers write their metrics to PROMETHEUS_MULTIPROC_DIR and they are
+    aggregated here, so any worker can answer a scrape.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
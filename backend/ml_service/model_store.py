@@ -0,0 +1,86 @@
+import datetime
+import os
+import shutil
+
+# Layout of the model directory (default "my_gov_model"):
+#
+#   my_gov_model/
+#     versions/20260101-120000/   one directory per trained model
+#     versions/20260108-093000/
+#     CURRENT                     name of the version to serve
+#
+# CURRENT is replaced atomically, so readers always see either the old or
+# the new version. A model saved directly in my_gov_model (the layout used
+# before versioning) is served as version "legacy" until a new one is published.
+
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+LEGACY_VERSION = "legacy"
+
+
+def new_version_dir(root):
+    """
+    Creates and returns (version, path) for a new, empty version directory.
+    """
+    versions = os.path.join(root, VERSIONS_DIR)
+    os.makedirs(versions, exist_ok=True)
+    base = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    version, suffix = base, 1
+    while os.path.exists(os.path.join(versions, version)):
+        suffix += 1
+        version = f"{base}-{suffix}"
+    path = os.path.join(versions, version)
+    os.makedirs(path)
+    return version, path
+
+
+def version_path(root, version):
+    if version == LEGACY_VERSION:
+        return root
+    return os.path.join(root, VERSIONS_DIR, version)
+
+
+def current_version(root):
+    """
+    Returns (version, path) of the model to serve, or None if there is none.
+    """
+    pointer = os.path.join(root, CURRENT_FILE)
+    if os.path.exists(pointer):
+        with open(pointer) as f:
+            version = f.read().strip()
+        if version and os.path.isdir(version_path(root, version)):
+            return version, version_path(root, version)
+    if os.path.exists(os.path.join(root, "config.json")):
+        return LEGACY_VERSION, root
+    return None
+
+
+def publish_version(root, version):
+    """
+    Atomically points CURRENT at `version`.
+    """
+    pointer = os.path.join(root, CURRENT_FILE)
+    tmp = f"{pointer}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+
+
+def prune_versions(root, keep=3):
+    """
+    Deletes all but the newest `keep` version directories, never the current one.
+    """
+    versions = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(versions):
+        return []
+    current = current_version(root)
+    names = sorted(os.listdir(versions), reverse=True)
+    removed = []
+    for name in names[keep:]:
+        if current and name == current[0]:
+            continue
+        shutil.rmtree(os.path.join(versions, name), ignore_errors=True)
+        removed.append(name)
+    return removed
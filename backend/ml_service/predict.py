@@ -1,76 +1,325 @@
 import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from transformers import AutoTokenizer
 import os
-from utils import clean_text, has_negation, add_negation_feature
+import threading
+import time
+from utils import clean_text, negation_matcher, add_negation_feature, reload_extra_keywords_if_changed
+from batcher import MicroBatcher, PaddingStats
+from cache import PredictionCache
+from inference import load_runner
+from metrics import timed, record_stage, INPUT_TOKENS, BATCH_SIZE
+from model_store import current_version, version_path
+
+WARMUP_TEXTS = ["الخدمه ممتازه", "لا يوجد اي تعاون من الموظفين والانتظار طويل جدا"]
+
+class LoadedModel:
+    """
+    A tokenizer and runner for one model version. Requests take a reference
+    to the active LoadedModel when they start, so a hot swap never mixes the
+    tokenizer of one version with the weights of another, and the old model
+    is only freed once the last in-flight request drops its reference.
+    """
+    __slots__ = ("version", "path", "tokenizer", "runner")
+
+    def __init__(self, version, path, tokenizer, runner):
+        self.version = version
+        self.path = path
+        self.tokenizer = tokenizer
+        self.runner = runner
 
 class ModelWrapper:
-    def __init__(self, model_path="my_gov_model"):
+    def __init__(self, model_path="my_gov_model", backend=None):
+        # Root of the versioned model store, see model_store.py
         self.model_path = model_path
-        self.model = None
-        self.tokenizer = None
+        # One of inference.BACKENDS: "torch", "torch_int8" or "onnx"
+        self.backend = backend or os.getenv("ML_INFERENCE_BACKEND", "torch")
+        self._active = None
+        self._load_lock = threading.Lock()
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.batcher = None
+        self.cache = None
+        self.padding_stats = PaddingStats()
 
-    def load_model(self):
-        if not os.path.exists(self.model_path):
-            print(f"Error: Model directory '{self.model_path}' not found.")
-            return False
+    def enable_batching(self, max_batch_size=16, max_wait_ms=10):
+        """
+        Routes single predictions through a MicroBatcher so that concurrent
+        requests share one forward pass.
+        """
+        self.batcher = MicroBatcher(self._forward, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    def enable_cache(self, max_entries=10000, max_bytes=64 * 1024 * 1024):
+        """
+        Caches model outputs keyed on the processed text and model version.
+        The cache is cleared whenever a model is (re)loaded.
+        """
+        self.cache = PredictionCache(max_entries=max_entries, max_bytes=max_bytes)
+
+    @property
+    def model(self):
+        active = self._active
+        return active.runner if active is not None else None
+
+    @property
+    def tokenizer(self):
+        active = self._active
+        return active.tokenizer if active is not None else None
+
+    @property
+    def model_version(self):
+        active = self._active
+        return active.version if active is not None else None
+
+    def load_model(self, version=None):
+        """
+        Loads `version` (the one CURRENT points to by default), warms it up and
+        then swaps it in with a single reference assignment. Requests keep
+        being served by the previous model until the swap.
+        """
+        if version is None:
+            found = current_version(self.model_path)
+            if found is None:
+                print(f"Error: No model found in '{self.model_path}'.")
+                return False
+            version, path = found
+        else:
+            path = version_path(self.model_path, version)
+            if not os.path.isdir(path):
+                print(f"Error: Model version '{version}' not found in '{self.model_path}'.")
+                return False
 
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_path)
-            self.model.to(self.device)
-            self.model.eval()
-            print(f"Model loaded successfully on {self.device}")
+        with self._load_lock:
+            try:
+                tokenizer = AutoTokenizer.from_pretrained(path)
+                runner = load_runner(path, self.backend, self.device)
+                loaded = LoadedModel(version, path, tokenizer, runner)
+                self._run_model(loaded, WARMUP_TEXTS)
+            except Exception as e:
+                print(f"Failed to load model: {e}")
+                return False
+
+            self._active = loaded
+            if self.cache is not None:
+                self.cache.clear()
+            print(f"Model {version} loaded successfully ({self.backend} backend on {runner.device})")
             return True
-        except Exception as e:
-            print(f"Failed to load model: {e}")
-            return False
 
-    def predict(self, text):
-        if self.model is None or self.tokenizer is None:
+    def start_version_watcher(self, interval=10):
+        """
+        Polls the CURRENT pointer and hot-swaps to the published version when
+        it changes, e.g. after another worker process finished training. The
+        negation keyword file is followed the same way, through its own
+        pointer (utils.NEGATION_KEYWORDS_POINTER).
+        """
+        def watch():
+            while True:
+                time.sleep(interval)
+                if reload_extra_keywords_if_changed():
+                    print(f"Negation keywords reloaded (pid {os.getpid()})")
+                found = current_version(self.model_path)
+                if found is not None and found[0] != self.model_version:
+                    print(f"CURRENT now points to {found[0]}, reloading (pid {os.getpid()})")
+                    self.load_model(found[0])
+
+        thread = threading.Thread(target=watch, name="model-version-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def predict(self, text, timings=None):
+        """
+        Predicts one text. Per-stage durations in seconds are added to
+        `timings` when a dict is passed.
+        """
+        loaded = self._active
+        if loaded is None:
             if not self.load_model():
                  return None
+            loaded = self._active
 
+        matcher = negation_matcher()
         # Check if text contains Arabic characters
         if not self.contain_arabic(text):
-            return {
-                "sentiment": "Unknown",
-                "cleaned_text": text,
-                "processed_text": text,
-                "confidence": 0.0,
-                "has_negation": False
-            }
+            return self._unknown_result(text, loaded.version, matcher.fingerprint)
 
-        cleaned_text = clean_text(text)
-        text_with_negation = add_negation_feature(cleaned_text)
+        with timed("clean_text", timings):
+            cleaned_text = clean_text(text)
+        with timed("negation", timings):
+            negations = matcher.find(cleaned_text)
+            text_with_negation = add_negation_feature(cleaned_text, negations)
 
-        # Use max_length=128 to match training configuration
-        inputs = self.tokenizer(text_with_negation, return_tensors="pt", padding=True, truncation=True, max_length=128)
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        if self.cache is not None:
+            key = (loaded.version, text_with_negation)
+            score = self.cache.get_or_compute(key, lambda: self._score(text_with_negation, timings))
+        else:
+            score = self._score(text_with_negation, timings)
+
+        return self._result(cleaned_text, text_with_negation, score, bool(negations), matcher.fingerprint)
+
+    def predict_batch(self, texts, chunk_size=32, timings=None):
+        """
+        Predicts a list of texts and returns one result per text, in order.
+        Texts without Arabic characters (including empty ones) are answered
+        directly; the rest go through the model `chunk_size` at a time.
+        """
+        loaded = self._active
+        if loaded is None:
+            if not self.load_model():
+                 return None
+            loaded = self._active
+
+        matcher = negation_matcher()
+        results = [None] * len(texts)
+        pending = []
+        clean_seconds = negation_seconds = 0.0
+        for index, text in enumerate(texts):
+            if not self.contain_arabic(text):
+                results[index] = self._unknown_result(text, loaded.version, matcher.fingerprint)
+                continue
+            started = time.perf_counter()
+            cleaned_text = clean_text(text)
+            cleaned = time.perf_counter()
+            negations = matcher.find(cleaned_text)
+            pending.append((index, cleaned_text, add_negation_feature(cleaned_text, negations), bool(negations)))
+            clean_seconds += cleaned - started
+            negation_seconds += time.perf_counter() - cleaned
+        record_stage("clean_text", clean_seconds, timings)
+        record_stage("negation", negation_seconds, timings)
+
+        # Score each distinct processed text once, reusing cached outputs
+        scores = {}
+        to_score = []
+        for _, _, processed, _ in pending:
+            if processed in scores:
+                continue
+            cached = self.cache.get((loaded.version, processed)) if self.cache is not None else None
+            scores[processed] = cached
+            if cached is None:
+                to_score.append(processed)
+
+        for processed, (sentiment, confidence) in zip(to_score, self._run_model(loaded, to_score, chunk_size, timings)):
+            scores[processed] = (sentiment, confidence, loaded.version)
+            if self.cache is not None:
+                self.cache.put((loaded.version, processed), scores[processed])
 
-        with torch.no_grad():
-            outputs = self.model(**inputs)
+        for index, cleaned_text, processed, has_neg in pending:
+            results[index] = self._result(cleaned_text, processed, scores[processed], has_neg, matcher.fingerprint)
 
-        logits = outputs.logits
-        predicted_class_id = torch.argmax(logits, dim=-1).item()
+        return results
 
-        # Get confidence scores
-        probabilities = torch.softmax(logits, dim=-1)[0]
-        confidence = probabilities[predicted_class_id].item()
+    def _score(self, text_with_negation, timings=None):
+        if self.batcher is None:
+            score, _ = self._forward([text_with_negation], timings)[0]
+            return score
 
-        # Label map from model.py: {'positive': 1, 'negative': 0}
-        # So 0 is Negative, 1 is Positive
-        sentiment = "Positive" if predicted_class_id == 1 else "Negative"
-        has_neg = has_negation(cleaned_text)
+        started = time.perf_counter()
+        score, batch_timings = self.batcher.submit(text_with_negation)
+        # Whatever the batch itself did not account for was spent queueing
+        record_stage("queue", max(0.0, time.perf_counter() - started - sum(batch_timings.values())), timings)
+        if timings is not None:
+            for stage, seconds in batch_timings.items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+        return score
 
+    @staticmethod
+    def _result(cleaned_text, processed_text, score, has_neg, negation_keywords):
+        sentiment, confidence, version = score
         return {
             "sentiment": sentiment,
             "cleaned_text": cleaned_text,
-            "processed_text": text_with_negation,
+            "processed_text": processed_text,
             "confidence": confidence,
-            "has_negation": has_neg
+            "has_negation": has_neg,
+            "model_version": version,
+            "negation_keywords": negation_keywords
         }
 
+    @staticmethod
+    def _unknown_result(text, version, negation_keywords):
+        return {
+            "sentiment": "Unknown",
+            "cleaned_text": text,
+            "processed_text": text,
+            "confidence": 0.0,
+            "has_negation": False,
+            "model_version": version,
+            "negation_keywords": negation_keywords
+        }
+
+    def _forward(self, texts, timings=None):
+        """
+        Scores processed texts with the currently active model. Returns, per
+        text, a (sentiment, confidence, model_version) score and the stage
+        timings of the batch it ran in. Used by the micro-batcher, whose
+        batches may straddle a hot swap.
+        """
+        loaded = self._active
+        if timings is None:
+            timings = {}
+        return [((sentiment, confidence, loaded.version), timings)
+                for sentiment, confidence in self._run_model(loaded, texts, timings=timings)]
+
+    def _run_model(self, loaded, texts, batch_size=None, timings=None):
+        """
+        Runs `loaded` over already processed texts and returns a
+        (sentiment, confidence) pair per text, in the same order.
+
+        Texts are sorted by tokenized length and split into batches of at most
+        `batch_size` (all at once when None), and each batch is padded only to
+        its own longest member.
+        """
+        if not texts:
+            return []
+
+        started = time.perf_counter()
+        # Use max_length=128 to match training configuration
+        encodings = loaded.tokenizer(texts, truncation=True, max_length=128)
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+        tokenize_seconds = time.perf_counter() - started
+        for length in lengths:
+            INPUT_TOKENS.observe(length)
+        batch_size = batch_size or len(texts)
+
+        results = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            started = time.perf_counter()
+            inputs = self._pad_batch(loaded.tokenizer, encodings, indices, max(lengths[i] for i in indices))
+            tokenize_seconds += time.perf_counter() - started
+            self.padding_stats.record(sum(lengths[i] for i in indices), inputs["input_ids"].numel())
+            BATCH_SIZE.observe(len(indices))
+
+            with timed("forward", timings):
+                logits = loaded.runner(inputs).float().cpu()
+
+            with timed("postprocess", timings):
+                predicted_class_ids = torch.argmax(logits, dim=-1)
+
+                # Get confidence scores
+                probabilities = torch.softmax(logits, dim=-1)
+                confidences = probabilities.gather(1, predicted_class_ids.unsqueeze(-1)).squeeze(-1)
+
+                # Label map from model.py: {'positive': 1, 'negative': 0}
+                # So 0 is Negative, 1 is Positive
+                for i, class_id, confidence in zip(indices, predicted_class_ids.tolist(), confidences.tolist()):
+                    results[i] = ("Positive" if class_id == 1 else "Negative", confidence)
+
+        record_stage("tokenize", tokenize_seconds, timings)
+
+        return results
+
+    @staticmethod
+    def _pad_batch(tokenizer, encodings, indices, length):
+        """
+        Right-pads the selected encodings to `length` and stacks them into tensors.
+        """
+        pad_values = {"input_ids": tokenizer.pad_token_id, "attention_mask": 0, "token_type_ids": 0}
+        batch = {}
+        for key in encodings.keys():
+            rows = [encodings[key][i] for i in indices]
+            pad_value = pad_values.get(key, 0)
+            batch[key] = torch.tensor([row + [pad_value] * (length - len(row)) for row in rows], dtype=torch.long)
+        return batch
+
     @staticmethod
     def contain_arabic(text):
         """
@@ -0,0 +1,72 @@
+import threading
+import time
+import unittest
+
+from batcher import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_results_return_to_their_callers(self):
+        calls = []
+
+        def process(items):
+            calls.append(len(items))
+            time.sleep(0.01)
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=50)
+        results = {}
+
+        def submit(i):
+            results[i] = batcher.submit(i)
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, {i: i * 2 for i in range(20)})
+        self.assertTrue(all(size <= 8 for size in calls))
+        self.assertLess(len(calls), 20)
+
+        stats = batcher.stats.snapshot()
+        self.assertEqual(stats["items"], 20)
+        self.assertEqual(stats["batches"], len(calls))
+
+    def test_single_request_is_not_held_past_max_wait(self):
+        batcher = MicroBatcher(lambda items: items, max_batch_size=64, max_wait_ms=5)
+        started = time.perf_counter()
+        self.assertEqual(batcher.submit("x"), "x")
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    def test_errors_propagate_to_every_caller(self):
+        def process(items):
+            raise RuntimeError("boom")
+
+        batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            batcher.submit("x")
+
+    def test_missing_results_fail_every_caller(self):
+        batcher = MicroBatcher(lambda items: items[:1], max_batch_size=4, max_wait_ms=200)
+        errors = []
+
+        def submit(i):
+            try:
+                batcher.submit(i)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(batcher.stats.snapshot()["batches"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import threading
+import time
+import unittest
+
+from cache import PredictionCache
+
+
+class TestPredictionCache(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        cache = PredictionCache(max_entries=10)
+        self.assertEqual(cache.get_or_compute(("v1", "a"), lambda: 1), 1)
+        self.assertEqual(cache.get_or_compute(("v1", "a"), lambda: 2), 1)
+        self.assertEqual(cache.get(("v2", "a")), None)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_evicts_least_recently_used(self):
+        cache = PredictionCache(max_entries=2)
+        cache.put(("v", "a"), 1)
+        cache.put(("v", "b"), 2)
+        cache.get(("v", "a"))
+        cache.put(("v", "c"), 3)
+        self.assertEqual(cache.get(("v", "b")), None)
+        self.assertEqual(cache.get(("v", "a")), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_memory_bound(self):
+        cache = PredictionCache(max_entries=1000, max_bytes=4096)
+        for i in range(100):
+            cache.put(("v", "x" * 100 + str(i)), i)
+        self.assertLessEqual(cache.current_bytes, 4096)
+        self.assertGreater(cache.stats()["evictions"], 0)
+
+    def test_concurrent_identical_requests_compute_once(self):
+        cache = PredictionCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return "result"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(("v", "k"), compute)))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["result"] * 8)
+        self.assertEqual(cache.stats()["coalesced"], 7)
+
+    def test_clear_drops_entries_and_inflight_results(self):
+        cache = PredictionCache()
+        cache.put(("v", "a"), 1)
+
+        def compute():
+            cache.clear()
+            return 2
+
+        cache.get_or_compute(("v", "b"), compute)
+        self.assertEqual(cache.get(("v", "a")), None)
+        self.assertEqual(cache.get(("v", "b")), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
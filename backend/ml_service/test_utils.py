@@ -0,0 +1,162 @@
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+import utils
+from utils import (ARABIC_NEGATIVE_KEYWORDS, NegationMatcher, add_negation_feature, clean_text, clean_texts,
+                   find_negations, has_negation, load_extra_keywords)
+
+
+def legacy_clean_text(text):
+    """
+    The original chained re.sub implementation of clean_text, kept as the
+    golden reference for the single-pass normalizer.
+    """
+    text = str(text)
+    text = re.sub(r'[\u064B-\u065F\u0670]', '', text)
+    text = re.sub("[إأآا]", "ا", text)
+    text = re.sub("ى", "ي", text)
+    text = re.sub("ؤ", "ء", text)
+    text = re.sub("ئ", "ء", text)
+    text = re.sub("ة", "ه", text)
+    text = re.sub("g", "q", text)
+    text = re.sub(r'[^\u0600-\u06ff\u0750-\u077f\ufb50-\ufdff\ufe70-\ufeff\s]', '', text)
+    return text.strip()
+
+
+def build_corpus(size=50000, seed=42):
+    """
+    Random feedback-like strings mixing Arabic letters, diacritics, folded
+    letters, presentation forms, Latin text, digits, emoji and many kinds of
+    Unicode whitespace.
+    """
+    rng = random.Random(seed)
+    pools = [
+        [chr(c) for c in range(0x0600, 0x0700)],
+        [chr(c) for c in range(0x064B, 0x0660)] + ["\u0670"],
+        list("إأآاىيؤئءةهg"),
+        [chr(c) for c in range(0x0750, 0x0780)],
+        [chr(c) for c in range(0xFB50, 0xFB60)] + [chr(c) for c in range(0xFE70, 0xFE80)],
+        list("abcdefghijklmnopqrstuvwxyzABCXYZ0123456789.,!?؟،؛-_()[]@#"),
+        list(" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f\x85\xa0\u1680\u2000\u2007\u200a\u2028\u2029\u202f\u205f\u3000"),
+        ["\u200b", "\u200c", "\u200d", "\u200e", "\u200f", "\ufeff", "\ufffd"],
+        ["😀", "👍", "😡", "🇪🇬", "中", "é", "ß", "Ω", "𝔸"],
+    ]
+    weights = [40, 8, 10, 3, 3, 15, 15, 2, 4]
+    corpus = []
+    for _ in range(size):
+        length = rng.randint(0, 80)
+        corpus.append("".join(rng.choice(rng.choices(pools, weights)[0]) for _ in range(length)))
+    return corpus
+
+
+class TestCleanText(unittest.TestCase):
+
+    def test_matches_legacy_on_every_codepoint(self):
+        text = "".join(chr(c) for c in range(sys.maxunicode + 1) if not 0xD800 <= c <= 0xDFFF)
+        self.assertEqual(clean_text(text), legacy_clean_text(text))
+        for c in range(0x0000, 0x3100):
+            self.assertEqual(clean_text(chr(c)), legacy_clean_text(chr(c)), hex(c))
+
+    def test_matches_legacy_on_random_corpus(self):
+        for text in build_corpus():
+            self.assertEqual(clean_text(text).encode("utf-8"), legacy_clean_text(text).encode("utf-8"), repr(text))
+
+    def test_non_string_input(self):
+        for value in (None, 12, 3.5, float("nan")):
+            self.assertEqual(clean_text(value), legacy_clean_text(value))
+
+    def test_batch_api(self):
+        corpus = build_corpus(size=1000, seed=7)
+        self.assertEqual(clean_texts(corpus), [legacy_clean_text(t) for t in corpus])
+
+        try:
+            import pandas as pd
+        except ImportError:
+            self.skipTest("pandas not installed")
+        series = pd.Series(corpus + [None], index=range(10, 10 + len(corpus) + 1))
+        cleaned = clean_texts(series)
+        self.assertListEqual(list(cleaned.index), list(series.index))
+        self.assertListEqual(cleaned.tolist(), series.apply(legacy_clean_text).tolist())
+
+
+class TestNegationMatcher(unittest.TestCase):
+
+    def test_single_and_multi_word_keywords(self):
+        matcher = NegationMatcher(["لا", "لا يوجد", "غير مقبول", "فاشل"])
+        text = "الخدمه لا يوجد فيها شيء غير مقبول و فاشل"
+        matches = matcher.find(text)
+        self.assertEqual([m.keyword for m in matches], ["لا يوجد", "غير مقبول", "فاشل"])
+        for m in matches:
+            self.assertEqual(text[m.start:m.end], m.keyword)
+
+    def test_prefers_longest_phrase_and_falls_back_to_prefix(self):
+        matcher = NegationMatcher(["لا", "لا يوجد"])
+        self.assertEqual([m.keyword for m in matcher.find("لا يوجد")], ["لا يوجد"])
+        self.assertEqual([m.keyword for m in matcher.find("لا اعرف")], ["لا"])
+
+    def test_keywords_are_normalized_like_the_input(self):
+        matcher = NegationMatcher(["مؤلم"])
+        self.assertTrue(matcher.find(clean_text("شيء مؤلم")))
+
+    def test_default_keywords(self):
+        self.assertTrue(has_negation("لا يعجبني"))
+        self.assertTrue(has_negation("مع الاسف"))
+        self.assertFalse(has_negation("الخدمه ممتازه"))
+        self.assertEqual(add_negation_feature("ممتاز"), "ممتاز")
+
+    def test_fingerprint_identifies_the_keyword_set(self):
+        self.assertEqual(NegationMatcher(["لا", "مؤلم"]).fingerprint, NegationMatcher(["مءلم", "لا", "لا"]).fingerprint)
+        self.assertNotEqual(NegationMatcher(["لا"]).fingerprint, NegationMatcher(["لا", "بطيء"]).fingerprint)
+
+    def test_load_extra_keywords(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", encoding="utf-8", delete=False) as f:
+            f.write("# extra keywords\nمش حلو\n\nبطيء\n")
+        try:
+            self.assertFalse(has_negation("التطبيق بطيء"))
+            load_extra_keywords(f.name)
+            self.assertTrue(has_negation("التطبيق بطيء"))
+            self.assertEqual([m.keyword for m in find_negations("مش حلو خالص")], ["مش حلو"])
+        finally:
+            utils._negation_matcher = NegationMatcher(ARABIC_NEGATIVE_KEYWORDS)
+            os.remove(f.name)
+
+    def test_workers_follow_the_published_keyword_file(self):
+        directory = tempfile.mkdtemp()
+        first, second = os.path.join(directory, "first.txt"), os.path.join(directory, "second.txt")
+        saved = utils.NEGATION_KEYWORDS_FILE, utils.NEGATION_KEYWORDS_POINTER
+        utils.NEGATION_KEYWORDS_FILE = first
+        utils.NEGATION_KEYWORDS_POINTER = os.path.join(directory, "NEGATION_KEYWORDS")
+        try:
+            # Configured but not created yet when the worker started
+            self.assertFalse(utils.reload_extra_keywords_if_changed())
+            with open(first, "w", encoding="utf-8") as f:
+                f.write("بطيء\n")
+            self.assertTrue(utils.reload_extra_keywords_if_changed())
+            self.assertTrue(has_negation("التطبيق بطيء"))
+            self.assertFalse(utils.reload_extra_keywords_if_changed())
+
+            # Loaded by another worker's /negation/reload
+            with open(second, "w", encoding="utf-8") as f:
+                f.write("مش حلو\n")
+            utils.publish_keyword_file(second)
+            self.assertTrue(utils.reload_extra_keywords_if_changed())
+            self.assertTrue(has_negation("مش حلو خالص"))
+            self.assertFalse(has_negation("التطبيق بطيء"))
+
+            utils.reset_keyword_file()
+            self.assertTrue(utils.reload_extra_keywords_if_changed())
+            self.assertTrue(has_negation("التطبيق بطيء"))
+        finally:
+            utils.NEGATION_KEYWORDS_FILE, utils.NEGATION_KEYWORDS_POINTER = saved
+            utils._negation_matcher = NegationMatcher(ARABIC_NEGATIVE_KEYWORDS)
+            utils._extra_keywords_source = None
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
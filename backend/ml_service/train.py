@@ -1,11 +1,12 @@
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, Trainer, TrainingArguments, EarlyStoppingCallback
+from transformers import AutoTokenizer, AutoModelForSequenceClassification, Trainer, TrainingArguments, EarlyStoppingCallback, DataCollatorWithPadding
 from datasets import Dataset
 import torch
 from sklearn.metrics import accuracy_score, f1_score
-from utils import clean_text
+from utils import clean_texts
+from model_store import new_version_dir
 import os
 
 def compute_metrics(eval_pred):
@@ -16,7 +17,9 @@ def compute_metrics(eval_pred):
     return {"accuracy": acc, "f1": f1}
 
 def tokenize_function(examples, tokenizer):
-    return tokenizer(examples["text"], padding="max_length", truncation=True, max_length=64)
+    # No padding here: DataCollatorWithPadding pads each batch to its own
+    # longest sequence, and group_by_length keeps similar lengths together.
+    return tokenizer(examples["text"], truncation=True, max_length=64)
 
 def train_model(dataset_path, output_dir="my_gov_model"):
     print(f"Loading dataset from {dataset_path}...")
@@ -26,7 +29,7 @@ def train_model(dataset_path, output_dir="my_gov_model"):
         print(f"Error loading dataset: {e}")
         return False, str(e)
 
-    df['clean_text'] = df['text'].apply(clean_text)
+    df['clean_text'] = clean_texts(df['text'])
 
     label_map = {'positive': 1, 'negative': 0}
     df['label_id'] = df['label'].map(label_map)
@@ -80,6 +83,7 @@ def train_model(dataset_path, output_dir="my_gov_model"):
         logging_strategy="steps",
         logging_steps=100,
         seed=42,
+        group_by_length=True,
         report_to="none"
     )
 
@@ -88,6 +92,7 @@ def train_model(dataset_path, output_dir="my_gov_model"):
         args=training_args,
         train_dataset=encoded_train,
         eval_dataset=encoded_test,
+        data_collator=DataCollatorWithPadding(tokenizer),
         compute_metrics=compute_metrics,
         callbacks=[EarlyStoppingCallback(early_stopping_patience=2)]
     )
@@ -102,8 +107,10 @@ def train_model(dataset_path, output_dir="my_gov_model"):
     print(f"   - Accuracy: {acc_arabert*100:.2f}%")
     print(f"   - F1 Score: {f1_arabert*100:.2f}%")
 
-    print(f"Saving model to {output_dir}...")
-    model.save_pretrained(output_dir)
-    tokenizer.save_pretrained(output_dir)
+    # Each run is saved as a new version; the caller decides when to publish it
+    version, version_dir = new_version_dir(output_dir)
+    print(f"Saving model to {version_dir}...")
+    model.save_pretrained(version_dir)
+    tokenizer.save_pretrained(version_dir)
     
-    return True, {"accuracy": acc_arabert, "f1": f1_arabert}
+    return True, {"accuracy": acc_arabert, "f1": f1_arabert, "model_version": version}
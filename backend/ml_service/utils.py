@@ -1,16 +1,73 @@
+import hashlib
+import os
 import re
+from collections import namedtuple
+
+# Character ranges kept by clean_text; everything else except whitespace is dropped.
+_ALLOWED_RANGES = (
+    (0x0600, 0x06FF),  # Arabic
+    (0x0750, 0x077F),  # Arabic Supplement
+    (0xFB50, 0xFDFF),  # Arabic Presentation Forms-A
+    (0xFE70, 0xFEFF),  # Arabic Presentation Forms-B
+)
+
+# Letter folding applied by clean_text
+_FOLDED = {
+    "إ": "ا", "أ": "ا", "آ": "ا",
+    "ى": "ي",
+    "ؤ": "ء", "ئ": "ء",
+    "ة": "ه",
+}
+
+
+def _normalize_char(codepoint):
+    """
+    Returns the str.translate mapping for one character: a replacement
+    string, None to delete it, or the codepoint itself to keep it.
+    """
+    if 0x064B <= codepoint <= 0x065F or codepoint == 0x0670:
+        return None  # diacritics
+    char = chr(codepoint)
+    if char in _FOLDED:
+        return _FOLDED[char]
+    if char.isspace() or any(low <= codepoint <= high for low, high in _ALLOWED_RANGES):
+        return codepoint
+    return None
+
+
+class _NormalizeTable(dict):
+    """
+    Translation table for clean_text. Latin-1 and the Arabic blocks are
+    precomputed; any other character is resolved the first time it is seen
+    and then cached.
+    """
+    def __missing__(self, codepoint):
+        value = self[codepoint] = _normalize_char(codepoint)
+        return value
+
+
+_NORMALIZE_TABLE = _NormalizeTable(
+    (codepoint, _normalize_char(codepoint))
+    for codepoint in list(range(0x0100)) + [cp for low, high in _ALLOWED_RANGES for cp in range(low, high + 1)]
+)
+
 
 def clean_text(text):
-    text = str(text)
-    text = re.sub(r'[\u064B-\u065F\u0670]', '', text)
-    text = re.sub("[إأآا]", "ا", text)
-    text = re.sub("ى", "ي", text)
-    text = re.sub("ؤ", "ء", text)
-    text = re.sub("ئ", "ء", text)
-    text = re.sub("ة", "ه", text)
-    text = re.sub("g", "q", text)
-    text = re.sub(r'[^\u0600-\u06ff\u0750-\u077f\ufb50-\ufdff\ufe70-\ufeff\s]', '', text)
-    return text.strip()
+    """
+    Strips diacritics, folds alef/yaa/hamza/taa-marbuta variants and drops
+    every non-Arabic, non-whitespace character in a single pass.
+    """
+    return str(text).translate(_NORMALIZE_TABLE).strip()
+
+
+def clean_texts(texts):
+    """
+    Batch version of clean_text. Accepts a list (returns a list) or a
+    pandas Series (returns a Series with the same index).
+    """
+    if hasattr(texts, "map"):
+        return texts.map(clean_text)
+    return [clean_text(text) for text in texts]
 
 ARABIC_NEGATIVE_KEYWORDS = [
     # Basic negation particles
@@ -48,19 +105,190 @@ ARABIC_NEGATIVE_KEYWORDS = [
     'كارثه', 'كوارث', 'مصيبه', 'مصائب', 'ازمه', 'ازمات'
 ]
 
-def has_negation(text):
+NegationMatch = namedtuple("NegationMatch", ["start", "end", "keyword"])
+
+_TOKEN_RE = re.compile(r"\S+")
+_PHRASE_END = object()
+
+
+class NegationMatcher:
+    """
+    Token trie over single and multi-word negation keywords.
+
+    Keywords are normalized with clean_text when the trie is built so they
+    match cleaned input. `find` walks the whitespace tokens of a text once
+    and returns leftmost-longest, non-overlapping matches. `fingerprint`
+    identifies the keyword set, so callers can tell results of different
+    sets apart.
+    """
+    def __init__(self, keywords):
+        self._root = {}
+        self.keywords = []
+        for keyword in keywords:
+            tokens = clean_text(keyword).split()
+            if not tokens:
+                continue
+            node = self._root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            if _PHRASE_END not in node:
+                node[_PHRASE_END] = " ".join(tokens)
+                self.keywords.append(node[_PHRASE_END])
+        self.fingerprint = hashlib.sha256("\n".join(sorted(self.keywords)).encode("utf-8")).hexdigest()[:16]
+
+    def find(self, text, first_only=False):
+        """
+        Returns NegationMatch(start, end, keyword) tuples with character
+        offsets into `text`.
+        """
+        tokens = list(_TOKEN_RE.finditer(text))
+        matches = []
+        i = 0
+        while i < len(tokens):
+            node = self._root
+            longest = None
+            j = i
+            while j < len(tokens) and tokens[j].group() in node:
+                node = node[tokens[j].group()]
+                j += 1
+                if _PHRASE_END in node:
+                    longest = (j, node[_PHRASE_END])
+            if longest is None:
+                i += 1
+                continue
+            end, keyword = longest
+            matches.append(NegationMatch(tokens[i].start(), tokens[end - 1].end(), keyword))
+            if first_only:
+                break
+            i = end
+        return matches
+
+
+def read_keyword_file(path):
+    """
+    Reads one keyword or phrase per line; blank lines and lines starting
+    with '#' are ignored.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+# Built once at import; replaced wholesale (a single reference assignment)
+# by load_extra_keywords so concurrent callers never see a half-built trie.
+_negation_matcher = NegationMatcher(ARABIC_NEGATIVE_KEYWORDS)
+
+
+_extra_keywords_source = None
+
+NEGATION_KEYWORDS_FILE = os.getenv("NEGATION_KEYWORDS_FILE")
+
+# Names the keyword file all worker processes match, like the model's CURRENT
+# pointer: POST /negation/reload publishes the file it loaded here, and every
+# worker's watcher follows it. Without it, NEGATION_KEYWORDS_FILE is matched.
+NEGATION_KEYWORDS_POINTER = os.getenv("NEGATION_KEYWORDS_POINTER",
+                                      os.path.join("my_gov_model", "NEGATION_KEYWORDS"))
+
+
+def load_extra_keywords(path):
+    """
+    Rebuilds the matcher from ARABIC_NEGATIVE_KEYWORDS plus the keywords in
+    `path` and swaps it in. Returns the number of keywords now matched.
+    """
+    global _negation_matcher, _extra_keywords_source
+    mtime = os.path.getmtime(path)
+    _negation_matcher = NegationMatcher(ARABIC_NEGATIVE_KEYWORDS + read_keyword_file(path))
+    _extra_keywords_source = (path, mtime)
+    return len(_negation_matcher.keywords)
+
+
+def publish_keyword_file(path):
+    """
+    Atomically points NEGATION_KEYWORDS_POINTER at `path`.
+    """
+    directory = os.path.dirname(NEGATION_KEYWORDS_POINTER)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{NEGATION_KEYWORDS_POINTER}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(os.path.abspath(path))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, NEGATION_KEYWORDS_POINTER)
+
+
+def reset_keyword_file():
+    """
+    Removes the published pointer, so NEGATION_KEYWORDS_FILE is matched again.
+    """
+    if os.path.exists(NEGATION_KEYWORDS_POINTER):
+        os.remove(NEGATION_KEYWORDS_POINTER)
+
+
+def active_keyword_file():
     """
-    Word-based negation detection using token matching.
+    The keyword file to match: the published one, else NEGATION_KEYWORDS_FILE
+    (None if neither is set).
     """
-    tokens = text.split()
-    neg_set = set(ARABIC_NEGATIVE_KEYWORDS)
+    if os.path.exists(NEGATION_KEYWORDS_POINTER):
+        with open(NEGATION_KEYWORDS_POINTER, encoding="utf-8") as f:
+            path = f.read().strip()
+        if path:
+            return path
+    return NEGATION_KEYWORDS_FILE
 
-    return any(token in neg_set for token in tokens)
 
-def add_negation_feature(text):
+def reload_extra_keywords_if_changed():
+    """
+    Loads the active keyword file if it is not the one loaded, or was
+    modified since. Lets every worker process pick up a published file, a
+    file created after it started, or an edit, without an explicit reload
+    call. A file that cannot be read leaves the current keywords in place.
+    """
+    try:
+        path = active_keyword_file()
+        if path is None or not os.path.exists(path):
+            return False
+        if _extra_keywords_source == (path, os.path.getmtime(path)):
+            return False
+        load_extra_keywords(path)
+    except OSError as e:
+        print(f"Negation keyword file not reloaded: {e}")
+        return False
+    return True
+
+
+def negation_matcher():
+    """
+    The active NegationMatcher. Callers that report its fingerprint with
+    their matches should take it once, so both come from the same set even
+    if a reload swaps it meanwhile.
+    """
+    return _negation_matcher
+
+
+def find_negations(text):
+    """
+    Returns the negation keywords found in `text` as NegationMatch spans.
+    """
+    return _negation_matcher.find(text)
+
+
+def has_negation(text):
+    """
+    Phrase-aware negation detection using the compiled keyword trie.
+    """
+    return bool(_negation_matcher.find(text, first_only=True))
+
+def add_negation_feature(text, matches=None):
     """
     Appends a special token if negation is detected to help the model context.
+    `matches` can be passed to reuse the result of find_negations.
     """
-    if has_negation(text):
+    if matches is None:
+        matches = _negation_matcher.find(text, first_only=True)
+    if matches:
         return  "سئ " + text
     return text
+
+if NEGATION_KEYWORDS_FILE and os.path.exists(NEGATION_KEYWORDS_FILE):
+    load_extra_keywords(NEGATION_KEYWORDS_FILE)
@@ -1,9 +1,6 @@
 import os
 import requests
-from flask import Flask, render_template, request, redirect, url_for, session, send_file, jsonify
-from datetime import datetime
-import pandas as pd
-from io import BytesIO
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # For session management
@@ -11,6 +8,24 @@ app.secret_key = os.urandom(24)  # For session management
 # Backend API configuration
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:5000')
 
+# Feedbacks per page of the admin dashboard (the backend allows at most 500)
+ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', '50'))
+
+# Days covered by the admin dashboard's summary cards when no date is picked (at most 366)
+ADMIN_STATS_DAYS = int(os.getenv('ADMIN_STATS_DAYS', '30'))
+
+def admin_filters(args):
+    """
+    The GET /api/feedbacks filters for the admin dashboard's query string:
+    date (one day, YYYY-MM-DD) and sentiment.
+    """
+    filters = {}
+    if args.get('date'):
+        filters['from'] = filters['to'] = args['date']
+    if args.get('sentiment'):
+        filters['sentiment'] = args['sentiment']
+    return filters
+
 # Helper function to check if user is admin
 def is_admin():
     return session.get('is_admin', False)
@@ -52,7 +67,8 @@ def feedback():
                 json={'feedback': feedback_text, 'user_id': user_id}
             )
             
-            if response.status_code == 201:
+            # 202: accepted, scored in the background (FEEDBACK_INGEST_MODE=async)
+            if response.status_code in (201, 202):
                 return render_template('feedback.html', success='Thank you for your feedback!')
             else:
                 return render_template('feedback.html', error='Failed to submit feedback')
@@ -117,57 +133,65 @@ def signup():
 def admin():
     if not is_admin():
         return redirect(url_for('login'))
-    
+
+    # One page of feedbacks at a time, filtered by the backend; the summary
+    # cards come from its stats rollups instead of counting rows here
+    filters = admin_filters(request.args)
+    page_params = dict(filters, limit=ADMIN_PAGE_SIZE, fields='feedback,sentiment,confidence,has_negation')
+    if request.args.get('cursor'):
+        page_params['cursor'] = request.args['cursor']
+    stats_params = {'from': filters['from'], 'to': filters['to']} if 'from' in filters else {'days': ADMIN_STATS_DAYS}
+    form = {key: request.args[key] for key in ('date', 'sentiment') if request.args.get(key)}
+    context = dict(feedbacks=[], stats=None, filters=form, export_params=filters, stats_days=ADMIN_STATS_DAYS,
+                   username=session.get('username'))
+
     try:
-        response = requests.get(f'{BACKEND_URL}/api/feedbacks')
-        if response.status_code == 200:
-            feedbacks = response.json()
-            # Convert date strings to datetime objects
-            from dateutil import parser
-            for fb in feedbacks:
-                if fb.get('created_at'):
-                    try:
-                        fb['created_at'] = parser.parse(fb['created_at'])
-                    except:
-                        fb['created_at'] = None
-            
-            return render_template('admin.html', feedbacks=feedbacks, username=session.get('username'))
-        else:
-            return render_template('admin.html', feedbacks=[], error='Failed to load feedbacks')
+        response = requests.get(f'{BACKEND_URL}/api/feedbacks', params=page_params)
+        if response.status_code != 200:
+            error = response.json().get('error') if response.status_code == 400 else None
+            return render_template('admin.html', error=error or 'Failed to load feedbacks', **context)
+        page = response.json()
+
+        response = requests.get(f'{BACKEND_URL}/api/feedbacks/stats', params=stats_params)
+        stats = response.json() if response.status_code == 200 else None
     except Exception as e:
         print(f"Admin error: {e}")
-        return render_template('admin.html', feedbacks=[], error='Connection error')
+        return render_template('admin.html', error='Connection error', **context)
+
+    # Convert date strings to datetime objects, for the rows shown only
+    from dateutil import parser
+    for fb in page['feedbacks']:
+        if fb.get('created_at'):
+            try:
+                fb['created_at'] = parser.parse(fb['created_at'])
+            except (ValueError, OverflowError):
+                fb['created_at'] = None
+
+    context.update(feedbacks=page['feedbacks'], stats=stats, next_cursor=page['next_cursor'])
+    return render_template('admin.html', **context)
 
 @app.route('/admin/export')
 def export_feedbacks():
     if not is_admin():
         return redirect(url_for('login'))
-    
+
+    # The backend streams the export from a server-side cursor; pass it through
+    # chunk by chunk instead of loading it here
+    params = dict(request.args)
+    params.setdefault('format', 'csv')
     try:
-        response = requests.get(f'{BACKEND_URL}/api/feedbacks')
-        if response.status_code == 200:
-            feedbacks = response.json()
-            
-            # Convert to DataFrame
-            df = pd.DataFrame(feedbacks)
-            
-            # Create Excel file in memory
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Feedbacks')
-            output.seek(0)
-            
-            return send_file(
-                output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=f'feedbacks_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-            )
-        else:
-            return 'Failed to export', 500
+        backend = requests.get(f'{BACKEND_URL}/api/feedbacks/export', params=params, stream=True)
     except Exception as e:
         print(f"Export error: {e}")
         return 'Export error', 500
+    if backend.status_code != 200:
+        backend.close()
+        return 'Failed to export', 500
+
+    headers = {'Content-Disposition': backend.headers.get('Content-Disposition',
+                                                         'attachment; filename="feedbacks.csv"')}
+    return Response(backend.iter_content(chunk_size=64 * 1024), headers=headers,
+                    content_type=backend.headers.get('Content-Type'))
 
 @app.route('/logout')
 def logout():
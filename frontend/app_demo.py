@@ -185,7 +185,23 @@ def admin():
     if not is_admin():
         return redirect(url_for('login'))
     
-    return render_template('admin.html', feedbacks=DUMMY_FEEDBACKS, username=session.get('username'))
+    # Filtered and counted here, in the shape the backend's page and stats have
+    filters = {key: request.args[key] for key in ('date', 'sentiment') if request.args.get(key)}
+    in_range = [fb for fb in DUMMY_FEEDBACKS
+                if filters.get('date') in (None, fb['created_at'].strftime('%Y-%m-%d'))]
+    feedbacks = [fb for fb in in_range if filters.get('sentiment') in (None, fb['sentiment'].capitalize())]
+    by_sentiment = {}
+    for fb in in_range:
+        by_sentiment[fb['sentiment'].capitalize()] = by_sentiment.get(fb['sentiment'].capitalize(), 0) + 1
+    stats = {
+        'total': len(in_range),
+        'by_sentiment': by_sentiment,
+        'by_negation': {'true': sum(fb['has_negation'] for fb in in_range),
+                        'false': sum(not fb['has_negation'] for fb in in_range), 'unscored': 0},
+    }
+
+    return render_template('admin.html', feedbacks=feedbacks, stats=stats, filters=filters, export_params={},
+                           stats_days=30, username=session.get('username'))
 
 @app.route('/admin/export')
 def export_feedbacks():
@@ -1,6 +1,5 @@
 import pandas as pd
 import numpy as np
-import re
 from sklearn.model_selection import train_test_split
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -12,19 +11,31 @@ from sklearn.metrics import accuracy_score, f1_score
 
 df = pd.read_csv('arabic_twitter_dataset.csv')
 
+# Single-pass normalizer, same as backend/ml_service/utils.clean_text
+_ALLOWED_RANGES = ((0x0600, 0x06FF), (0x0750, 0x077F), (0xFB50, 0xFDFF), (0xFE70, 0xFEFF))
+_FOLDED = {"إ": "ا", "أ": "ا", "آ": "ا", "ى": "ي", "ؤ": "ء", "ئ": "ء", "ة": "ه"}
+
+def _normalize_char(codepoint):
+    if 0x064B <= codepoint <= 0x065F or codepoint == 0x0670:
+        return None
+    char = chr(codepoint)
+    if char in _FOLDED:
+        return _FOLDED[char]
+    if char.isspace() or any(low <= codepoint <= high for low, high in _ALLOWED_RANGES):
+        return codepoint
+    return None
+
+class _NormalizeTable(dict):
+    def __missing__(self, codepoint):
+        value = self[codepoint] = _normalize_char(codepoint)
+        return value
+
+_NORMALIZE_TABLE = _NormalizeTable()
+
 def clean_text(text):
-    text = str(text)
-    text = re.sub(r'[\u064B-\u065F\u0670]', '', text)
-    text = re.sub("[إأآا]", "ا", text)
-    text = re.sub("ى", "ي", text)
-    text = re.sub("ؤ", "ء", text)
-    text = re.sub("ئ", "ء", text)
-    text = re.sub("ة", "ه", text)
-    text = re.sub("g", "q", text)
-    text = re.sub(r'[^\u0600-\u06ff\u0750-\u077f\ufb50-\ufdff\ufe70-\ufeff\s]', '', text)
-    return text.strip()
-
-df['clean_text'] = df['text'].apply(clean_text)
+    return str(text).translate(_NORMALIZE_TABLE).strip()
+
+df['clean_text'] = df['text'].map(clean_text)
 
 label_map = {'positive': 1, 'negative': 0}
 df['label_id'] = df['label'].map(label_map)